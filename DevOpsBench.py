@@ -0,0 +1,327 @@
+# DevOpsBench.py
+"""DevOpsTool 效能基準測試 (headless)：指令執行、日誌管線、取消延遲、清理引擎與建置快取"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import threading
+
+from DevOpsTool import (
+    APP_DATA_DIR, CURRENT_VERSION, LOG_FLUSH_INTERVAL_MS, CLEAN_TRASH_DIR,
+    ensure_app_data_dir, LogPump, ArtifactStore, TaskHandler, _cli_sink, _load_json,
+)
+
+BENCH_BASELINE_FILE = os.path.join(APP_DATA_DIR, "bench_baseline.json")
+BENCH_REGRESSION_THRESHOLD = 0.20   # 比基準慢 (或吞吐量低) 超過 20% 視為退步
+BENCH_SUITES = ("runcmd", "latency", "cancel", "clean", "build")
+
+# 子行程：依參數輸出 n 行、每行 length 個字元；rate > 0 時以固定速率輸出並附上送出時間
+EMITTER_SOURCE = r'''
+import sys, time
+n, length, rate = int(sys.argv[1]), int(sys.argv[2]), float(sys.argv[3])
+pad = "x" * length
+out = sys.stdout
+t0 = time.perf_counter()
+for i in range(n):
+    if rate:
+        delay = t0 + i / rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        out.write(f"{time.time():.6f} {pad}\n")
+        out.flush()
+    else:
+        out.write(f"{i} {pad}\n")
+out.flush()
+'''
+
+SAMPLE_MAIN = 'import json\n\nprint("bench", json.dumps({"version": %d}))\n'
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    rank = max(1, int(-(-q * len(values) // 100)))
+    return values[min(rank, len(values)) - 1]
+
+
+def _quiet_handler(sink=None):
+    """不寫遙測的 TaskHandler，避免基準測試污染使用者的耗時紀錄"""
+    handler = TaskHandler(log_callback=sink or (lambda msg: None))
+    handler.telemetry.enabled = False
+    return handler
+
+
+class Bench:
+    """依序執行各項基準並收集扁平化的指標 (名稱以 _per_s 結尾者越大越好，其餘越小越好)"""
+    def __init__(self, workdir, quick=False, verbose=False):
+        self.workdir = workdir
+        self.quick = quick
+        self.verbose = verbose
+        self.results = {}
+        self.emitter = os.path.join(workdir, "emitter.py")
+        with open(self.emitter, 'w', encoding='utf-8') as f:
+            f.write(EMITTER_SOURCE)
+
+    def note(self, msg):
+        if self.verbose:
+            _cli_sink(msg)
+
+    def emit_cmd(self, n, length, rate=0):
+        return f'"{sys.executable}" "{self.emitter}" {n} {length} {rate}'
+
+    # --- run_cmd → LogPump 吞吐量 ---
+    def bench_runcmd(self):
+        cases = [(50000, 40), (20000, 200), (2000, 4000)] if self.quick else [(200000, 40), (50000, 200), (5000, 4000)]
+        for n, length in cases:
+            # 吞吐量受排程雜訊影響大，取三次中最快的一次
+            best = None
+            for _ in range(3):
+                run = self._runcmd_once(n, length)
+                if best is None or run[0] < best[0]:
+                    best = run
+            seconds, dropped, rc = best
+            key = f"runcmd.len{length}"
+            self.results[f"{key}.seconds"] = seconds
+            self.results[f"{key}.lines_per_s"] = n / seconds
+            self.results[f"{key}.mb_per_s"] = n * (length + 8) / seconds / 1024 ** 2
+            self.results[f"{key}.dropped"] = dropped
+            self.note(f"runcmd {n} 行 x {length} 字元: {seconds:.2f} 秒，{n / seconds:,.0f} 行/秒 (rc={rc})")
+
+    def _runcmd_once(self, n, length):
+        pump = LogPump()
+        stop = threading.Event()
+
+        def drain():
+            # 模擬 GUI 的 after() 計時器定期取出日誌
+            while not stop.is_set():
+                pump.drain()
+                time.sleep(LOG_FLUSH_INTERVAL_MS / 1000)
+
+        th = threading.Thread(target=drain, daemon=True)
+        th.start()
+        handler = _quiet_handler(pump.push)
+        t0 = time.perf_counter()
+        rc = handler.run_cmd(self.emit_cmd(n, length), cwd=self.workdir)
+        seconds = time.perf_counter() - t0
+        stop.set()
+        th.join()
+        pump.drain()
+        return seconds, pump.stats().get("dropped", 0), rc
+
+    # --- 固定速率輸出時，從子行程寫出到 sink 收到的延遲 ---
+    def bench_latency(self):
+        n, rate = (200, 200) if self.quick else (1000, 500)
+        delays = []
+
+        def sink(msg):
+            now = time.time()
+            head = msg.split(" ", 1)[0]
+            try:
+                delays.append(now - float(head))
+            except ValueError:
+                pass
+
+        handler = _quiet_handler(sink)
+        handler.run_cmd(self.emit_cmd(n, 80, rate), cwd=self.workdir)
+        ms = [d * 1000 for d in delays]
+        self.results["latency.p50_ms"] = _percentile(ms, 50)
+        self.results["latency.p95_ms"] = _percentile(ms, 95)
+        self.results["latency.max_ms"] = max(ms) if ms else 0.0
+        self.note(f"延遲 {len(ms)} 行 @ {rate}/秒: p50 {self.results['latency.p50_ms']:.2f} ms，p95 {self.results['latency.p95_ms']:.2f} ms")
+
+    # --- 取消沒有任何輸出的子行程 ---
+    def bench_cancel(self):
+        rounds = 3 if self.quick else 8
+        handler = _quiet_handler()
+        stop_ms, wall_ms = [], []
+        for _ in range(rounds):
+            job = handler.submit("silent", self.workdir, handler.run_cmd,
+                                 f'"{sys.executable}" -c "import time; time.sleep(60)"')
+            deadline = time.monotonic() + 10
+            while job.process is None and time.monotonic() < deadline:
+                time.sleep(0.01)
+            time.sleep(0.2)
+            t0 = time.perf_counter()
+            handler.cancel_job(job.id)
+            handler.scheduler.wait_all(timeout=15)
+            wall_ms.append((time.perf_counter() - t0) * 1000)
+            stop_ms.append((job.last_stop_latency or 0.0) * 1000)
+        handler.scheduler.shutdown()
+        self.results["cancel.stop_p50_ms"] = _percentile(stop_ms, 50)
+        self.results["cancel.stop_max_ms"] = max(stop_ms)
+        self.results["cancel.job_p50_ms"] = _percentile(wall_ms, 50)
+        self.note(f"取消延遲: p50 {self.results['cancel.stop_p50_ms']:.1f} ms，工作結束 p50 {self.results['cancel.job_p50_ms']:.1f} ms")
+
+    # --- 清理引擎：產生的目錄樹 ---
+    def _make_tree(self, root, packages, files):
+        payload = b"\0" * 2048
+        for sub in ("build", "dist", "venv_build"):
+            for p in range(packages):
+                d = os.path.join(root, sub, f"pkg{p}")
+                os.makedirs(d, exist_ok=True)
+                for i in range(files):
+                    with open(os.path.join(d, f"f{i}.bin"), 'wb') as f:
+                        f.write(payload)
+        for p in range(packages):
+            d = os.path.join(root, "src", f"pkg{p}")
+            os.makedirs(os.path.join(d, "__pycache__"), exist_ok=True)
+            for i in range(files // 4):
+                with open(os.path.join(d, f"m{i}.py"), 'w') as f:
+                    f.write("x = 1\n")
+                with open(os.path.join(d, "__pycache__", f"m{i}.cpython.pyc"), 'wb') as f:
+                    f.write(payload)
+        with open(os.path.join(root, "bench.spec"), 'w') as f:
+            f.write("# spec\n")
+        return 3 * packages * files + 2 * packages * (files // 4) + 1
+
+    def bench_clean(self):
+        packages, files = (20, 50) if self.quick else (60, 100)
+        handler = _quiet_handler()
+        for mode in ("dry_run", "foreground", "background"):
+            root = os.path.join(self.workdir, f"clean_{mode}")
+            count = self._make_tree(root, packages, files)
+            t0 = time.perf_counter()
+            handler.action_clean(root, "venv_build", dry_run=(mode == "dry_run"), background=(mode == "background"))
+            seconds = time.perf_counter() - t0
+            self.results[f"clean.{mode}.seconds"] = seconds
+            self.results[f"clean.{mode}.files_per_s"] = count / seconds
+            self.note(f"清理 ({mode}) {count} 個檔案: {seconds:.3f} 秒")
+            if mode == "background":
+                # 等背景刪除結束，才不會影響後面的基準
+                trash = os.path.join(root, CLEAN_TRASH_DIR)
+                deadline = time.monotonic() + 60
+                while os.path.exists(trash) and time.monotonic() < deadline:
+                    time.sleep(0.05)
+                self.results["clean.background.purge_seconds"] = time.perf_counter() - t0
+
+    # --- action_build：冷建置、無變更、增量、從產物快取還原 ---
+    def bench_build(self):
+        project = os.path.join(self.workdir, "sample_project")
+        os.makedirs(os.path.join(project, "src"), exist_ok=True)
+        main_py = os.path.join(project, "src", "main.py")
+        with open(main_py, 'w', encoding='utf-8') as f:
+            f.write(SAMPLE_MAIN % 1)
+        handler = _quiet_handler(_cli_sink if self.verbose else None)
+        handler.artifacts = ArtifactStore(root=os.path.join(self.workdir, "artifacts"))
+
+        def build(label):
+            t0 = time.perf_counter()
+            rc = handler.action_build(project, "venv_build", "src/main.py", "BenchApp")
+            seconds = time.perf_counter() - t0
+            self.results[f"build.{label}.seconds"] = seconds
+            self.note(f"建置 ({label}): {seconds:.2f} 秒 (rc={rc})")
+            return rc
+
+        if build("cold") != 0:
+            self.note("冷建置失敗，略過其餘建置基準。")
+            return
+        build("warm_noop")
+        with open(main_py, 'w', encoding='utf-8') as f:
+            f.write(SAMPLE_MAIN % 2)
+        build("incremental")
+        # 還原成第一版內容：建置輸出被刪掉後應由產物快取直接還原
+        with open(main_py, 'w', encoding='utf-8') as f:
+            f.write(SAMPLE_MAIN % 1)
+        shutil.rmtree(os.path.join(project, "dist"), ignore_errors=True)
+        build("cache_restore")
+
+    def run(self, suites):
+        for name in suites:
+            t0 = time.perf_counter()
+            try:
+                getattr(self, f"bench_{name}")()
+            except Exception as e:
+                self.results[f"{name}.error"] = str(e)
+                _cli_sink(f"[{name}] 失敗: {e}")
+            _cli_sink(f"[{name}] 完成 ({time.perf_counter() - t0:.1f} 秒)")
+        return self.results
+
+
+def compare(results, baseline, threshold=BENCH_REGRESSION_THRESHOLD):
+    """與基準比較；傳回 [(指標, 基準值, 目前值, 變化比例, 是否退步)]"""
+    rows = []
+    for key, base in sorted(baseline.items()):
+        cur = results.get(key)
+        if not isinstance(base, (int, float)) or not isinstance(cur, (int, float)) or base == 0:
+            continue
+        change = (cur - base) / base
+        higher_is_better = key.endswith("_per_s")
+        regressed = (-change if higher_is_better else change) > threshold
+        rows.append((key, base, cur, change, regressed))
+    return rows
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="DevOpsTool bench", description="DevOpsTool 效能基準測試 (headless)")
+    parser.add_argument("--only", help=f"只執行指定項目，以逗號分隔 ({', '.join(BENCH_SUITES)})")
+    parser.add_argument("--skip", help="略過指定項目，以逗號分隔 (例如 build：需要網路安裝 PyInstaller)")
+    parser.add_argument("--quick", action="store_true", help="縮小資料量，快速跑完一輪")
+    parser.add_argument("--output", "-o", help="把結果 JSON 寫入檔案 (預設輸出到 stdout)")
+    parser.add_argument("--baseline", default=BENCH_BASELINE_FILE, help="比較用的基準檔")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次結果存為基準")
+    parser.add_argument("--threshold", type=float, default=BENCH_REGRESSION_THRESHOLD, help="退步門檻 (比例)")
+    parser.add_argument("--verbose", "-v", action="store_true", help="顯示各項細節")
+    args = parser.parse_args(argv)
+
+    suites = [s for s in (args.only.split(",") if args.only else BENCH_SUITES) if s]
+    skip = set(args.skip.split(",")) if args.skip else set()
+    unknown = [s for s in list(suites) + list(skip) if s not in BENCH_SUITES]
+    if unknown:
+        parser.error(f"未知的項目: {', '.join(unknown)}")
+    suites = [s for s in suites if s not in skip]
+
+    workdir = tempfile.mkdtemp(prefix="devops_bench_")
+    try:
+        results = Bench(workdir, quick=args.quick, verbose=args.verbose).run(suites)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "version": CURRENT_VERSION,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "quick": args.quick,
+            "suites": suites,
+        },
+        "results": results,
+    }
+
+    regressions = 0
+    saved = _load_json(args.baseline) or {}
+    baseline = saved.get("results")
+    if baseline and saved.get("meta", {}).get("quick") != args.quick:
+        _cli_sink("注意：基準與本次的 --quick 設定不同，資料量不一致，比較結果僅供參考。")
+    if baseline:
+        rows = compare(results, baseline, args.threshold)
+        report["comparison"] = [{"metric": k, "baseline": b, "current": c, "change": round(ch, 4), "regressed": r}
+                                for k, b, c, ch, r in rows]
+        regressions = sum(1 for row in rows if row[4])
+        _cli_sink(f"--- 與基準比較 ({args.baseline}) ---")
+        for key, base, cur, change, regressed in rows:
+            _cli_sink(f"  {key:<36} {base:>12.3f} → {cur:>12.3f}  {change * 100:+6.1f}%{'  ← 退步' if regressed else ''}")
+        _cli_sink(f"{regressions} 項指標退步超過 {args.threshold * 100:.0f}%。")
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    else:
+        _cli_sink(text)
+    if args.save_baseline:
+        ensure_app_data_dir()
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+        _cli_sink(f"已儲存基準: {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
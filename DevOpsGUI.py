@@ -0,0 +1,775 @@
+# DevOpsGUI.py
+# DevOpsTool 的圖形介面；只有啟動 GUI 時才會載入 customtkinter / tkinter
+import customtkinter as ctk
+import os
+import threading
+import sys
+import time
+import traceback
+from tkinter import filedialog, messagebox
+import tkinter.font as tkfont
+
+from DevOpsTool import (
+    APP_NAME, CURRENT_VERSION, GLOBAL_CONFIG_FILE, LOG_FLUSH_INTERVAL_MS,
+    ensure_app_data_dir, LogPump, LogStore, Telemetry, UpdateManager, Job, TaskHandler,
+)
+
+
+class LogView(ctk.CTkFrame):
+    """虛擬化日誌檢視：textbox 只放可見的幾十行，捲動位置由 LogStore 的行號決定"""
+    def __init__(self, master, store, font=("Consolas", 12), **kwargs):
+        super().__init__(master, **kwargs)
+        self.store = store
+        self._top = 0
+        self._rows = 40
+        self._follow = True
+        self._line_px = max(1, tkfont.Font(family=font[0], size=font[1]).metrics("linespace"))
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+        self.text = ctk.CTkTextbox(self, font=font, wrap="none", activate_scrollbars=False)
+        self.text.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+
+        self.text.bind("<Configure>", self._on_resize)
+        self.text.bind("<MouseWheel>", self._on_wheel)
+        self.text.bind("<Button-4>", lambda e: self._scroll_by(-3))
+        self.text.bind("<Button-5>", lambda e: self._scroll_by(3))
+
+    def append_lines(self, lines):
+        self.store.extend(lines)
+        if self._follow:
+            self._top = max(0, len(self.store) - self._rows)
+            self._render()
+        else:
+            self._update_scrollbar()
+
+    def _max_top(self):
+        return max(0, len(self.store) - self._rows)
+
+    def _scroll_to(self, top):
+        self._top = min(max(0, int(top)), self._max_top())
+        self._follow = self._top >= self._max_top()
+        self._render()
+
+    def _scroll_by(self, delta):
+        self._scroll_to(self._top + delta)
+        return "break"
+
+    def _on_wheel(self, event):
+        return self._scroll_by(-3 if event.delta > 0 else 3)
+
+    def _on_scrollbar(self, *args):
+        if not args:
+            return
+        if args[0] == "moveto":
+            self._scroll_to(float(args[1]) * len(self.store))
+        elif args[0] == "scroll":
+            step = int(float(args[1]))
+            if len(args) > 2 and args[2] == "pages":
+                step *= self._rows
+            self._scroll_by(step)
+
+    def _on_resize(self, event):
+        rows = max(1, event.height // self._line_px)
+        if rows != self._rows:
+            self._rows = rows
+            if self._follow:
+                self._top = self._max_top()
+            self._render()
+
+    def _render(self):
+        lines = self.store.get_lines(self._top, self._rows)
+        self.text.delete("1.0", "end")
+        if lines:
+            self.text.insert("end", "\n".join(lines))
+        self.text.see("end" if self._follow else "1.0")
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        total = len(self.store)
+        if total <= 0:
+            self.scrollbar.set(0.0, 1.0)
+            return
+        self.scrollbar.set(self._top / total, min(1.0, (self._top + self._rows) / total))
+
+
+class App(ctk.CTk):
+    # 語言字典
+    TRANSLATIONS = {
+        "zh": {
+            "global_settings": "⚙️ GitHub User",
+            "btn_save": "儲存",
+            "btn_update": "⟳ 檢查更新",
+            "recent_files": "最近開啟：",
+            "btn_browse": "📂 瀏覽新資料夾",
+            "entry_point": "入口檔案",
+            "output_name": "輸出檔名 (.exe)",
+            "repo_name": "Repo 名稱",
+            "btn_save_project": "💾 儲存專案設定",
+            "panel_title": "操作面板",
+            "btn_run": "▶ 執行測試",
+            "btn_clean": "🗑 清理環境",
+            "btn_build": "🔨 一鍵打包",
+            "btn_publish": "☁ 發布",
+            "lang_label": "語言 / Language",
+            "chk_full_rebuild": "強制完整重建",
+            "chk_watch_run": "執行時監看變更自動重啟",
+            "chk_clean_dry_run": "清理僅預覽 (dry-run)",
+            "btn_cache_stats": "📊 快取統計",
+            "no_jobs": "無執行中工作",
+            "btn_stop_job": "⏹ 停止選取工作",
+            "btn_stop_all": "⏹ 全部停止",
+            "btn_pipeline": "⛓ 執行管線",
+            "btn_batch": "📦 批次打包",
+            "btn_prefetch": "⬇ 預載套件",
+            "chk_startup_update": "啟動時檢查更新",
+            "btn_timing_stats": "⏱ 耗時統計",
+            "bundle_mode": "打包模式",
+            "btn_startup_bench": "🚀 啟動測速",
+            "btn_matrix": "🧮 多版本打包"
+        },
+        "en": {
+            "global_settings": "⚙️ GitHub User",
+            "btn_save": "Save",
+            "btn_update": "⟳ Check Update",
+            "recent_files": "Recent:",
+            "btn_browse": "📂 Browse Folder",
+            "entry_point": "Entry Point",
+            "output_name": "Output Name (.exe)",
+            "repo_name": "Repo Name",
+            "btn_save_project": "💾 Save Project Config",
+            "panel_title": "Control Panel",
+            "btn_run": "▶ Run Test",
+            "btn_clean": "🗑 Clean Env",
+            "btn_build": "🔨 Build EXE",
+            "btn_publish": "☁ Publish",
+            "lang_label": "Language",
+            "chk_full_rebuild": "Force full rebuild",
+            "chk_watch_run": "Watch & restart on change",
+            "chk_clean_dry_run": "Clean dry-run only",
+            "btn_cache_stats": "📊 Cache Stats",
+            "no_jobs": "No active jobs",
+            "btn_stop_job": "⏹ Stop Selected",
+            "btn_stop_all": "⏹ Stop All",
+            "btn_pipeline": "⛓ Run Pipeline",
+            "btn_batch": "📦 Batch Build",
+            "btn_prefetch": "⬇ Prefetch Wheels",
+            "chk_startup_update": "Check on startup",
+            "btn_timing_stats": "⏱ Timings",
+            "bundle_mode": "Bundle Mode",
+            "btn_startup_bench": "🚀 Startup Bench",
+            "btn_matrix": "🧮 Matrix Build"
+        }
+    }
+
+    def __init__(self):
+        super().__init__()
+        self.title(f"{APP_NAME} v{CURRENT_VERSION}")
+        self.geometry("900x750") # 稍微加高以容納語言選單
+
+        self.lang = "zh" # 預設語言
+
+        # 日誌先進佇列，由 _flush_log 定時批次寫入 log_view
+        self.log_pump = LogPump()
+        LogStore.prune_sessions()
+        self.log_store = LogStore(LogStore.new_session_path())
+        self._log_stats_t = 0.0
+
+        # handler 的日誌轉送到 UI
+        self.handler = TaskHandler(log_callback=self.ui_log)
+        self.updater = UpdateManager(app_instance=self, log_callback=self.ui_log)
+
+        self.project_path = None
+        self.recent_projects = []
+
+        self._threads = []
+        self._threads_lock = threading.Lock()
+        self._closing = False
+
+        self.grid_columnconfigure(1, weight=1)
+        self.grid_rowconfigure(3, weight=1)
+
+        # === 1. 全域設定與更新 ===
+        self.global_frame = ctk.CTkFrame(self)
+        self.global_frame.grid(row=0, column=0, columnspan=2, sticky="ew", padx=20, pady=(15, 5))
+
+        self.lbl_global_title = ctk.CTkLabel(self.global_frame, text=self.t("global_settings"), font=("Arial", 12, "bold"))
+        self.lbl_global_title.pack(side="left", padx=10)
+        
+        self.entry_git_user = ctk.CTkEntry(self.global_frame, width=150)
+        self.entry_git_user.pack(side="left", padx=5)
+
+        self.btn_save_global = ctk.CTkButton(self.global_frame, text=self.t("btn_save"), width=60, fg_color="#444", command=self.save_global_settings)
+        self.btn_save_global.pack(side="left", padx=5)
+
+        self.btn_update = ctk.CTkButton(self.global_frame, text=self.t("btn_update"), width=100, fg_color="#E67E22", hover_color="#D35400", command=self.thread_check_update)
+        self.btn_update.pack(side="right", padx=10)
+
+        self.chk_startup_update = ctk.CTkCheckBox(self.global_frame, text=self.t("chk_startup_update"))
+        self.chk_startup_update.pack(side="right", padx=5)
+
+        self.btn_cache_stats = ctk.CTkButton(self.global_frame, text=self.t("btn_cache_stats"), width=90, fg_color="#444", command=self.show_cache_stats)
+        self.btn_cache_stats.pack(side="right", padx=5)
+
+        self.btn_timing_stats = ctk.CTkButton(self.global_frame, text=self.t("btn_timing_stats"), width=90, fg_color="#444", command=self.show_timing_stats)
+        self.btn_timing_stats.pack(side="right", padx=5)
+
+        self.lbl_ver = ctk.CTkLabel(self.global_frame, text=f"v{CURRENT_VERSION}", text_color="gray")
+        self.lbl_ver.pack(side="right", padx=5)
+
+        # === 2. 專案選擇 ===
+        self.select_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.select_frame.grid(row=1, column=0, columnspan=2, sticky="ew", padx=20, pady=5)
+
+        self.lbl_recent = ctk.CTkLabel(self.select_frame, text=self.t("recent_files"))
+        self.lbl_recent.pack(side="left", padx=(0, 5))
+        
+        self.history_menu = ctk.CTkOptionMenu(self.select_frame, values=["無紀錄"], command=self.load_from_history, width=300)
+        self.history_menu.pack(side="left", padx=5)
+
+        self.btn_select = ctk.CTkButton(self.select_frame, text=self.t("btn_browse"), command=self.select_folder)
+        self.btn_select.pack(side="left", padx=10)
+
+        self.btn_batch = ctk.CTkButton(self.select_frame, text=self.t("btn_batch"), width=120, fg_color="#2C3E50", command=self.thread_batch_build)
+        self.btn_batch.pack(side="left", padx=5)
+
+        self.btn_prefetch = ctk.CTkButton(self.select_frame, text=self.t("btn_prefetch"), width=120, fg_color="#2C3E50", command=self.thread_prefetch)
+        self.btn_prefetch.pack(side="left", padx=5)
+
+        self.lbl_path = ctk.CTkLabel(self.select_frame, text="", text_color="gray")
+        self.lbl_path.pack(side="left", padx=10)
+
+        # === 3. 專案設定 ===
+        self.project_config_frame = ctk.CTkFrame(self)
+        self.project_config_frame.grid(row=2, column=0, columnspan=2, sticky="ew", padx=20, pady=5)
+
+        # 儲存 entry 與 label 引用以便切換語言
+        self.lbl_entry_point = None
+        self.lbl_output_name = None
+        self.lbl_repo_name = None
+
+        def create_entry(parent, key, default, col):
+            lbl = ctk.CTkLabel(parent, text=self.t(key), font=("Arial", 12, "bold"))
+            lbl.grid(row=0, column=col, padx=10, pady=5, sticky="w")
+            entry = ctk.CTkEntry(parent, width=180)
+            entry.grid(row=1, column=col, padx=10, pady=5)
+            entry.insert(0, default)
+            return entry, lbl
+
+        self.entry_entrypoint, self.lbl_entry_point = create_entry(self.project_config_frame, "entry_point", "src/main.py", 0)
+        self.entry_output, self.lbl_output_name = create_entry(self.project_config_frame, "output_name", "MyTool", 1)
+        self.entry_git_repo, self.lbl_repo_name = create_entry(self.project_config_frame, "repo_name", "MyRepo", 2)
+
+        # onefile 每次啟動都要解壓；onedir 啟動較快且增量建置只替換有變動的檔案
+        self.lbl_bundle_mode = ctk.CTkLabel(self.project_config_frame, text=self.t("bundle_mode"), font=("Arial", 12, "bold"))
+        self.lbl_bundle_mode.grid(row=0, column=3, padx=10, pady=5, sticky="w")
+        self.opt_bundle_mode = ctk.CTkOptionMenu(self.project_config_frame, values=list(TaskHandler.BUNDLE_MODES), width=100)
+        self.opt_bundle_mode.grid(row=1, column=3, padx=10, pady=5)
+
+        self.btn_save_project = ctk.CTkButton(self.project_config_frame, text=self.t("btn_save_project"), width=120, fg_color="#555", command=self.save_project_settings)
+        self.btn_save_project.grid(row=1, column=4, padx=20)
+
+        # === 4. 操作面板 (Sidebar) ===
+        self.sidebar = ctk.CTkFrame(self, width=180, corner_radius=0)
+        self.sidebar.grid(row=3, column=0, sticky="nsew", pady=10)
+        
+        self.lbl_panel = ctk.CTkLabel(self.sidebar, text=self.t("panel_title"), font=("Arial", 16, "bold"))
+        self.lbl_panel.pack(pady=20)
+
+        # 按鈕變數化並調整順序: Run -> Publish -> Build -> Clean
+        # 1. Run (執行) - 綠色
+        self.btn_run = self.create_btn(self.sidebar, "btn_run", self.thread_run, "#2CC985", "#229A66")
+        
+        # 2. Publish (發布) - 紫色 (移到第二順位)
+        self.btn_publish = self.create_btn(self.sidebar, "btn_publish", self.thread_publish, "#9B59B6", "#8E44AD")
+
+        # 3. Build (打包) - 藍色 (移到第三順位)
+        self.btn_build = self.create_btn(self.sidebar, "btn_build", self.thread_build, "#3498DB", "#2980B9")
+        self.btn_startup_bench = ctk.CTkButton(self.sidebar, text=self.t("btn_startup_bench"), command=self.thread_startup_bench, fg_color="#555", height=30)
+        self.btn_startup_bench.pack(pady=(0, 5), padx=20, fill="x")
+        self.btn_matrix = ctk.CTkButton(self.sidebar, text=self.t("btn_matrix"), command=self.thread_matrix, fg_color="#555", height=30)
+        self.btn_matrix.pack(pady=(0, 10), padx=20, fill="x")
+
+        # 4. Pipeline (devops_config.json 宣告的管線) - 青色
+        self.btn_pipeline = self.create_btn(self.sidebar, "btn_pipeline", self.thread_pipeline, "#16A085", "#117A65")
+
+        # 5. Clean (清理) - 紅色 (移到最後)
+        self.btn_clean = self.create_btn(self.sidebar, "btn_clean", self.thread_clean, "#E74C3C", "#C0392B")
+
+        self.chk_watch_run = ctk.CTkCheckBox(self.sidebar, text=self.t("chk_watch_run"))
+        self.chk_watch_run.pack(pady=(0, 5), padx=20, anchor="w")
+        self.chk_full_rebuild = ctk.CTkCheckBox(self.sidebar, text=self.t("chk_full_rebuild"))
+        self.chk_full_rebuild.pack(pady=(0, 5), padx=20, anchor="w")
+        self.chk_clean_dry_run = ctk.CTkCheckBox(self.sidebar, text=self.t("chk_clean_dry_run"))
+        self.chk_clean_dry_run.pack(pady=(0, 10), padx=20, anchor="w")
+
+        # 工作清單：可單獨取消或全部停止
+        self._job_labels = {}
+        self.job_menu = ctk.CTkOptionMenu(self.sidebar, values=[self.t("no_jobs")], width=140)
+        self.job_menu.pack(pady=(10, 5), padx=20, fill="x")
+        self.btn_stop_job = ctk.CTkButton(self.sidebar, text=self.t("btn_stop_job"), command=self.stop_selected_job, fg_color="#555", height=30)
+        self.btn_stop_job.pack(pady=5, padx=20, fill="x")
+        self.btn_stop_all = ctk.CTkButton(self.sidebar, text=self.t("btn_stop_all"), command=self.stop_all_jobs, fg_color="#7F1D1D", height=30)
+        self.btn_stop_all.pack(pady=5, padx=20, fill="x")
+
+        # === 5. 語言切換區 (新增於左下角) ===
+        self.lbl_lang = ctk.CTkLabel(self.sidebar, text=self.t("lang_label"))
+        self.lbl_lang.pack(side="bottom", pady=(0, 10))
+        
+        self.lang_menu = ctk.CTkOptionMenu(
+            self.sidebar, 
+            values=["繁體中文", "English"], 
+            command=self.change_language,
+            width=140
+        )
+        self.lang_menu.set("繁體中文") # Default
+        self.lang_menu.pack(side="bottom", pady=(10, 5), padx=20)
+
+        # === 6. 日誌區 ===
+        self.log_view = LogView(self, self.log_store, font=("Consolas", 12))
+        self.log_view.grid(row=3, column=1, padx=20, pady=(20, 0), sticky="nsew")
+
+        self.lbl_log_stats = ctk.CTkLabel(self, text="", text_color="gray", font=("Consolas", 11))
+        self.lbl_log_stats.grid(row=4, column=1, padx=20, pady=(2, 10), sticky="e")
+
+        self.load_global_settings()
+        self.ui_log(f"系統就緒。設定檔路徑: {GLOBAL_CONFIG_FILE}")
+
+        self.protocol("WM_DELETE_WINDOW", self.on_closing)
+        self.after(LOG_FLUSH_INTERVAL_MS, self._flush_log)
+        if self.chk_startup_update.get():
+            # 延遲到視窗出現之後才在 daemon 執行緒檢查，TTL 內完全不連網
+            self.updater.start_background_check()
+
+    # --- 語言處理邏輯 ---
+    def t(self, key):
+        """取得當前語言的文字"""
+        return self.TRANSLATIONS[self.lang].get(key, key)
+
+    def change_language(self, choice):
+        """切換語言並更新介面"""
+        self.lang = "zh" if choice == "繁體中文" else "en"
+        
+        # 更新所有靜態文字
+        self.lbl_global_title.configure(text=self.t("global_settings"))
+        self.btn_save_global.configure(text=self.t("btn_save"))
+        self.btn_update.configure(text=self.t("btn_update"))
+        self.lbl_recent.configure(text=self.t("recent_files"))
+        self.btn_select.configure(text=self.t("btn_browse"))
+        
+        self.lbl_entry_point.configure(text=self.t("entry_point"))
+        self.lbl_output_name.configure(text=self.t("output_name"))
+        self.lbl_repo_name.configure(text=self.t("repo_name"))
+        self.btn_save_project.configure(text=self.t("btn_save_project"))
+        
+        self.lbl_panel.configure(text=self.t("panel_title"))
+        self.btn_run.configure(text=self.t("btn_run"))
+        self.btn_clean.configure(text=self.t("btn_clean"))
+        self.btn_build.configure(text=self.t("btn_build"))
+        self.btn_publish.configure(text=self.t("btn_publish"))
+        self.lbl_lang.configure(text=self.t("lang_label"))
+        self.chk_watch_run.configure(text=self.t("chk_watch_run"))
+        self.chk_full_rebuild.configure(text=self.t("chk_full_rebuild"))
+        self.chk_clean_dry_run.configure(text=self.t("chk_clean_dry_run"))
+        self.btn_cache_stats.configure(text=self.t("btn_cache_stats"))
+        self.chk_startup_update.configure(text=self.t("chk_startup_update"))
+        self.btn_timing_stats.configure(text=self.t("btn_timing_stats"))
+        self.lbl_bundle_mode.configure(text=self.t("bundle_mode"))
+        self.btn_startup_bench.configure(text=self.t("btn_startup_bench"))
+        self.btn_matrix.configure(text=self.t("btn_matrix"))
+        self.btn_stop_job.configure(text=self.t("btn_stop_job"))
+        self.btn_stop_all.configure(text=self.t("btn_stop_all"))
+        self.btn_pipeline.configure(text=self.t("btn_pipeline"))
+        self.btn_batch.configure(text=self.t("btn_batch"))
+        self.btn_prefetch.configure(text=self.t("btn_prefetch"))
+        self.refresh_jobs()
+
+    def create_btn(self, parent, text_key, cmd, fg, hover):
+        """建立按鈕並回傳物件 (方便後續修改文字)"""
+        btn = ctk.CTkButton(parent, text=self.t(text_key), command=cmd, fg_color=fg, hover_color=hover, height=45)
+        btn.pack(pady=10, padx=20, fill="x")
+        return btn
+
+    def ui_log(self, msg):
+        # 任何執行緒皆可呼叫；實際寫入 UI 由主執行緒的 _flush_log 負責
+        self.log_pump.push(msg)
+
+    def _flush_log(self):
+        """主執行緒定時器：每批只做一次 insert 與一次 see"""
+        try:
+            lines = self.log_pump.drain()
+            if lines:
+                self.log_view.append_lines(lines)
+
+            now = time.monotonic()
+            if now - self._log_stats_t >= 1.0:
+                self._log_stats_t = now
+                self.refresh_jobs()
+                st = self.log_pump.stats()
+                self.lbl_log_stats.configure(
+                    text=f"log {st['in_rate']:.0f} 行/秒 | 待寫入 {st['pending']} | 丟棄 {st['dropped']} | 合併 {st['coalesced']} | 共 {len(self.log_store)} 行"
+                )
+        except Exception:
+            pass
+        if not self._closing:
+            try:
+                self.after(LOG_FLUSH_INTERVAL_MS, self._flush_log)
+            except Exception:
+                pass
+
+    def set_entry(self, entry, text):
+        entry.delete(0, "end")
+        entry.insert(0, text)
+
+    # --- 歷史與設定讀寫 ---
+    def load_global_settings(self):
+        # 主檔損毀時 ConfigStore 會改讀備份並記錄在日誌
+        data = self.handler.config.get(GLOBAL_CONFIG_FILE)
+        if data:
+            try:
+                self.set_entry(self.entry_git_user, data.get("git_user", ""))
+                self.recent_projects = data.get("recent_projects", [])
+                self.update_history_menu()
+                # 嘗試讀取上次的語言設定 (選用)
+                self.handler.scheduler.configure(data.get("max_jobs"), data.get("max_jobs_per_project"))
+                self.updater.check_ttl = data.get("update_check_ttl", self.updater.check_ttl)
+                if data.get("check_updates_on_startup", False):
+                    self.chk_startup_update.select()
+                saved_lang = data.get("language", "zh")
+                if saved_lang in ["zh", "en"]:
+                    self.lang = saved_lang
+                    self.lang_menu.set("繁體中文" if saved_lang == "zh" else "English")
+                    self.change_language("繁體中文" if saved_lang == "zh" else "English")
+            except Exception as e:
+                self.ui_log(f"讀取全域設定失敗: {e}\n{traceback.format_exc()}")
+
+    def save_global_settings(self, quiet=False):
+        data = {
+            "git_user": self.entry_git_user.get(), 
+            "recent_projects": self.recent_projects,
+            "language": self.lang,  # 儲存語言設定
+            "max_jobs": self.handler.scheduler.max_workers,
+            "max_jobs_per_project": self.handler.scheduler.per_project_limit,
+            "check_updates_on_startup": bool(self.chk_startup_update.get()),
+            "update_check_ttl": self.updater.check_ttl
+        }
+        # 先更新記憶體，短時間內的多次儲存合併成一次原子寫入；保留檔案中 UI 沒有的欄位
+        self.handler.config.update(GLOBAL_CONFIG_FILE, data)
+        if not quiet:
+            self.ui_log(f"全域設定已儲存 ({GLOBAL_CONFIG_FILE})")
+
+    def update_history_menu(self):
+        val = self.recent_projects[:10] if self.recent_projects else ["無紀錄"]
+        try:
+            self.history_menu.configure(values=val)
+        except Exception:
+            pass
+
+    def add_to_history(self, path):
+        if path in self.recent_projects:
+            try:
+                self.recent_projects.remove(path)
+            except Exception:
+                pass
+        self.recent_projects.insert(0, path)
+        self.update_history_menu()
+        try:
+            self.history_menu.set(path)
+        except Exception:
+            pass
+        self.save_global_settings(quiet=True)
+
+    def load_from_history(self, value):
+        if value == "無紀錄" or not os.path.exists(value):
+            return
+        self.project_path = value
+        self.lbl_path.configure(text=value)
+        self.load_project_settings(value)
+        self.add_to_history(value)
+        self.ui_log(f"已從歷史載入: {value}")
+
+    def select_folder(self):
+        folder = filedialog.askdirectory()
+        if folder:
+            self.project_path = folder
+            self.lbl_path.configure(text=folder)
+            self.load_project_settings(folder)
+            self.add_to_history(folder)
+
+    def load_project_settings(self, folder):
+        data = self.handler.config.get(os.path.join(folder, "devops_config.json"))
+        if data is not None:
+            try:
+                self.set_entry(self.entry_entrypoint, data.get("entry_point", "src/main.py"))
+                self.set_entry(self.entry_output, data.get("output_name", "MyTool"))
+                self.set_entry(self.entry_git_repo, data.get("git_repo", ""))
+                self.opt_bundle_mode.set(TaskHandler._bundle_mode(data))
+            except Exception:
+                pass
+        else:
+            self.set_entry(self.entry_git_repo, os.path.basename(folder))
+            self.opt_bundle_mode.set("onefile")
+
+    def save_project_settings(self):
+        if not self.project_path:
+            return
+        values = {
+            "entry_point": self.entry_entrypoint.get(),
+            "output_name": self.entry_output.get(),
+            "git_repo": self.entry_git_repo.get(),
+            "bundle_mode": self.opt_bundle_mode.get()
+        }
+        cfg = os.path.join(self.project_path, "devops_config.json")
+        # 每次執行動作前都會呼叫這裡，內容沒變就不寫入
+        data = self.handler.config.get(cfg, {})
+        if any(data.get(k) != v for k, v in values.items()):
+            # 保留 UI 沒有編輯的欄位（例如 pipeline）；動作經由同一個 ConfigStore 讀取，不必等寫入完成
+            self.handler.config.update(cfg, values)
+        self.ui_log("專案設定已儲存。")
+
+    # --- 執行緒 ---
+    def _run(self, func, *args):
+        if self._closing:
+            self.ui_log("系統正在關閉，無法啟動新工作。")
+            return
+
+        def wrapper():
+            try:
+                func(*args)
+            except Exception as e:
+                self.ui_log(f"工作執行失敗: {e}\n{traceback.format_exc()}")
+            finally:
+                with self._threads_lock:
+                    try:
+                        self._threads.remove(threading.current_thread())
+                    except Exception:
+                        pass
+
+        th = threading.Thread(target=wrapper, daemon=True)
+        with self._threads_lock:
+            self._threads.append(th)
+        th.start()
+
+    def _submit(self, name, func, *args):
+        """把專案動作交給排程器；同專案的工作依 per-project 上限排隊"""
+        if self._closing:
+            self.ui_log("系統正在關閉，無法啟動新工作。")
+            return None
+        job = self.handler.submit(name, self.project_path, func, *args)
+        if job.state == Job.QUEUED:
+            self.ui_log(f"[{job.tag}] 已排入佇列 (等待同專案或其他工作完成)")
+        self.refresh_jobs()
+        return job
+
+    def refresh_jobs(self):
+        active = self.handler.scheduler.active()
+        # 標籤含即時 CPU / 記憶體數值，會隨時間變動；以工作 ID 保留目前的選取
+        selected = self._job_labels.get(self.job_menu.get())
+        self._job_labels = {}
+        current = None
+        for job in active:
+            label = f"{job.tag} [{job.state}] {os.path.basename(job.project or '')}"
+            if job.state == Job.RUNNING and (job.cpu_seconds or job.peak_rss):
+                label += f" | CPU {job.cpu_seconds:.0f}s RSS {job.rss / 1024 ** 2:.0f}/{job.peak_rss / 1024 ** 2:.0f} MB"
+            self._job_labels[label] = job.id
+            if job.id == selected:
+                current = label
+        values = list(self._job_labels) or [self.t("no_jobs")]
+        try:
+            self.job_menu.configure(values=values)
+            self.job_menu.set(current or values[0])
+        except Exception:
+            pass
+
+    def stop_selected_job(self):
+        job_id = self._job_labels.get(self.job_menu.get())
+        if job_id is not None:
+            self.handler.cancel_job(job_id)
+        self.refresh_jobs()
+
+    def stop_all_jobs(self):
+        for job in self.handler.scheduler.active():
+            self.handler.cancel_job(job.id)
+        self.refresh_jobs()
+
+    def check_ready(self):
+        if not self.project_path:
+            messagebox.showerror("錯誤", "請先選擇專案！")
+            return False
+        return True
+
+    def thread_run(self):
+        if self.check_ready():
+            self.save_project_settings()
+            self._submit("run", self.handler.action_run, self.project_path, self.entry_entrypoint.get(),
+                         bool(self.chk_watch_run.get()))
+
+    def thread_clean(self):
+        if self.check_ready():
+            self._submit("clean", self.handler.action_clean, self.project_path, "venv_build", bool(self.chk_clean_dry_run.get()))
+
+    def thread_build(self):
+        if self.check_ready():
+            self.save_project_settings()
+            self._submit("build", self.handler.action_build, self.project_path, "venv_build", self.entry_entrypoint.get(), self.entry_output.get(),
+                         bool(self.chk_full_rebuild.get()))
+
+    def thread_matrix(self):
+        if self.check_ready():
+            self.save_project_settings()
+            self._submit("matrix", self.handler.action_build_matrix, self.project_path, "venv_build", self.entry_entrypoint.get(),
+                         self.entry_output.get(), bool(self.chk_full_rebuild.get()))
+
+    def thread_startup_bench(self):
+        if self.check_ready():
+            self.save_project_settings()
+            self._submit("startup", self.handler.action_startup_bench, self.project_path, self.entry_output.get())
+
+    def thread_publish(self):
+        if self.check_ready():
+            self.save_project_settings()
+            self.save_global_settings()
+            self._submit("publish", self.handler.action_publish, self.project_path, self.entry_git_user.get(), self.entry_git_repo.get())
+
+    def thread_prefetch(self):
+        """把所有最近專案的套件預先下載到共用 wheelhouse"""
+        projects = [p for p in self.recent_projects if os.path.isdir(p)]
+        if not projects:
+            messagebox.showerror("錯誤", "最近開啟清單中沒有專案！")
+            return
+        if self._closing:
+            self.ui_log("系統正在關閉，無法啟動新工作。")
+            return
+        self.handler.submit("prefetch", None, self.handler.action_prefetch, projects)
+        self.refresh_jobs()
+
+    def thread_batch_build(self):
+        """平行建置所有最近開啟的專案"""
+        projects = [p for p in self.recent_projects if os.path.isdir(p)]
+        if not projects:
+            messagebox.showerror("錯誤", "最近開啟清單中沒有可建置的專案！")
+            return
+        if not messagebox.askyesno("批次打包", f"將平行建置 {len(projects)} 個最近專案，確定嗎？"):
+            return
+        if self._closing:
+            self.ui_log("系統正在關閉，無法啟動新工作。")
+            return
+        self.handler.submit("batch", None, self.handler.action_batch_build, projects, None, bool(self.chk_full_rebuild.get()))
+        self.refresh_jobs()
+
+    def thread_pipeline(self):
+        if self.check_ready():
+            self.save_project_settings()
+            defaults = {
+                "entry_point": self.entry_entrypoint.get(),
+                "output_name": self.entry_output.get(),
+                "git_repo": self.entry_git_repo.get(),
+                "git_user": self.entry_git_user.get(),
+            }
+            self._submit("pipeline", self.handler.action_pipeline, self.project_path, defaults)
+
+    def thread_check_update(self):
+        self._run(self.updater.check_for_updates)
+
+    def show_cache_stats(self):
+        st = self.handler.artifacts.stats()
+        mb = 1024 * 1024
+        text = (f"命中率: {st['hit_rate'] * 100:.1f}% ({st['hits']} 命中 / {st['misses']} 未命中)\n"
+                f"省下: {st['bytes_saved'] / mb:.1f} MB，約 {st['seconds_saved']:.0f} 秒建置時間\n"
+                f"快取: {st['entries']} 個產物，{st['total_bytes'] / mb:.1f} / {st['max_bytes'] / mb:.0f} MB")
+        self.ui_log("--- 產物快取統計 ---\n" + text)
+        messagebox.showinfo("產物快取統計", text)
+
+    def show_timing_stats(self):
+        """顯示遙測檔中各步驟的 p50 / p95（已選專案時只顯示該專案）"""
+        rows = self.handler.telemetry.summary(self.project_path)
+        win = ctk.CTkToplevel(self)
+        win.title(f"{self.t('btn_timing_stats')} - {os.path.basename(self.project_path) if self.project_path else APP_NAME}")
+        win.geometry("720x420")
+        box = ctk.CTkTextbox(win, font=("Consolas", 12), wrap="none")
+        box.pack(fill="both", expand=True, padx=10, pady=10)
+        box.insert("end", Telemetry.format_summary(rows) + f"\n\n{self.handler.telemetry.path}")
+        box.configure(state="disabled")
+        win.after(100, win.lift)
+
+    def on_closing(self, force: bool = False):
+        if self._closing and not force:
+            return
+        self._closing = True
+        self.ui_log("應用程序正在關閉，停止背景工作...")
+
+        try:
+            self.handler.stop_all()
+        except Exception:
+            pass
+
+        try:
+            self.updater.close()
+        except Exception:
+            pass
+
+        try:
+            self.handler.config.flush()
+        except Exception:
+            pass
+
+        try:
+            self.log_store.extend(self.log_pump.drain())
+            self.log_store.close()
+        except Exception:
+            pass
+
+        wait_start = time.time()
+        timeout = 5 if not force else 1
+        try:
+            self.handler.scheduler.shutdown()
+            self.handler.scheduler.wait_all(timeout=timeout)
+        except Exception:
+            pass
+        with self._threads_lock:
+            threads_copy = list(self._threads)
+        for t in threads_copy:
+            remaining = timeout - (time.time() - wait_start)
+            if remaining <= 0:
+                break
+            try:
+                t.join(timeout=remaining)
+            except Exception:
+                pass
+
+        with self._threads_lock:
+            alive = [t for t in self._threads if t.is_alive()]
+        if alive:
+            try:
+                self.handler.stop_all()
+            except Exception:
+                pass
+            for t in alive:
+                try:
+                    t.join(timeout=1)
+                except Exception:
+                    pass
+
+        try:
+            self.destroy()
+        except Exception:
+            pass
+        try:
+            sys.exit(0)
+        except Exception:
+            pass
+
+
+def main():
+    ensure_app_data_dir()
+    # 設定外觀
+    ctk.set_appearance_mode("Dark")
+    ctk.set_default_color_theme("dark-blue")
+    app = App()
+    app.mainloop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+# DevOpsSelfTest.py
+"""DevOpsTool 自我檢查 (headless)：以本機 http.server 模擬更新伺服器，驗證續傳下載與檢查碼處理"""
+import os
+import sys
+import gzip
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from DevOpsTool import UpdateManager, _cli_sink
+
+SELFTEST_SUITES = ("download",)
+SELFTEST_PAYLOAD_BYTES = 3 * 1024 * 1024 + 123   # 非整數 MB，檢查最後一個區塊
+
+
+class FakeUpdateServer:
+    """只在 127.0.0.1 監聽的更新伺服器替身：支援 Range / If-Range，可模擬斷線、換版與錯誤檢查碼"""
+    def __init__(self, payload, etag='"v1"'):
+        self.payload = payload
+        self.etag = etag
+        self.sha256 = hashlib.sha256(payload).hexdigest()
+        self.drop_after = None      # 下一次回應送出這麼多位元組後直接斷線（只生效一次）
+        self.gzip = None            # "auto"：用戶端接受 gzip 時壓縮；"always"：無視 Accept-Encoding 一律壓縮
+        self.requests = []          # (path, Range, If-Range, 狀態碼, 送出的本文位元組, Accept-Encoding)
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                rng, if_range = self.headers.get("Range"), self.headers.get("If-Range")
+                if self.path == "/app.exe.sha256":
+                    self._reply(200, f"{server.sha256}  app.exe\n".encode('ascii'), rng, if_range)
+                elif self.path == "/app.exe":
+                    server._serve_payload(self, rng, if_range)
+                else:
+                    self._reply(404, b"", rng, if_range)
+
+            def _reply(self, status, body, rng, if_range, headers=()):
+                self.send_response(status)
+                for key, val in headers:
+                    self.send_header(key, val)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                server.requests.append((self.path, rng, if_range, status, len(body),
+                                        self.headers.get("Accept-Encoding")))
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-update-server", daemon=True)
+
+    def _serve_payload(self, handler, rng, if_range):
+        accept = handler.headers.get("Accept-Encoding") or ""
+        # 與一般 CDN 相同：Range 套用在壓縮後的內容上
+        encoded = self.gzip == "always" or (self.gzip == "auto" and "gzip" in accept)
+        entity = gzip.compress(self.payload, mtime=0) if encoded else self.payload
+        size = len(entity)
+        start = 0
+        # If-Range 不符 (檔案已換版) 時忽略 Range，回傳完整的 200
+        if rng and rng.startswith("bytes=") and (if_range is None or if_range == self.etag):
+            start = int(rng[6:].split("-")[0])
+            if start >= size:
+                handler._reply(416, b"", rng, if_range, [("Content-Range", f"bytes */{size}")])
+                return
+        body = entity[start:]
+        handler.send_response(206 if start else 200)
+        handler.send_header("ETag", self.etag)
+        if encoded:
+            handler.send_header("Content-Encoding", "gzip")
+        handler.send_header("Accept-Ranges", "bytes")
+        handler.send_header("Content-Length", str(len(body)))
+        if start:
+            handler.send_header("Content-Range", f"bytes {start}-{size - 1}/{size}")
+        handler.end_headers()
+        if self.drop_after is not None:
+            body, self.drop_after = body[:self.drop_after], None
+            handler.close_connection = True
+        handler.wfile.write(body)
+        handler.wfile.flush()
+        self.requests.append((handler.path, rng, if_range, 206 if start else 200, len(body), accept))
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def downloads(self):
+        return [r for r in self.requests if r[0] == "/app.exe"]
+
+
+class SelfTest:
+    """逐項執行檢查，收集 (名稱, 是否通過, 說明)"""
+    def __init__(self, workdir, verbose=False):
+        self.workdir = workdir
+        self.verbose = verbose
+        self.results = []
+
+    def note(self, msg):
+        if self.verbose:
+            _cli_sink(msg)
+
+    def check(self, name, ok, detail=""):
+        self.results.append((name, bool(ok), detail))
+        _cli_sink(f"  {'通過' if ok else '失敗'}  {name}" + (f"：{detail}" if detail else ""))
+
+    def _updater(self):
+        return UpdateManager(None, self.note)
+
+    # --- download_update：續傳、416、換版重下、檢查碼不符、壓縮傳輸 ---
+    def test_download(self):
+        payload = os.urandom(SELFTEST_PAYLOAD_BYTES)
+        part = os.path.join(self.workdir, "update.part")
+        meta = part + ".json"
+
+        # 1. 第一次回應送到一半斷線，應以 Range + If-Range 續傳 (206)，且不重抓已寫入磁碟的部分
+        #    (斷線時尚未寫入的最後一個區塊會重抓，因此續傳位置可略早於斷點)
+        with FakeUpdateServer(payload) as srv:
+            drop = len(payload) // 3
+            srv.drop_after = drop
+            path = self._updater().download_update(srv.url + "/app.exe", srv.url + "/app.exe.sha256", part)
+            with open(path, 'rb') as f:
+                same = f.read() == payload
+            reqs = srv.downloads()
+            offset = int(reqs[1][1][6:].split("-")[0]) if len(reqs) == 2 and reqs[1][1] else 0
+            resumed = len(reqs) == 2 and reqs[1][3] == 206 and reqs[1][2] == srv.etag and 0 < offset <= drop
+            served = sum(r[4] for r in reqs)
+            self.check("斷線後以 206 續傳", same and resumed and served < 2 * len(payload) and not os.path.exists(meta),
+                       f"{len(reqs)} 次請求，自 {offset} 續傳，共送出 {served} / {len(payload)} 位元組")
+
+        # 2. 部分檔其實已完整：伺服器回 416，直接以本地檔案驗證
+        with FakeUpdateServer(payload) as srv:
+            with open(part, 'wb') as f:
+                f.write(payload)
+            with open(meta, 'w', encoding='utf-8') as f:
+                json.dump({"url": srv.url + "/app.exe", "sha256": srv.sha256, "etag": srv.etag}, f)
+            path = self._updater().download_update(srv.url + "/app.exe", srv.url + "/app.exe.sha256", part)
+            reqs = srv.downloads()
+            self.check("檔尾 416 時直接驗證", os.path.exists(path) and [r[3] for r in reqs] == [416],
+                       f"回應 {[r[3] for r in reqs]}")
+
+        # 3. 伺服器已換版 (ETag 不同)：If-Range 不符而回 200，應從頭重新下載而不是接在舊內容後面
+        with FakeUpdateServer(payload, etag='"v2"') as srv:
+            with open(part, 'wb') as f:
+                f.write(os.urandom(len(payload) // 2))
+            with open(meta, 'w', encoding='utf-8') as f:
+                json.dump({"url": srv.url + "/app.exe", "sha256": srv.sha256, "etag": '"v1"'}, f)
+            path = self._updater().download_update(srv.url + "/app.exe", srv.url + "/app.exe.sha256", part)
+            with open(path, 'rb') as f:
+                same = f.read() == payload
+            reqs = srv.downloads()
+            self.check("換版時 200 重新下載", same and [r[3] for r in reqs] == [200] and reqs[0][2] == '"v1"',
+                       f"回應 {[r[3] for r in reqs]}")
+
+        # 4. 檢查碼不符：拋出例外並刪除部分檔與續傳資訊，下次不會接著壞掉的內容續傳
+        with FakeUpdateServer(payload) as srv:
+            srv.sha256 = "0" * 64
+            for p in (part, meta):
+                if os.path.exists(p):
+                    os.remove(p)
+            try:
+                self._updater().download_update(srv.url + "/app.exe", srv.url + "/app.exe.sha256", part)
+                raised = None
+            except ValueError as e:
+                raised = e
+            self.check("SHA-256 不符時捨棄下載檔", raised is not None and not os.path.exists(part) and not os.path.exists(meta),
+                       str(raised) if raised else "沒有拋出例外")
+
+        # 5. 會壓縮的伺服器：要求 identity 後應拿到原始位元組，續傳位置與伺服器的 Range 一致
+        compressible = payload[:len(payload) // 2] + bytes(len(payload) - len(payload) // 2)
+        with FakeUpdateServer(compressible) as srv:
+            srv.gzip = "auto"
+            srv.drop_after = len(compressible) // 3
+            path = self._updater().download_update(srv.url + "/app.exe", srv.url + "/app.exe.sha256", part)
+            with open(path, 'rb') as f:
+                same = f.read() == compressible
+            reqs = srv.downloads()
+            identity = all(r[5] == "identity" for r in reqs)
+            self.check("要求不壓縮以便續傳", same and identity and [r[3] for r in reqs] == [200, 206],
+                       f"回應 {[r[3] for r in reqs]}，Accept-Encoding {sorted({r[5] for r in reqs})}")
+
+        # 6. 無視 Accept-Encoding 一律壓縮的伺服器：不能續傳，應改為完整下載而非寫出損毀檔
+        with FakeUpdateServer(compressible) as srv:
+            srv.gzip = "always"
+            srv.drop_after = 4096
+            path = self._updater().download_update(srv.url + "/app.exe", srv.url + "/app.exe.sha256", part)
+            with open(path, 'rb') as f:
+                same = f.read() == compressible
+            reqs = srv.downloads()
+            self.check("強制壓縮時改為完整下載", same and [r[1] for r in reqs] == [None, None],
+                       f"回應 {[r[3] for r in reqs]}，Range {[r[1] for r in reqs]}")
+
+    def run(self, suites):
+        for name in suites:
+            _cli_sink(f"[{name}]")
+            try:
+                getattr(self, f"test_{name}")()
+            except Exception as e:
+                self.check(name, False, f"{e.__class__.__name__}: {e}")
+        return self.results
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="DevOpsTool selftest", description="DevOpsTool 自我檢查 (headless，不連外網)")
+    parser.add_argument("--only", help=f"只執行指定項目，以逗號分隔 ({', '.join(SELFTEST_SUITES)})")
+    parser.add_argument("--verbose", "-v", action="store_true", help="顯示被測功能的日誌")
+    args = parser.parse_args(argv)
+
+    suites = [s for s in (args.only.split(",") if args.only else SELFTEST_SUITES) if s]
+    unknown = [s for s in suites if s not in SELFTEST_SUITES]
+    if unknown:
+        parser.error(f"未知的項目: {', '.join(unknown)}")
+
+    workdir = tempfile.mkdtemp(prefix="devops_selftest_")
+    try:
+        results = SelfTest(workdir, verbose=args.verbose).run(suites)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    failed = sum(1 for _, ok, _ in results if not ok)
+    _cli_sink(f"{len(results) - failed}/{len(results)} 項通過。")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
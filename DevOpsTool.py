@@ -1,18 +1,29 @@
 # DevOpsTool.py
-import customtkinter as ctk
+import time
+_IMPORT_T0 = time.perf_counter()
 import os
 import subprocess
 import shutil
 import threading
 import json
 import sys
-import time
-import requests  # 需 pip install requests
-from packaging import version  # 需 pip install packaging
-from tkinter import filedialog, messagebox
 import signal
 import tempfile
 import traceback
+import collections
+import hashlib
+import glob
+import ast
+import codecs
+import queue
+import selectors
+import fnmatch
+import shlex
+import re
+import html
+import copy
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
 
 # ================= 設定區 (開發者請修改這裡) =================
 APP_NAME = "DevOpsTool"
@@ -26,12 +37,10 @@ GITHUB_REPO = "REPO"     # 你的儲存庫名稱
 VERSION_URL = f"https://raw.githubusercontent.com/{GITHUB_USER}/{GITHUB_REPO}/main/version.txt"
 # 2. 新版執行檔下載點
 EXE_DOWNLOAD_URL = f"https://github.com/{GITHUB_USER}/{GITHUB_REPO}/releases/latest/download/DevOpsTool.exe"
+# 3. 執行檔的 SHA-256 檢查碼 (sha256sum 格式，安裝前必須比對)
+EXE_SHA256_URL = EXE_DOWNLOAD_URL + ".sha256"
 # ==========================================================
 
-# 設定外觀
-ctk.set_appearance_mode("Dark")
-ctk.set_default_color_theme("dark-blue")
-
 # --- 設定檔路徑遷移至 AppData ---
 if os.name == 'nt':
     appdata_env = os.getenv('APPDATA') or os.path.expanduser('~')
@@ -39,18 +48,868 @@ if os.name == 'nt':
 else:
     APP_DATA_DIR = os.path.join(os.path.expanduser('~'), ".config", APP_NAME)
 
-if not os.path.exists(APP_DATA_DIR):
-    os.makedirs(APP_DATA_DIR, exist_ok=True)
-
 GLOBAL_CONFIG_FILE = os.path.join(APP_DATA_DIR, "tool_settings.json")
 
-# 自動遷移舊設定
-local_config = "tool_settings.json"
-if os.path.exists(local_config) and not os.path.exists(GLOBAL_CONFIG_FILE):
+
+def _load_json(path):
+    """讀取 JSON 檔；不存在或格式錯誤時傳回 None"""
     try:
-        shutil.copy(local_config, GLOBAL_CONFIG_FILE)
-    except Exception:
-        pass
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def ensure_app_data_dir():
+    """建立 APP_DATA_DIR 並自動遷移舊設定（啟動時呼叫，import 時不做任何 I/O）"""
+    if not os.path.exists(APP_DATA_DIR):
+        os.makedirs(APP_DATA_DIR, exist_ok=True)
+
+    # 自動遷移舊設定
+    local_config = "tool_settings.json"
+    if os.path.exists(local_config) and not os.path.exists(GLOBAL_CONFIG_FILE):
+        try:
+            shutil.copy(local_config, GLOBAL_CONFIG_FILE)
+        except Exception:
+            pass
+
+# --- 日誌幫浦參數 ---
+LOG_FLUSH_INTERVAL_MS = 50      # UI 批次寫入間隔
+LOG_MAX_BATCH = 5000            # 單次寫入最多行數
+LOG_MAX_PENDING = 200000        # 佇列上限，超過即丟棄最舊的行
+LOG_RING_LINES = 5000           # 記憶體中保留的最近行數，更舊的只存在 session 檔
+LOG_DIR = os.path.join(APP_DATA_DIR, "logs")
+LOG_SESSION_KEEP = 10           # 保留最近幾個 session 日誌檔
+
+# --- 指令輸出讀取參數 ---
+CMD_POLL_INTERVAL = 0.1         # 無輸出時檢查取消/逾時的間隔 (秒)
+CMD_READ_CHUNK = 65536          # 每次讀取的原始位元組數
+CMD_KILL_GRACE = 3.0            # 送出終止訊號後多久仍未結束就強制 kill (秒)
+CMD_MAX_LINE = 65536            # 沒有換行的超長輸出，累積到此長度就先送出
+
+# --- 工作排程參數 ---
+JOB_MAX_WORKERS = max(2, os.cpu_count() or 2)   # 同時執行的工作上限
+JOB_PER_PROJECT_LIMIT = 1                       # 同一專案同時執行的工作上限
+JOB_HISTORY_KEEP = 50                           # 保留已結束工作的數量
+JOB_LOG_LINES = 2000                            # 每個工作保留的最近日誌行數
+BATCH_MEM_PER_BUILD = 1.5 * 1024 ** 3           # 批次建置時每個 PyInstaller 行程預估的記憶體用量
+RESOURCE_SAMPLE_INTERVAL = 1.0                  # 工作 process tree 的 CPU / RSS 取樣間隔 (秒)
+
+# --- 清理引擎參數 ---
+CLEAN_WORKERS = min(16, (os.cpu_count() or 2) * 2)  # 平行刪除的執行緒數
+CLEAN_TRASH_DIR = ".devops_trash"                   # 先改名搬到這裡，再於背景刪除
+CLEAN_SPLIT_DEPTH = 3                               # 大目錄拆成子樹平行刪除的深度
+
+# --- 監看模式 (action_run 檔案變更後自動重啟) ---
+WATCH_PATTERNS = ("*.py",)       # 預設監看的檔案；可在 devops_config.json 以 watch_patterns 覆寫
+WATCH_DEBOUNCE = 0.3             # 最後一次變更後靜止這麼久才重啟 (秒)
+WATCH_DEBOUNCE_MAX = 2.0         # 持續有變更時最多延後的秒數
+WATCH_POLL_INTERVAL = 1.0        # 無 inotify 時的輪詢間隔下限 (秒)
+WATCH_POLL_CPU_SHARE = 0.05      # 輪詢掃描最多佔用的時間比例；大型專案自動拉長間隔
+
+# --- 建置產物快取 (跨專案共用，以建置輸入指紋定址) ---
+ARTIFACT_CACHE_DIR = os.path.join(APP_DATA_DIR, "artifacts")
+ARTIFACT_CACHE_MAX_BYTES = 2 * 1024 ** 3   # 超過即依 LRU 淘汰
+
+# --- 共用 wheelhouse (所有專案的套件安裝優先由此離線安裝) ---
+WHEELHOUSE_DIR = os.path.join(APP_DATA_DIR, "wheelhouse")
+WHEEL_PREFETCH_WORKERS = 4                 # 預先下載時同時執行的 pip 行程數
+WHEEL_SOURCE_SUFFIX = ".source.json"       # 由 sdist 建置的 wheel 旁記錄自身與來源 sdist 的雜湊
+
+# --- 更新下載參數 ---
+UPDATE_PARTIAL_FILE = os.path.join(APP_DATA_DIR, "update_download.part")  # 中斷後可續傳
+UPDATE_CHUNK_MIN = 64 * 1024
+UPDATE_CHUNK_MAX = 4 * 1024 * 1024
+UPDATE_CONNECT_TIMEOUT = 10
+UPDATE_READ_TIMEOUT = 60
+UPDATE_RETRIES = 5                   # 連線中斷後自動續傳的次數
+UPDATE_PROGRESS_INTERVAL = 1.0       # 進度日誌的最短間隔 (秒)
+UPDATE_CHECK_CACHE_FILE = os.path.join(APP_DATA_DIR, "update_check.json")  # ETag / Last-Modified 與上次結果
+UPDATE_CHECK_TTL = 6 * 3600          # 這段時間內重複檢查直接使用快取，不連網 (可由全域設定覆寫)
+UPDATE_STARTUP_DELAY_MS = 5000       # 啟動時背景檢查的延遲，讓視窗先完成繪製
+
+# --- 耗時遙測 (每個指令與動作一行 JSON) ---
+TELEMETRY_FILE = os.path.join(APP_DATA_DIR, "telemetry.jsonl")
+TELEMETRY_MAX_BYTES = 20 * 1024 * 1024   # 超過即輪替為 telemetry.jsonl.1
+
+# --- 打包內容分析 (每次建置後讀取 PyInstaller 工作目錄的 TOC 與 xref) ---
+BUNDLE_REPORT_FILE = ".devops_bundle.json"   # 位於專案 build/，保存上次建置的分析結果供比對
+BUNDLE_TOP_N = 10                            # 列出的套件、資料檔與排除建議數量
+BUNDLE_DIFF_MIN_BYTES = 64 * 1024            # 與上次相比變動小於此值的套件不列出
+
+# --- 啟動測速 (重複啟動建置產物，量測冷/熱啟動延遲) ---
+STARTUP_BENCH_RUNS = 5
+STARTUP_BENCH_TIMEOUT = 60                   # 單次啟動的逾時 (秒)
+STARTUP_SMOKE_ARGS = "--smoke-test"          # 傳給產物的參數；可在 devops_config.json 以 smoke_test_args 覆寫
+STARTUP_SMOKE_ENV = "DEVOPS_SMOKE_TEST"      # 同時設為 1，程式可擇一判斷，完成初始化後立即結束
+
+# --- 設定檔儲存 (tool_settings.json 與各專案的 devops_config.json) ---
+CONFIG_SAVE_DELAY = 0.5                      # 連續修改合併成一次寫入的延遲 (秒)
+CONFIG_BACKUP_SUFFIX = ".bak"                # 上一份完好設定的備份，主檔損毀時改讀此檔
+
+
+class LogPump:
+    """執行緒安全的日誌佇列：工作執行緒只負責 push，主執行緒定時 drain 後一次寫入 UI"""
+    def __init__(self, max_pending=LOG_MAX_PENDING, max_batch=LOG_MAX_BATCH):
+        self.max_pending = max_pending
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._pending = collections.deque()
+        self._last_line = None
+        self._repeat = 0
+
+        # 統計
+        self.total_in = 0
+        self.total_out = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.in_rate = 0.0
+        self.out_rate = 0.0
+        self._rate_t0 = time.monotonic()
+        self._rate_in0 = 0
+        self._rate_out0 = 0
+
+    def _flush_repeat_locked(self):
+        if self._repeat:
+            self._append_locked(f"    ... 上一行重複 {self._repeat} 次")
+            self._repeat = 0
+
+    def _append_locked(self, text):
+        if len(self._pending) >= self.max_pending:
+            self._pending.popleft()
+            self.dropped += 1
+        self._pending.append(text)
+
+    def push(self, msg):
+        text = str(msg)
+        with self._lock:
+            self.total_in += 1
+            # 連續重複的行（例如進度列）只計數不入列
+            if text == self._last_line:
+                self._repeat += 1
+                self.coalesced += 1
+                return
+            self._flush_repeat_locked()
+            self._last_line = text
+            self._append_locked(text)
+
+    def drain(self):
+        """取出一批待寫入的行（最多 max_batch 行）"""
+        with self._lock:
+            self._flush_repeat_locked()
+            n = min(len(self._pending), self.max_batch)
+            lines = [self._pending.popleft() for _ in range(n)]
+            if lines:
+                self.total_out += n
+                self.batches += 1
+            self._update_rate_locked()
+        return lines
+
+    def _update_rate_locked(self):
+        now = time.monotonic()
+        dt = now - self._rate_t0
+        if dt >= 1.0:
+            self.in_rate = (self.total_in - self._rate_in0) / dt
+            self.out_rate = (self.total_out - self._rate_out0) / dt
+            self._rate_t0 = now
+            self._rate_in0 = self.total_in
+            self._rate_out0 = self.total_out
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_rate": self.in_rate,
+                "out_rate": self.out_rate,
+                "total_in": self.total_in,
+                "total_out": self.total_out,
+                "pending": len(self._pending),
+                "dropped": self.dropped,
+                "coalesced": self.coalesced,
+                "batches": self.batches,
+            }
+
+
+class LogStore:
+    """有界日誌儲存：記憶體只保留最近 ring_size 行，所有行同時寫入本次 session 檔，
+    舊行以稀疏索引（每 index_step 行記一個檔案位移）從檔案分頁讀回"""
+    def __init__(self, path, ring_size=LOG_RING_LINES, index_step=1024):
+        self.path = path
+        self.index_step = index_step
+        self._lock = threading.Lock()
+        self._ring = collections.deque(maxlen=ring_size)
+        self._count = 0
+        self._offset = 0
+        self._index = []
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._fh = open(path, 'wb')
+
+    @staticmethod
+    def new_session_path():
+        name = time.strftime("session_%Y%m%d_%H%M%S") + f"_{os.getpid()}.log"
+        return os.path.join(LOG_DIR, name)
+
+    @staticmethod
+    def prune_sessions(keep=LOG_SESSION_KEEP):
+        """刪除過舊的 session 日誌檔"""
+        try:
+            files = sorted(
+                (os.path.join(LOG_DIR, f) for f in os.listdir(LOG_DIR) if f.startswith("session_") and f.endswith(".log")),
+                key=os.path.getmtime,
+                reverse=True,
+            )
+        except OSError:
+            return
+        for f in files[keep:]:
+            try:
+                os.remove(f)
+            except OSError:
+                pass
+
+    def __len__(self):
+        return self._count
+
+    def extend(self, messages):
+        """寫入多筆訊息；訊息內含換行時拆成多行"""
+        with self._lock:
+            for msg in messages:
+                for line in str(msg).split("\n"):
+                    line = line.rstrip("\r")
+                    if self._count % self.index_step == 0:
+                        self._index.append(self._offset)
+                    data = line.encode('utf-8', 'replace') + b"\n"
+                    if self._fh is not None:
+                        self._fh.write(data)
+                    self._offset += len(data)
+                    self._ring.append(line)
+                    self._count += 1
+            if self._fh is not None:
+                try:
+                    self._fh.flush()
+                except OSError:
+                    pass
+
+    def get_lines(self, start, count):
+        """取得第 start 行起的 count 行；落在 ring 內直接回傳，否則由檔案讀回"""
+        with self._lock:
+            start = max(0, start)
+            end = min(self._count, start + count)
+            if start >= end:
+                return []
+            ring_start = self._count - len(self._ring)
+            if start >= ring_start:
+                return [self._ring[i - ring_start] for i in range(start, end)]
+            if self._fh is None:
+                # 檔案已關閉，僅能回傳 ring 內的部分
+                start = ring_start
+                return [self._ring[i - ring_start] for i in range(start, end)]
+            chunk = start // self.index_step
+            skip = start - chunk * self.index_step
+            out = []
+            try:
+                with open(self.path, 'rb') as rf:
+                    rf.seek(self._index[chunk])
+                    for _ in range(skip):
+                        rf.readline()
+                    for _ in range(end - start):
+                        raw = rf.readline()
+                        if not raw:
+                            break
+                        out.append(raw.rstrip(b"\n").decode('utf-8', 'replace'))
+            except OSError as e:
+                out.append(f"(讀取日誌檔失敗: {e})")
+            return out
+
+    def close(self):
+        with self._lock:
+            if self._fh is not None:
+                try:
+                    self._fh.close()
+                except OSError:
+                    pass
+                self._fh = None
+
+
+class ConfigStore:
+    """JSON 設定檔的記憶體快取：檔案未變更時不重讀，寫入延遲合併後以暫存檔 + fsync + rename 原子替換，並保留上一份完好的備份"""
+    def __init__(self, log_callback=None, delay=CONFIG_SAVE_DELAY):
+        self.log = log_callback or (lambda msg: None)
+        self.delay = delay
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()  # 同一時間只有一個 flush 在寫檔
+        self._cache = {}    # path -> (檔案簽章, 內容, 主檔內容是否完好)
+        self._pending = {}  # path -> 尚未寫入的內容
+        self._timer = None
+
+    @staticmethod
+    def _signature(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _read(self, path):
+        sig = self._signature(path)
+        if sig is None:
+            return None, None, False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return sig, json.load(f), True
+        except (OSError, ValueError) as e:
+            error = e
+        backup = path + CONFIG_BACKUP_SUFFIX
+        try:
+            with open(backup, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            self.log(f"設定檔損毀且沒有可用的備份: {path} ({error})")
+            return sig, None, False
+        self.log(f"設定檔損毀，改用上次完好的備份: {backup} ({error})")
+        return sig, data, False
+
+    def get(self, path, default=None):
+        """傳回設定內容的副本；有尚未寫入的修改時以記憶體中的為準，否則只在檔案簽章變更時重讀"""
+        path = os.path.abspath(path)
+        with self._lock:
+            if path in self._pending:
+                data = self._pending[path]
+            else:
+                entry = self._cache.get(path)
+                if entry is None or entry[0] != self._signature(path):
+                    entry = self._cache[path] = self._read(path)
+                data = entry[1]
+            return default if data is None else copy.deepcopy(data)
+
+    def set(self, path, data):
+        """更新記憶體中的內容，延遲 delay 秒後寫入；期間的多次修改只寫一次"""
+        path = os.path.abspath(path)
+        with self._lock:
+            self._pending[path] = copy.deepcopy(data)
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.delay, self.flush)
+            self._timer.start()
+
+    def update(self, path, values):
+        """合併欄位後寫回，保留檔案中其他的欄位"""
+        with self._lock:
+            data = self.get(path, {})
+            data.update(values)
+            self.set(path, data)
+
+    def flush(self):
+        """立即寫入所有尚未寫入的修改；失敗的保留在記憶體中，下次 flush 重試"""
+        with self._write_lock:
+            # 只在鎖內取快照；備份、fsync 等磁碟 I/O 在鎖外進行，GUI 執行緒的 get / update 不會被卡住
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                batch = [(path, data, self._cache.get(path)) for path, data in self._pending.items()]
+            ok = True
+            for path, data, entry in batch:
+                try:
+                    sig = self._write(path, data, entry)
+                except OSError as e:
+                    self.log(f"寫入設定檔失敗: {path} ({e})")
+                    ok = False
+                    continue
+                with self._lock:
+                    self._cache[path] = (sig, data, True)
+                    # 寫入期間又有新的修改時保留，交給重新排定的 timer
+                    if self._pending.get(path) is data:
+                        del self._pending[path]
+            return ok
+
+    def _write(self, path, data, entry=None):
+        folder = os.path.dirname(path)
+        os.makedirs(folder, exist_ok=True)
+        entry = entry or self._read(path)
+        if entry[2] and entry[0] == self._signature(path):
+            # 目前的主檔完好才更新備份，避免把損毀的內容蓋到備份上
+            shutil.copyfile(path, path + CONFIG_BACKUP_SUFFIX + ".tmp")
+            os.replace(path + CONFIG_BACKUP_SUFFIX + ".tmp", path + CONFIG_BACKUP_SUFFIX)
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=folder)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=4, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        if os.name != 'nt':
+            # rename 本身也要落盤，斷電後才不會回到舊檔或找不到檔案
+            dir_fd = os.open(folder, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        return self._signature(path)
+
+
+class ArtifactStore:
+    """內容定址的建置產物快取：key 為建置輸入指紋，命中時以 hardlink/複製還原到 dist/"""
+    def __init__(self, root=ARTIFACT_CACHE_DIR, max_bytes=ARTIFACT_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.index_file = os.path.join(root, "index.json")
+        self._lock = threading.Lock()
+        self._data = None
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """讀取→修改→寫回索引的整段互斥：同行程用 threading.Lock，批次建置的子行程之間用鎖定檔"""
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            fd = os.open(self.index_file + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if os.name == 'nt':
+                    import msvcrt
+                    while True:
+                        try:
+                            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                            break
+                        except OSError:
+                            continue  # LK_LOCK 重試約 10 秒後放棄，繼續等
+                else:
+                    import fcntl
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                if os.name == 'nt':
+                    try:
+                        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+                    except OSError:
+                        pass
+                os.close(fd)  # 關閉即釋放 flock
+
+    def _load_locked(self):
+        # 每次都重新讀取索引：批次建置時多個行程會共用同一份快取
+        data = None
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            pass
+        if not isinstance(data, dict):
+            data = {}
+        data.setdefault("entries", {})
+        data.setdefault("stats", {"hits": 0, "misses": 0, "bytes_saved": 0, "seconds_saved": 0.0})
+        self._data = data
+        return self._data
+
+    def _save_locked(self):
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix="index.", suffix=".tmp", dir=self.root)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self._data, f, indent=2, ensure_ascii=False)
+            os.replace(tmp, self.index_file)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    def _blob_path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    @staticmethod
+    def make_key(*parts):
+        h = hashlib.sha256()
+        for p in parts:
+            h.update(str(p).encode('utf-8') + b"\0")
+        return h.hexdigest()
+
+    def restore(self, key, dest):
+        """命中時把產物放到 dest 並回傳 entry；未命中回傳 None"""
+        with self._locked():
+            data = self._load_locked()
+            entry = data["entries"].get(key)
+            blob = self._blob_path(key)
+            if not entry or not os.path.exists(blob):
+                data["entries"].pop(key, None)
+                data["stats"]["misses"] += 1
+                self._save_locked()
+                return None
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            if os.path.lexists(dest):
+                os.remove(dest)
+            try:
+                os.link(blob, dest)
+                entry["restored_by"] = "hardlink"
+            except OSError:
+                shutil.copy2(blob, dest)
+                entry["restored_by"] = "copy"
+            entry["last_used"] = time.time()
+            data["stats"]["hits"] += 1
+            data["stats"]["bytes_saved"] += entry.get("size", 0)
+            data["stats"]["seconds_saved"] += entry.get("build_seconds", 0.0)
+            self._save_locked()
+            return dict(entry)
+
+    def put(self, key, src, build_seconds=0.0, label=""):
+        """把新建好的產物複製進快取（獨立 inode，避免之後建置覆寫到快取內容）"""
+        blob = self._blob_path(key)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        # 複製大檔不佔住索引鎖；每個行程各用自己的暫存檔
+        fd, tmp = tempfile.mkstemp(prefix=key[:16] + ".", suffix=".tmp", dir=os.path.dirname(blob))
+        os.close(fd)
+        try:
+            shutil.copy2(src, tmp)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        with self._locked():
+            data = self._load_locked()
+            os.replace(tmp, blob)
+            now = time.time()
+            data["entries"][key] = {
+                "size": os.path.getsize(blob),
+                "label": label,
+                "build_seconds": build_seconds,
+                "created": now,
+                "last_used": now,
+            }
+            self._evict_locked()
+            self._save_locked()
+
+    def _evict_locked(self):
+        entries = self._data["entries"]
+        total = sum(e.get("size", 0) for e in entries.values())
+        for key in sorted(entries, key=lambda k: entries[k].get("last_used", 0)):
+            if total <= self.max_bytes:
+                break
+            total -= entries[key].get("size", 0)
+            del entries[key]
+            try:
+                os.remove(self._blob_path(key))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._locked():
+            data = self._load_locked()
+            st = dict(data["stats"])
+            lookups = st["hits"] + st["misses"]
+            st["hit_rate"] = st["hits"] / lookups if lookups else 0.0
+            st["entries"] = len(data["entries"])
+            st["total_bytes"] = sum(e.get("size", 0) for e in data["entries"].values())
+            st["max_bytes"] = self.max_bytes
+            return st
+
+
+class Telemetry:
+    """以 JSONL 追加每個指令 / 動作的耗時事件，並計算每個專案每個步驟的 p50 / p95"""
+    def __init__(self, path=TELEMETRY_FILE, max_bytes=TELEMETRY_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = True
+        self._lock = threading.Lock()
+
+    def record(self, kind, step, project, started, ended, **fields):
+        """started / ended 為 time.time()；其餘欄位 (rc、bytes、lines...) 原樣寫入"""
+        if not self.enabled:
+            return
+        event = {"ts": round(started, 3), "end": round(ended, 3), "kind": kind, "step": step,
+                 "project": os.path.normpath(project) if project else None, "duration": round(ended - started, 4)}
+        event.update(fields)
+        # 整行一次寫入 append 模式的檔案，批次建置的子 process 同時寫也不會交錯
+        line = json.dumps(event, ensure_ascii=False) + "\n"
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, self.path + ".1")
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+            except OSError:
+                pass
+
+    def events(self):
+        for path in (self.path + ".1", self.path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            yield json.loads(line)
+                        except ValueError:
+                            continue  # 另一個 process 正在寫的半行
+            except OSError:
+                continue
+
+    @staticmethod
+    def percentile(values, q):
+        """nearest-rank 百分位數；values 需已排序"""
+        if not values:
+            return 0.0
+        rank = max(1, int(-(-q * len(values) // 100)))
+        return values[min(rank, len(values)) - 1]
+
+    def summary(self, project=None):
+        """依 (專案, 類型, 步驟) 彙總歷史耗時"""
+        groups = collections.defaultdict(list)
+        project = os.path.normpath(project) if project else None
+        for ev in self.events():
+            if project and ev.get("project") != project:
+                continue
+            groups[(ev.get("project") or "", ev.get("kind", ""), ev.get("step", ""))].append(ev)
+        rows = []
+        for (proj, kind, step), evs in sorted(groups.items()):
+            durs = sorted(e.get("duration", 0.0) for e in evs)
+            rows.append({
+                "project": proj, "kind": kind, "step": step, "count": len(evs),
+                "p50": self.percentile(durs, 50), "p95": self.percentile(durs, 95),
+                "last": evs[-1].get("duration", 0.0),
+                "failures": sum(1 for e in evs if e.get("rc") not in (None, 0)),
+            })
+        return rows
+
+    @staticmethod
+    def format_summary(rows):
+        if not rows:
+            return "尚無耗時紀錄。"
+        lines = [f"{'步驟':<26} {'次數':>3} {'p50':>8} {'p95':>8} {'最近':>6} {'失敗':>2}"]  # 中文字佔兩格
+        current = None
+        for r in rows:
+            if r["project"] != current:
+                current = r["project"]
+                lines.append(f"== {current or '(無專案)'} ==")
+            name = f"{r['kind']}:{r['step']}"
+            lines.append(f"{name[:28]:<28} {r['count']:>5} {r['p50']:>7.2f}s {r['p95']:>7.2f}s "
+                         f"{r['last']:>7.2f}s {r['failures']:>4}")
+        return "\n".join(lines)
+
+
+class BundleAnalyzer:
+    """分析 PyInstaller 工作目錄 (build/<name>) 的 TOC 與 xref，統計打包內容的組成"""
+    SKIP_TYPES = ("PYZ", "OPTION", "DEPENDENCY", "SYMLINK", "EXECUTABLE")
+    MODULE_TYPES = ("PYMODULE", "PYSOURCE", "EXTENSION")
+
+    def __init__(self, work_dir, project_path, python_prefix=None):
+        self.work_dir = work_dir
+        self.project_path = os.path.normcase(os.path.abspath(project_path))
+        self.python_prefix = os.path.normcase(os.path.abspath(python_prefix or sys.base_prefix))
+
+    @staticmethod
+    def _read_toc(path):
+        """TOC 檔是 Python literal；取出其中的 (目的名稱, 來源路徑, 類型) 清單"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = ast.literal_eval(f.read())
+        except (OSError, ValueError, SyntaxError):
+            return []
+        for item in data if isinstance(data, (tuple, list)) else ():
+            if isinstance(item, list) and item and all(isinstance(e, tuple) and len(e) == 3 for e in item):
+                return item
+        return []
+
+    @staticmethod
+    def _file_size(path):
+        try:
+            return os.path.getsize(path) if path else 0
+        except OSError:
+            return 0
+
+    @staticmethod
+    def fmt_size(n):
+        return f"{n / 1024 ** 2:.1f} MB" if abs(n) >= 1024 ** 2 else f"{n / 1024:.0f} KB"
+
+    def group_of(self, src, dest):
+        """依來源路徑歸類：site-packages 內以頂層套件名稱，其餘為 (project)/(stdlib)/(pyinstaller)/(system)"""
+        if dest == "base_library.zip":
+            return "(stdlib)"
+        if not src:
+            return "(system)"
+        parts = os.path.abspath(src).replace("\\", "/").split("/")
+        lowered = [p.lower() for p in parts]
+        if "site-packages" in lowered:
+            i = len(lowered) - 1 - lowered[::-1].index("site-packages")
+            if i + 1 < len(parts):
+                name = parts[i + 1]
+                if name.endswith((".dist-info", ".egg-info")):
+                    return name.split("-")[0]
+                return name.split(".")[0]
+        norm = os.path.normcase(os.path.abspath(src))
+        if norm.startswith(os.path.normcase(os.path.abspath(self.work_dir)) + os.sep):
+            return "(pyinstaller)"
+        if norm.startswith(self.project_path + os.sep):
+            return "(project)"
+        if norm.startswith(self.python_prefix + os.sep):
+            return "(stdlib)"
+        return "(system)"
+
+    def _read_xref(self):
+        """解析 xref-*.html：模組名稱 -> {type, href, imports}"""
+        paths = glob.glob(os.path.join(self.work_dir, "xref-*.html"))
+        if not paths:
+            return {}
+        with open(paths[0], 'r', encoding='utf-8', errors='replace') as f:
+            text = f.read()
+        nodes = {}
+        for chunk in text.split('<div class="node">')[1:]:
+            m = re.search(r'<a name="([^"]+)"', chunk)
+            if not m:
+                continue
+            href = re.search(r'<a target="code" href="([^"]*)"', chunk)
+            mtype = re.search(r'<span class="moduletype">([^<]+)</span>', chunk)
+            imports = re.findall(r'href="#([^"]+)"', chunk.split("imported by:")[0])
+            nodes[html.unescape(m.group(1))] = {
+                "type": mtype.group(1).strip() if mtype else "",
+                "href": html.unescape(href.group(1)) if href else "",
+                "imports": [html.unescape(n) for n in imports],
+            }
+        return nodes
+
+    def _unused_modules(self, pyz, sizes, entry_file, entry_imports, project_sources):
+        """從入口實際的 import 出發走訪模組圖；走不到的 PYZ 模組只是被 hidden import / --collect-all 帶入"""
+        nodes = self._read_xref()
+        if not nodes:
+            return None
+        norm = lambda p: os.path.normcase(os.path.abspath(p))
+        entry_key = norm(entry_file)
+        sources = {norm(p) for p in project_sources}
+        # 入口 Script 節點的邊含 hidden import，改用原始碼裡真正的 import；runtime hook 與其他專案模組照圖走
+        stack = [m for m in entry_imports if m in nodes]
+        for name, node in nodes.items():
+            href = norm(node["href"]) if node["href"] else ""
+            if href != entry_key and (node["type"] == "Script" or href in sources):
+                stack.append(name)
+        seen = set()
+        while stack:
+            name = stack.pop()
+            if name in seen:
+                continue
+            seen.add(name)
+            # import a.b.c 會先載入 a 與 a.b
+            parts = name.split(".")
+            stack.extend(".".join(parts[:i]) for i in range(1, len(parts)))
+            stack.extend(nodes.get(name, {}).get("imports", ()))
+
+        totals = collections.Counter(dest.split(".")[0] for dest, _, _ in pyz)
+        unused = {}
+        for dest, src, _ in sorted(pyz, key=lambda e: -sizes.get(e[0], 0)):
+            if dest in seen:
+                continue
+            top = dest.split(".")[0]
+            u = unused.setdefault(top, {"modules": 0, "size": 0, "group": self.group_of(src, dest), "names": []})
+            u["modules"] += 1
+            u["size"] += sizes.get(dest, 0)
+            if len(u["names"]) < 3:
+                u["names"].append(dest)
+        for top, u in unused.items():
+            u["whole"] = u["modules"] == totals[top]
+        return unused
+
+    def analyze(self, output_size, entry_file, entry_imports=(), project_sources=(), mode="onefile"):
+        """讀取 PYZ / PKG (one-dir 另含 COLLECT) TOC 統計各套件大小與模組數，並找出從入口走不到的模組"""
+        pyz = self._read_toc(os.path.join(self.work_dir, "PYZ-00.toc"))
+        pkg = self._read_toc(os.path.join(self.work_dir, "PKG-00.toc"))
+        if mode == "onedir":
+            seen = {dest for dest, _, _ in pkg}
+            pkg += [e for e in self._read_toc(os.path.join(self.work_dir, "COLLECT-00.toc")) if e[0] not in seen]
+        if not pyz and not pkg:
+            return None
+        groups = {}
+
+        def add(group, size, is_module):
+            st = groups.setdefault(group, {"size": 0, "modules": 0, "files": 0})
+            st["size"] += size
+            st["modules" if is_module else "files"] += 1
+
+        sizes = {}
+        for dest, src, _ in pyz:
+            sizes[dest] = self._file_size(src)
+            add(self.group_of(src, dest), sizes[dest], True)
+        data = []
+        for dest, src, typecode in pkg:
+            if typecode in self.SKIP_TYPES:
+                continue
+            size = self._file_size(src)
+            add(self.group_of(src, dest), size, typecode in self.MODULE_TYPES)
+            if typecode == "DATA":
+                data.append([dest, size])
+        data.sort(key=lambda d: -d[1])
+        return {
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "mode": mode,
+            "exe_size": output_size,
+            "pyz_size": self._file_size(os.path.join(self.work_dir, "PYZ-00.pyz")),
+            "modules": sum(g["modules"] for g in groups.values()),
+            "data_files": len(data),
+            "data_size": sum(d[1] for d in data),
+            "groups": groups,
+            "data_top": data[:BUNDLE_TOP_N],
+            "unused": self._unused_modules(pyz, sizes, entry_file, entry_imports, project_sources),
+        }
+
+    @classmethod
+    def diff(cls, prev, cur):
+        """與上次建置比較 exe 大小、模組數與各套件大小"""
+        if not prev:
+            return []
+        switched = f"，{prev.get('mode', 'onefile')} → {cur.get('mode', 'onefile')}" if prev.get("mode", "onefile") != cur.get("mode", "onefile") else ""
+        lines = [f"與上次建置 ({prev.get('created', '?')}{switched}) 相比: 大小 {cls._signed(cur['exe_size'] - prev.get('exe_size', 0))}，"
+                 f"模組 {cur['modules'] - prev.get('modules', 0):+d} 個，資料檔 {cur['data_files'] - prev.get('data_files', 0):+d} 個"]
+        old, new = prev.get("groups", {}), cur["groups"]
+        changes = []
+        for name in set(old) | set(new):
+            before, after = old.get(name, {}).get("size", 0), new.get(name, {}).get("size", 0)
+            if name not in old:
+                changes.append((after, f"  + {name:<24} {cls.fmt_size(after):>10} (新增)"))
+            elif name not in new:
+                changes.append((before, f"  - {name:<24} {cls.fmt_size(before):>10} (移除)"))
+            elif abs(after - before) >= BUNDLE_DIFF_MIN_BYTES:
+                changes.append((abs(after - before), f"  ~ {name:<24} {cls._signed(after - before):>10}"))
+        changes.sort(key=lambda c: -c[0])
+        return lines + [c[1] for c in changes[:BUNDLE_TOP_N]]
+
+    @classmethod
+    def _signed(cls, n):
+        return ("+" if n >= 0 else "-") + cls.fmt_size(abs(n))
+
+    @classmethod
+    def format_report(cls, report, prev=None):
+        output = "輸出資料夾" if report.get("mode") == "onedir" else "exe"
+        lines = [f"{output} {cls.fmt_size(report['exe_size'])} (PYZ {cls.fmt_size(report['pyz_size'])})，"
+                 f"模組 {report['modules']} 個，資料檔 {report['data_files']} 個 ({cls.fmt_size(report['data_size'])})",
+                 f"  {'套件':<22} {'未壓縮大小':>8} {'模組':>4} {'檔案':>4}"]  # 中文字佔兩格
+        groups = sorted(report["groups"].items(), key=lambda g: -g[1]["size"])
+        for name, g in groups[:BUNDLE_TOP_N]:
+            lines.append(f"  {name[:24]:<24} {cls.fmt_size(g['size']):>12} {g['modules']:>6} {g['files']:>6}")
+        if len(groups) > BUNDLE_TOP_N:
+            rest = groups[BUNDLE_TOP_N:]
+            lines.append(f"  {'(其他 ' + str(len(rest)) + ' 個)':<24} {cls.fmt_size(sum(g['size'] for _, g in rest)):>12}")
+        if report["data_top"]:
+            lines.append("最大的資料檔:")
+            lines += [f"  {cls.fmt_size(size):>10}  {dest}" for dest, size in report["data_top"]]
+        lines += cls.diff(prev, report)
+        unused = sorted((report.get("unused") or {}).items(), key=lambda u: -u[1]["size"])
+        unused = [(top, u) for top, u in unused if u["whole"] or u["size"] >= BUNDLE_DIFF_MIN_BYTES]
+        if unused:
+            lines.append("排除建議（從入口的 import 圖走不到，只因 hidden import / --collect-all 被打包；動態載入的模組請自行確認）:")
+            for top, u in unused[:BUNDLE_TOP_N]:
+                if u["whole"]:
+                    lines.append(f"  --exclude-module {top}  ({u['modules']} 個模組，{cls.fmt_size(u['size'])})")
+                else:
+                    names = ", ".join(u["names"]) + (" ..." if u["modules"] > len(u["names"]) else "")
+                    hint = f"；若由 --collect-all 帶入可改用 --collect-data {top}" if u.get("group") == top else ""
+                    lines.append(f"  {top}: {u['modules']} 個子模組 ({cls.fmt_size(u['size'])}) 未被 import ({names}){hint}")
+        return "\n".join(lines)
 
 
 class UpdateManager:
@@ -58,7 +917,17 @@ class UpdateManager:
     def __init__(self, app_instance, log_callback):
         self.app = app_instance
         self.log = log_callback
+        import requests  # 需 pip install requests；只有用到更新功能時才載入
         self.session = requests.Session()
+        self.check_ttl = UPDATE_CHECK_TTL
+        self._check_lock = threading.Lock()
+
+    def _ui(self, func_name, *args):
+        """把 messagebox 呼叫派回主執行緒（tkinter 延遲載入）"""
+        def show():
+            from tkinter import messagebox
+            getattr(messagebox, func_name)(*args)
+        self.app.after(0, show)
 
     def close(self):
         try:
@@ -66,24 +935,75 @@ class UpdateManager:
         except Exception:
             pass
 
-    def check_for_updates(self):
+    def fetch_remote_version(self, url=VERSION_URL, force=False, cache_file=UPDATE_CHECK_CACHE_FILE):
+        """取得遠端版本號：TTL 內直接用快取，否則送出條件式請求（未變更時只花一次 304）
+
+        傳回 (版本字串, 來源)，來源為 "cache" / "304" / "200"；連線失敗時拋出例外，
+        伺服器回應非 200/304 時傳回 (None, 狀態碼)。
+        """
+        with self._check_lock:
+            cache = _load_json(cache_file) or {}
+            if cache.get("url") != url:
+                cache = {"url": url}
+            now = time.time()
+            if not force and cache.get("version") and now - cache.get("checked_at", 0) < self.check_ttl:
+                return cache["version"], "cache"
+
+            headers = {}
+            if cache.get("version"):
+                if cache.get("etag"):
+                    headers["If-None-Match"] = cache["etag"]
+                if cache.get("last_modified"):
+                    headers["If-Modified-Since"] = cache["last_modified"]
+            response = self.session.get(url, headers=headers, timeout=8)
+            if response.status_code == 304 and cache.get("version"):
+                source = "304"
+            elif response.status_code == 200:
+                source = "200"
+                cache["version"] = response.content.decode('utf-8', errors='replace').strip()
+                cache["etag"] = response.headers.get("ETag")
+                cache["last_modified"] = response.headers.get("Last-Modified")
+            else:
+                return None, response.status_code
+            cache["checked_at"] = now
+            try:
+                os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+                tmp = cache_file + ".tmp"
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(cache, f, indent=2)
+                os.replace(tmp, cache_file)
+            except OSError as e:
+                self.log(f"寫入更新檢查快取失敗: {e}")
+            return cache["version"], source
+
+    def start_background_check(self, delay=UPDATE_STARTUP_DELAY_MS / 1000):
+        """啟動時的低優先背景檢查：延遲執行、daemon 執行緒、遵守 TTL，且除了發現新版外不彈出任何視窗"""
+        timer = threading.Timer(delay, self.check_for_updates, kwargs={"silent": True})
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    def check_for_updates(self, force=False, silent=False):
         """在背景執行緒下載遠端版本號，後續的 UI 互動使用 app.after 跑到主執行緒"""
+        from packaging import version  # 需 pip install packaging
         try:
             self.log(f"正在檢查更新... (目前版本 v{CURRENT_VERSION})")
-            response = self.session.get(VERSION_URL, timeout=8)
-            if response.status_code != 200:
-                self.log(f"檢查失敗: 無法連接伺服器 (Code {response.status_code})")
+            remote_ver_str, source = self.fetch_remote_version(force=force)
+            if remote_ver_str is None:
+                self.log(f"檢查失敗: 無法連接伺服器 (Code {source})")
                 # show message on main thread
-                self.app.after(0, lambda: messagebox.showwarning("檢查失敗", f"無法連接更新伺服器 (Code {response.status_code})"))
+                if not silent:
+                    self._ui("showwarning", "檢查失敗", f"無法連接更新伺服器 (Code {source})")
                 return
 
-            remote_ver_str = response.text.strip()
-            self.log(f"遠端版本: v{remote_ver_str}")
+            note = {"cache": "（快取，未連網）", "304": "（未變更，304）"}.get(source, "")
+            self.log(f"遠端版本: v{remote_ver_str}{note}")
 
             try:
                 if version.parse(remote_ver_str) > version.parse(CURRENT_VERSION):
                     # prompt on main thread, then if yes start download in background
                     def prompt_and_update():
+                        from tkinter import messagebox
                         ans = messagebox.askyesno("發現新版本", f"發現新版本 v{remote_ver_str}！\n\n點擊「是」將自動下載並重啟更新。")
                         if ans:
                             # run perform_update in a background daemon thread to avoid blocking UI
@@ -93,30 +1013,160 @@ class UpdateManager:
                     self.app.after(0, prompt_and_update)
                 else:
                     self.log("目前已是最新版本。")
-                    self.app.after(0, lambda: messagebox.showinfo("檢查結果", "目前已是最新版本。"))
+                    if not silent:
+                        self._ui("showinfo", "檢查結果", "目前已是最新版本。")
             except Exception as e:
                 self.log(f"版本比對失敗: {e}\n{traceback.format_exc()}")
 
         except Exception as e:
             self.log(f"更新檢查發生錯誤: {e}\n{traceback.format_exc()}")
-            self.app.after(0, lambda: messagebox.showerror("檢查錯誤", str(e)))
+            if not silent:
+                self._ui("showerror", "檢查錯誤", str(e))
+
+    def fetch_expected_sha256(self, sha_url=EXE_SHA256_URL):
+        """讀取發佈的 SHA-256（接受 sha256sum 格式：'<hex>  檔名'）"""
+        r = self.session.get(sha_url, timeout=(UPDATE_CONNECT_TIMEOUT, UPDATE_READ_TIMEOUT))
+        r.raise_for_status()
+        for token in r.content.decode('utf-8', errors='replace').split():
+            token = token.strip().lower()
+            if len(token) == 64 and all(c in "0123456789abcdef" for c in token):
+                return token
+        raise ValueError(f"無法解析 SHA-256 檢查碼: {sha_url}")
+
+    def download_update(self, url=EXE_DOWNLOAD_URL, sha_url=EXE_SHA256_URL, part_path=UPDATE_PARTIAL_FILE):
+        """以 Range 續傳下載到 part_path，通過 SHA-256 比對後傳回檔案路徑，否則拋出例外"""
+        import requests
+        import urllib3  # requests 的相依套件；直接讀 raw 串流時的中斷會以它的例外拋出
+        expected = self.fetch_expected_sha256(sha_url)
+        meta_path = part_path + ".json"
+        meta = _load_json(meta_path) or {}
+        # 來源或檢查碼不同就不能沿用舊的部分檔
+        if meta.get("url") != url or meta.get("sha256") != expected:
+            for p in (part_path, meta_path):
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+            meta = {"url": url, "sha256": expected}
+
+        attempts = 0
+        while True:
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            # Range 以原始位元組計算，要求伺服器不要壓縮，寫入檔案的位元組才與 offset 對得上
+            headers = {"Accept-Encoding": "identity"}
+            if meta.get("encoded"):
+                offset = 0
+            if offset:
+                headers["Range"] = f"bytes={offset}-"
+                validator = meta.get("etag") or meta.get("last_modified")
+                if validator:
+                    headers["If-Range"] = validator
+            try:
+                with self.session.get(url, stream=True, headers=headers,
+                                      timeout=(UPDATE_CONNECT_TIMEOUT, UPDATE_READ_TIMEOUT)) as r:
+                    if r.status_code == 416 and offset:
+                        # 部分檔已完整（或伺服器檔案變小），交給下方的雜湊比對判斷
+                        self.log("伺服器回報範圍已達檔尾，直接驗證本地檔案。")
+                        break
+                    r.raise_for_status()
+                    if r.headers.get("Content-Encoding", "identity").lower() not in ("", "identity"):
+                        if not meta.get("encoded"):
+                            # 壓縮後的 Range 與解壓後寫入的位元組對不上，續傳必定損毀
+                            self.log("伺服器仍壓縮傳輸內容，無法續傳，改為完整下載。")
+                            meta["encoded"] = True
+                            if r.status_code == 206:
+                                continue
+                        offset = 0
+                    if offset and r.status_code != 206:
+                        self.log("伺服器不支援續傳或檔案已變更，重新完整下載。")
+                        offset = 0
+                    meta["etag"] = r.headers.get("ETag")
+                    meta["last_modified"] = r.headers.get("Last-Modified")
+                    with open(meta_path, 'w', encoding='utf-8') as f:
+                        json.dump(meta, f)
+                    total = r.headers.get("Content-Length")
+                    total = offset + int(total) if total and total.isdigit() else None
+                    if offset:
+                        self.log(f"從 {offset / 1024 ** 2:.1f} MB 處續傳...")
+                    self._stream_to_file(r, part_path, offset, total)
+                break
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError,
+                    urllib3.exceptions.HTTPError) as e:
+                attempts += 1
+                if attempts > UPDATE_RETRIES:
+                    raise
+                wait = min(2 ** attempts, 30)
+                self.log(f"下載中斷 ({e.__class__.__name__})，{wait} 秒後續傳 ({attempts}/{UPDATE_RETRIES})...")
+                time.sleep(wait)
+
+        digest = hashlib.sha256()
+        with open(part_path, 'rb') as f:
+            for block in iter(lambda: f.read(UPDATE_CHUNK_MAX), b""):
+                digest.update(block)
+        actual = digest.hexdigest()
+        if actual != expected:
+            # 內容損毀的部分檔不能再續傳，整個丟棄
+            for p in (part_path, meta_path):
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+            raise ValueError(f"SHA-256 不符，已捨棄下載檔 (預期 {expected[:12]}…，實際 {actual[:12]}…)")
+        self.log(f"SHA-256 驗證通過: {actual}")
+        try:
+            os.remove(meta_path)
+        except OSError:
+            pass
+        return part_path
+
+    def _stream_to_file(self, response, part_path, offset, total):
+        """以自適應區塊大小寫入檔案，並定期記錄進度與速度"""
+        chunk = UPDATE_CHUNK_MIN
+        done = offset
+        t0 = last = time.perf_counter()
+        with open(part_path, 'r+b' if offset else 'wb') as f:
+            f.seek(offset)
+            f.truncate()
+            while True:
+                t_read = time.perf_counter()
+                data = response.raw.read(chunk, decode_content=True)
+                if not data:
+                    break
+                f.write(data)
+                done += len(data)
+                # 讀得快就加大區塊減少呼叫次數，慢就縮小讓進度與逾時判斷保持靈敏
+                elapsed = time.perf_counter() - t_read
+                if elapsed < 0.1 and len(data) == chunk:
+                    chunk = min(chunk * 2, UPDATE_CHUNK_MAX)
+                elif elapsed > 1.0:
+                    chunk = max(chunk // 2, UPDATE_CHUNK_MIN)
+                now = time.perf_counter()
+                if now - last >= UPDATE_PROGRESS_INTERVAL:
+                    last = now
+                    self._log_progress(done, offset, total, now - t0)
+        self._log_progress(done, offset, total, time.perf_counter() - t0)
+
+    def _log_progress(self, done, offset, total, seconds):
+        speed = (done - offset) / seconds if seconds > 0 else 0.0
+        msg = f"下載中 {done / 1024 ** 2:.1f} MB"
+        if total:
+            msg += f" / {total / 1024 ** 2:.1f} MB ({done * 100 / total:.0f}%)"
+        msg += f"，{speed / 1024 ** 2:.2f} MB/s"
+        if total and speed > 0:
+            msg += f"，剩餘約 {(total - done) / speed:.0f} 秒"
+        self.log(msg)
 
     def perform_update(self):
         """下載新 exe 並啟動更新流程（下載於 APP_DATA_DIR，UI 訊息回到主執行緒）"""
         self.log("開始下載更新檔...")
-        # 下載到 AppData 的暫存檔
+        # 下載到 AppData 的部分檔，驗證通過後才改名為暫存 exe
         try:
+            part_path = self.download_update()
             tmp_fd, tmp_path = tempfile.mkstemp(suffix=".exe", prefix="update_", dir=APP_DATA_DIR)
             os.close(tmp_fd)
+            os.replace(part_path, tmp_path)
             self.log(f"暫存檔: {tmp_path}")
 
-            with self.session.get(EXE_DOWNLOAD_URL, stream=True, timeout=60) as r:
-                r.raise_for_status()
-                with open(tmp_path, 'wb') as f:
-                    for chunk in r.iter_content(chunk_size=16384):
-                        if chunk:
-                            f.write(chunk)
-
             self.log("下載完成，準備重新啟動...")
 
             current_exe = sys.executable
@@ -125,9 +1175,7 @@ class UpdateManager:
             # 如果是在 python 解譯器中執行（非封裝 exe），不做覆蓋，但通知使用者
             if not current_exe.lower().endswith(".exe") or "python" in basename:
                 self.log("偵測到非 exe 執行環境，無法自動更新執行檔。")
-                def notify():
-                    messagebox.showwarning("無法更新", "您正在使用 Python 直譯器執行腳本，\n無法進行 EXE 自我覆蓋。請以已封裝的 .exe 執行更新。")
-                self.app.after(0, notify)
+                self._ui("showwarning", "無法更新", "您正在使用 Python 直譯器執行腳本，\n無法進行 EXE 自我覆蓋。請以已封裝的 .exe 執行更新。")
                 try:
                     os.remove(tmp_path)
                 except Exception:
@@ -171,7 +1219,7 @@ del "%~f0"
                     os.remove(tmp_path)
                 except Exception:
                     pass
-                self.app.after(0, lambda: messagebox.showerror("更新錯誤", f"無法建立 updater.bat：{e}"))
+                self._ui("showerror", "更新錯誤", f"無法建立 updater.bat：{e}")
                 return
 
             # 啟動 updater.bat
@@ -196,7 +1244,7 @@ del "%~f0"
                         os.remove(tmp_path)
                 except Exception:
                     pass
-                self.app.after(0, lambda: messagebox.showerror("更新錯誤", str(e)))
+                self._ui("showerror", "更新錯誤", str(e))
 
         except Exception as e:
             self.log(f"更新失敗: {e}\n{traceback.format_exc()}")
@@ -205,228 +1253,2309 @@ del "%~f0"
                     os.remove(tmp_path)
             except Exception:
                 pass
-            self.app.after(0, lambda: messagebox.showerror("更新錯誤", str(e)))
+            self._ui("showerror", "更新錯誤", str(e))
 
 
-class TaskHandler:
-    """負責執行具體任務"""
-    def __init__(self, log_callback):
-        self.log = log_callback
-        self.current_process = None
+class Job:
+    """排程中的單一工作：擁有自己的 process、取消旗標、狀態與日誌"""
+    QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+    def __init__(self, job_id, name, project, func=None, args=(), parent=None):
+        self.id = job_id
+        self.name = name
+        self.project = project
+        self.func = func
+        self.args = args
+        self.parent = parent
+        self.step_timeout = None
+        self.state = self.QUEUED
+        self.cancel_event = threading.Event()
+        self.stop_requested_at = None
+        self.last_stop_latency = None
+        self.process = None
         self.process_lock = threading.Lock()
-        self.stop_event = threading.Event()
+        self.holds_project_slot = False     # 由 JobScheduler 維護：是否佔用專案的並行名額
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.ended = None
+        self.log_lines = collections.deque(maxlen=JOB_LOG_LINES)
+        # 由 ResourceSampler 更新：已結束指令累計的 CPU 秒數、目前 CPU / RSS 與峰值 RSS
+        self.cpu_done = 0.0
+        self.cpu_seconds = 0.0
+        self.rss = 0
+        self.peak_rss = 0
 
-    def _terminate_process_group(self, process):
-        try:
-            if process.poll() is not None:
-                return
-        except Exception:
-            pass
+    @property
+    def tag(self):
+        return f"#{self.id} {self.name}"
 
-        try:
-            if os.name == 'nt':
-                try:
-                    # 需要 process 是 new process group 才能生效
-                    process.send_signal(signal.CTRL_BREAK_EVENT)
-                    self.log("已向 Windows process group 發送 CTRL_BREAK_EVENT。")
-                except Exception as e:
-                    self.log(f"發送 CTRL_BREAK_EVENT 失敗: {e}")
-                    try:
-                        process.terminate()
-                    except Exception:
-                        pass
-            else:
-                try:
-                    pgid = os.getpgid(process.pid)
-                    os.killpg(pgid, signal.SIGTERM)
-                    self.log("已對 process group 發送 SIGTERM。")
-                except Exception as e:
-                    self.log(f"對 process group 發送 SIGTERM 失敗: {e}")
-        except Exception:
-            pass
+    @property
+    def finished(self):
+        return self.state in (self.DONE, self.FAILED, self.CANCELLED)
 
-    def run_cmd(self, command, cwd=None, env=None, shell=True):
-        try:
-            self.log(f"[{cwd}] > {command}")
-            env_copy = os.environ.copy()
-            env_copy["PYTHONIOENCODING"] = "utf-8"
-            if env:
-                env_copy.update(env)
+    def duration(self):
+        if not self.started:
+            return 0.0
+        return (self.ended or time.time()) - self.started
 
-            popen_kwargs = {
-                "stdout": subprocess.PIPE,
-                "stderr": subprocess.STDOUT,
-                "shell": shell,
-                "cwd": cwd,
-                "env": env_copy,
-                "text": True,
-                "encoding": 'utf-8',
-                "errors": 'replace',
-                "bufsize": 1
-            }
+    def resources(self):
+        return {"cpu_seconds": round(self.cpu_seconds, 2), "rss": self.rss, "peak_rss": self.peak_rss}
 
-            if os.name == 'nt':
-                popen_kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
-            else:
-                popen_kwargs["preexec_fn"] = os.setsid
+    def request_cancel(self):
+        if self.stop_requested_at is None:
+            self.stop_requested_at = time.monotonic()
+        self.cancel_event.set()
 
-            process = subprocess.Popen(command, **popen_kwargs)
 
-            with self.process_lock:
-                self.current_process = process
-                self.stop_event.clear()
+class JobScheduler:
+    """有界的工作排程器：總並行數與每個專案的並行數皆有上限，先進先出"""
+    def __init__(self, runner, max_workers=JOB_MAX_WORKERS, per_project_limit=JOB_PER_PROJECT_LIMIT, on_change=None):
+        self._runner = runner
+        self.max_workers = max_workers
+        self.per_project_limit = per_project_limit
+        self.on_change = on_change
+        self._cond = threading.Condition()
+        self._queue = collections.deque()
+        self._jobs = collections.OrderedDict()
+        self._running = {}
+        self._running_by_project = collections.Counter()
+        self._next_id = 1
+        self._shutdown = False
 
-            try:
-                # 防護：process.stdout 可能為 None
-                if process.stdout is not None:
-                    for line in iter(process.stdout.readline, ''):
-                        if line:
-                            self.log(line.rstrip())
-                        # 檢查中斷事件
-                        if self.stop_event.is_set():
-                            try:
-                                self._terminate_process_group(process)
-                            except Exception:
-                                pass
-                            # 繼續讀取輸出直到 process 結束或被 kill
-                    # close stdout if still open
-                    try:
-                        process.stdout.close()
-                    except Exception:
-                        pass
+    def configure(self, max_workers=None, per_project_limit=None):
+        with self._cond:
+            if max_workers:
+                self.max_workers = max(1, int(max_workers))
+            if per_project_limit:
+                self.per_project_limit = max(1, int(per_project_limit))
+            self._dispatch_locked()
+
+    def submit(self, name, project, func, *args):
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("排程器已關閉")
+            job = Job(self._next_id, name, project, func, args)
+            self._next_id += 1
+            self._jobs[job.id] = job
+            self._queue.append(job)
+            self._trim_history_locked()
+            self._dispatch_locked()
+        self._notify()
+        return job
+
+    @staticmethod
+    def _project_key(project):
+        # 同一專案可能以不同寫法傳入（GUI 的 / 與 abspath 的 \）
+        return os.path.normcase(os.path.abspath(project)) if project is not None else None
+
+    def try_reserve(self, project):
+        """不經佇列直接佔用該專案的一個名額（批次建置的子工作用）；已達上限時回傳 False"""
+        key = self._project_key(project)
+        with self._cond:
+            if self._running_by_project[key] >= self.per_project_limit:
+                return False
+            self._running_by_project[key] += 1
+            return True
+
+    def release(self, project):
+        with self._cond:
+            self._drop_project_locked(project)
+            if not self._shutdown:
+                self._dispatch_locked()
+            self._cond.notify_all()
+        self._notify()
+
+    def release_project_slot(self, job):
+        """執行中的長駐工作（監看模式）讓出專案名額，同專案的其他工作不必等它結束"""
+        with self._cond:
+            if not job.holds_project_slot:
+                return False
+            job.holds_project_slot = False
+            self._drop_project_locked(job.project)
+            if not self._shutdown:
+                self._dispatch_locked()
+            self._cond.notify_all()
+        self._notify()
+        return True
+
+    def _drop_project_locked(self, project):
+        key = self._project_key(project)
+        self._running_by_project[key] -= 1
+        if self._running_by_project[key] <= 0:
+            del self._running_by_project[key]
+
+    def _trim_history_locked(self):
+        finished = [j for j in self._jobs.values() if j.finished]
+        for j in finished[:max(0, len(finished) - JOB_HISTORY_KEEP)]:
+            del self._jobs[j.id]
+
+    def _dispatch_locked(self):
+        """在上限內啟動可執行的排隊工作（同專案已達上限的先跳過，不阻擋其他專案）"""
+        for job in list(self._queue):
+            if len(self._running) >= self.max_workers:
+                return
+            key = self._project_key(job.project)
+            if key is not None and self._running_by_project[key] >= self.per_project_limit:
+                continue
+            self._queue.remove(job)
+            job.state = Job.RUNNING
+            job.started = time.time()
+            self._running[job.id] = job
+            self._running_by_project[key] += 1
+            job.holds_project_slot = True
+            threading.Thread(target=self._work, args=(job,), name=f"job-{job.id}", daemon=True).start()
+
+    def _work(self, job):
+        try:
+            job.result = self._runner(job)
+        except Exception as e:
+            job.error = e
+        finally:
+            with self._cond:
+                job.ended = time.time()
+                if job.cancel_event.is_set():
+                    job.state = Job.CANCELLED
+                elif job.error is not None or job.result not in (None, 0):
+                    job.state = Job.FAILED
                 else:
-                    self.log("process.stdout is None")
-            except Exception as e:
-                self.log(f"讀取 subprocess 輸出錯誤: {e}\n{traceback.format_exc()}")
-                try:
-                    if process.poll() is None:
-                        process.terminate()
-                except Exception:
-                    pass
+                    job.state = Job.DONE
+                self._running.pop(job.id, None)
+                if job.holds_project_slot:
+                    job.holds_project_slot = False
+                    self._drop_project_locked(job.project)
+                if not self._shutdown:
+                    self._dispatch_locked()
+                self._cond.notify_all()
+            self._notify()
 
+    def _notify(self):
+        if self.on_change:
             try:
-                rc = process.wait(timeout=10)
+                self.on_change()
             except Exception:
+                pass
+
+    def get(self, job_id):
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._cond:
+            return list(self._jobs.values())
+
+    def active(self):
+        with self._cond:
+            return [j for j in self._jobs.values() if not j.finished]
+
+    def cancel(self, job_id):
+        """排隊中的工作直接標記取消；執行中的工作設定取消旗標並回傳，由呼叫端終止 process"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return None
+            job.request_cancel()
+            if job.state == Job.QUEUED:
                 try:
-                    try:
-                        if os.name == 'nt':
-                            process.kill()
-                        else:
-                            os.killpg(os.getpgid(process.pid), signal.SIGKILL)
-                    except Exception:
-                        pass
-                except Exception:
+                    self._queue.remove(job)
+                except ValueError:
                     pass
-                try:
-                    rc = process.wait()
-                except Exception:
-                    rc = -1
+                job.state = Job.CANCELLED
+                job.ended = time.time()
+                self._cond.notify_all()
+        self._notify()
+        return job
 
-            return rc
-        except Exception as e:
+    def wait_all(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._running or self._queue:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def shutdown(self):
+        with self._cond:
+            self._shutdown = True
+
+
+def available_memory_bytes():
+    """目前可用的實體記憶體（取不到時回傳 None）"""
+    try:
+        if os.name == 'nt':
+            import ctypes
+
+            class MEMORYSTATUSEX(ctypes.Structure):
+                _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                            ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                            ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                            ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                            ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+            stat = MEMORYSTATUSEX()
+            stat.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+            if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(stat)):
+                return stat.ullAvailPhys
+            return None
+        if os.path.exists("/proc/meminfo"):
+            with open("/proc/meminfo", 'r') as f:
+                for line in f:
+                    if line.startswith("MemAvailable:"):
+                        return int(line.split()[1]) * 1024
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def default_batch_parallelism():
+    """PyInstaller 吃 CPU 也吃記憶體：取「核心數的一半」與「可用記憶體可容納的份數」較小者"""
+    by_cpu = max(1, (os.cpu_count() or 2) // 2)
+    mem = available_memory_bytes()
+    by_mem = max(1, int(mem // BATCH_MEM_PER_BUILD)) if mem else by_cpu
+    return max(1, min(by_cpu, by_mem))
+
+
+class ResourceSampler:
+    """定期讀取 /proc，統計每個工作整棵 process tree 的 CPU 時間與 RSS（非 Linux 時停用）"""
+    def __init__(self, interval=RESOURCE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.enabled = os.path.isdir("/proc/self") and hasattr(os, "sysconf")
+        self._tick = os.sysconf("SC_CLK_TCK") if self.enabled else 100
+        self._page = os.sysconf("SC_PAGE_SIZE") if self.enabled else 4096
+        self._lock = threading.Lock()
+        self._tracked = {}   # root pid -> [job, 最近一次取樣的 CPU 秒數, RSS]
+        self._thread = None
+
+    def track(self, job, pid):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._tracked[pid] = [job, 0.0, 0]
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="resource-sampler", daemon=True)
+                self._thread.start()
+
+    def untrack(self, pid):
+        """指令結束時呼叫（在 wait() 回收之前），最後取樣一次並把 CPU 時間併入工作累計"""
+        with self._lock:
+            if pid not in self._tracked:
+                return
+        self.sample()
+        with self._lock:
+            entry = self._tracked.pop(pid, None)
+            if entry is None:
+                return
+            job, cpu = entry[0], entry[1]
+            for j in (job, job.parent):
+                if j is not None:
+                    j.cpu_done += cpu
+                    # 同工作或兄弟子工作 (批次 / 矩陣 / 管線) 可能仍在執行，以其餘 process 的最近取樣重算
+                    live = [e for e in self._tracked.values() if e[0] is j or e[0].parent is j]
+                    j.cpu_seconds = j.cpu_done + sum(e[1] for e in live)
+                    j.rss = sum(e[2] for e in live)
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._tracked:
+                    self._thread = None
+                    return
+            try:
+                self.sample()
+            except Exception:
+                pass
+
+    def _read_stat(self, pid):
+        """傳回 (ppid, 含已回收子行程的 CPU 秒數)；讀不到時為 None"""
+        try:
+            with open(f"/proc/{pid}/stat", 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        # comm 可能含空白或括號，從最後一個 ')' 之後開始切欄位
+        fields = data[data.rfind(b")") + 2:].split()
+        try:
+            ticks = int(fields[11]) + int(fields[12]) + int(fields[13]) + int(fields[14])
+            return int(fields[1]), ticks / self._tick
+        except (IndexError, ValueError):
+            return None
+
+    def _read_rss(self, pid):
+        """(目前 RSS, 此 process 的 VmHWM 峰值) bytes"""
+        rss = hwm = 0
+        try:
+            with open(f"/proc/{pid}/status", 'r') as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        rss = int(line.split()[1]) * 1024
+                    elif line.startswith("VmHWM:"):
+                        hwm = int(line.split()[1]) * 1024
+        except (OSError, ValueError):
+            pass
+        return rss, hwm
+
+    def sample(self):
+        with self._lock:
+            tracked = {pid: entry[0] for pid, entry in self._tracked.items()}
+        if not tracked:
+            return
+        children = collections.defaultdict(list)
+        cpu = {}
+        for name in os.listdir("/proc"):
+            if not name.isdigit():
+                continue
+            st = self._read_stat(int(name))
+            if st is not None:
+                children[st[0]].append(int(name))
+                cpu[int(name)] = st[1]
+
+        usage = collections.defaultdict(lambda: [0.0, 0, 0])   # job -> [cpu, rss, hwm]
+        cpu_by_pid = {}
+        for root, job in tracked.items():
+            tree, stack = [], [root]
+            while stack:
+                pid = stack.pop()
+                if pid in cpu:
+                    tree.append(pid)
+                    stack.extend(children.get(pid, ()))
+            tree_cpu = sum(cpu[p] for p in tree)
+            tree_rss = tree_hwm = 0
+            for p in tree:
+                rss, hwm = self._read_rss(p)
+                tree_rss += rss
+                tree_hwm = max(tree_hwm, hwm)
+            cpu_by_pid[root] = (tree_cpu, tree_rss)
+            # 子工作 (管線 stage / 批次子專案) 同時計入父工作
+            for j in (job, job.parent):
+                if j is not None:
+                    u = usage[j]
+                    u[0] += tree_cpu
+                    u[1] += tree_rss
+                    u[2] = max(u[2], tree_hwm)
+
+        with self._lock:
+            for pid, (value, rss) in cpu_by_pid.items():
+                if pid in self._tracked and value:
+                    self._tracked[pid][1] = value
+                if pid in self._tracked:
+                    self._tracked[pid][2] = rss
+        for job, (c, rss, hwm) in usage.items():
+            job.cpu_seconds = job.cpu_done + c
+            job.rss = rss
+            job.peak_rss = max(job.peak_rss, rss, hwm)
+
+
+PIPELINE_STAGE_TYPES = ("cmd", "run", "clean", "build", "matrix", "publish")
+
+
+class Pipeline:
+    """devops_config.json 宣告的 stage DAG：正規化設定、檢查相依與循環、計算關鍵路徑"""
+    def __init__(self, stages, order, max_parallel=None):
+        self.stages = stages
+        self.order = order
+        self.max_parallel = max_parallel
+
+    @classmethod
+    def from_config(cls, data):
+        spec = data.get("pipeline")
+        if not spec:
+            raise ValueError("devops_config.json 未定義 pipeline")
+        max_parallel = None
+        if isinstance(spec, dict) and "stages" in spec:
+            max_parallel = spec.get("max_parallel")
+            spec = spec["stages"]
+        if isinstance(spec, list):
+            try:
+                spec = {s["name"]: s for s in spec}
+            except (KeyError, TypeError):
+                raise ValueError("stages 清單中的每個 stage 都需要 name")
+        if not isinstance(spec, dict) or not spec:
+            raise ValueError("pipeline.stages 格式錯誤")
+
+        stages = {}
+        for name, raw in spec.items():
+            stage = {"cmd": raw} if isinstance(raw, str) else dict(raw)
+            kind = stage.get("type") or ("cmd" if "cmd" in stage else name)
+            if kind not in PIPELINE_STAGE_TYPES:
+                raise ValueError(f"stage '{name}' 的類型 '{kind}' 無效 (可用: {', '.join(PIPELINE_STAGE_TYPES)})")
+            if kind == "cmd" and not stage.get("cmd"):
+                raise ValueError(f"stage '{name}' 缺少 cmd")
+            after = stage.get("after", stage.get("needs", []))
+            stage["after"] = [after] if isinstance(after, str) else list(after)
+            stage["type"] = kind
+            stages[name] = stage
+
+        for name, stage in stages.items():
+            for dep in stage["after"]:
+                if dep not in stages:
+                    raise ValueError(f"stage '{name}' 相依的 '{dep}' 不存在")
+
+        # Kahn 拓撲排序，保留宣告順序作為同層的先後
+        indeg = {n: len(s["after"]) for n, s in stages.items()}
+        order = []
+        ready = [n for n in stages if indeg[n] == 0]
+        while ready:
+            n = ready.pop(0)
+            order.append(n)
+            for m, s in stages.items():
+                if n in s["after"]:
+                    indeg[m] -= 1
+                    if indeg[m] == 0:
+                        ready.append(m)
+        if len(order) != len(stages):
+            cyc = [n for n in stages if n not in order]
+            raise ValueError(f"stage 相依存在循環: {', '.join(cyc)}")
+        return cls(stages, order, max_parallel)
+
+    def critical_path(self, durations):
+        """依實際耗時找出最長的相依鏈（只計入有執行的 stage）"""
+        finish = {}
+        prev = {}
+        for n in self.order:
+            if n not in durations:
+                continue
+            best, best_dep = 0.0, None
+            for d in self.stages[n]["after"]:
+                if d in finish and finish[d] > best:
+                    best, best_dep = finish[d], d
+            finish[n] = best + durations[n]
+            prev[n] = best_dep
+        if not finish:
+            return [], 0.0
+        end = max(finish, key=finish.get)
+        path = []
+        node = end
+        while node is not None:
+            path.append(node)
+            node = prev[node]
+        return list(reversed(path)), finish[end]
+
+
+class SourceWatcher:
+    """監看專案原始碼：Linux 用 inotify (ctypes)，其他平台或 watch 數不足時以 mtime/size 索引輪詢"""
+    IN_MODIFY, IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO = 0x2, 0x8, 0x40, 0x80
+    IN_CREATE, IN_DELETE, IN_Q_OVERFLOW, IN_ISDIR = 0x100, 0x200, 0x4000, 0x40000000
+
+    def __init__(self, root, patterns=WATCH_PATTERNS, skip_dirs=()):
+        self.root = os.path.abspath(root)
+        self.patterns = tuple(patterns)
+        self.skip_dirs = set(skip_dirs)
+        self._fd = None
+        self._wds = {}
+        self._index = {}
+        self._interval = WATCH_POLL_INTERVAL
+        self._next_poll = 0.0
+        if sys.platform.startswith("linux"):
+            try:
+                self._init_inotify()
+            except OSError:
+                self.close()
+        if self._fd is None:
+            self._index = self._scan()
+
+    @property
+    def mode(self):
+        return "inotify" if self._fd is not None else "polling"
+
+    def _matches(self, name):
+        return any(fnmatch.fnmatch(name, p) for p in self.patterns)
+
+    def _skipped(self, name):
+        # skip_dirs 可含 glob，例如矩陣建置的 venv_build-*
+        return name in self.skip_dirs or any(fnmatch.fnmatch(name, p) for p in self.skip_dirs)
+
+    def _walk_dirs(self, top):
+        stack = [top]
+        while stack:
+            d = stack.pop()
+            yield d
+            try:
+                with os.scandir(d) as it:
+                    for e in it:
+                        if not self._skipped(e.name) and e.is_dir(follow_symlinks=False):
+                            stack.append(e.path)
+            except OSError:
+                continue
+
+    # --- inotify ---
+    def _init_inotify(self):
+        import ctypes
+        import ctypes.util
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self._fd = fd
+        for d in self._walk_dirs(self.root):
+            self._add_watch(d)
+
+    def _add_watch(self, path):
+        import ctypes
+        mask = (self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_FROM | self.IN_MOVED_TO
+                | self.IN_CREATE | self.IN_DELETE)
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), mask)
+        if wd < 0:
+            # 通常是 fs.inotify.max_user_watches 不足 (ENOSPC)，由呼叫端改用輪詢
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch {path}")
+        self._wds[wd] = path
+
+    def _read_inotify(self):
+        import struct
+        changed = set()
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            pos = 0
+            while pos + 16 <= len(data):
+                wd, mask, _cookie, length = struct.unpack_from("iIII", data, pos)
+                name = data[pos + 16:pos + 16 + length].split(b"\0", 1)[0].decode('utf-8', 'replace')
+                pos += 16 + length
+                if mask & self.IN_Q_OVERFLOW:
+                    changed.add(self.root)
+                    continue
+                base = self._wds.get(wd)
+                if base is None or not name:
+                    continue
+                path = os.path.join(base, name)
+                if mask & self.IN_ISDIR:
+                    if self._skipped(name):
+                        continue
+                    if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                        # 新目錄：加入監看，並把已經在裡面的檔案視為變更
+                        for d in self._walk_dirs(path):
+                            try:
+                                self._add_watch(d)
+                            except OSError:
+                                pass
+                        changed.add(path)
+                    continue
+                if self._matches(name):
+                    changed.add(path)
+        return changed
+
+    # --- 輪詢 ---
+    def _scan(self):
+        index = {}
+        for d in self._walk_dirs(self.root):
+            try:
+                with os.scandir(d) as it:
+                    for e in it:
+                        if self._matches(e.name) and e.is_file(follow_symlinks=False):
+                            st = e.stat(follow_symlinks=False)
+                            index[e.path] = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                continue
+        return index
+
+    def _poll(self):
+        t0 = time.monotonic()
+        index = self._scan()
+        cost = time.monotonic() - t0
+        # 掃描成本決定下一次輪詢的間隔，數萬個檔案時 CPU 也只佔 WATCH_POLL_CPU_SHARE
+        self._interval = max(WATCH_POLL_INTERVAL, cost / WATCH_POLL_CPU_SHARE)
+        self._next_poll = time.monotonic() + self._interval
+        old, self._index = self._index, index
+        changed = {p for p, sig in index.items() if old.get(p) != sig}
+        changed.update(p for p in old if p not in index)
+        return changed
+
+    def _collect(self, timeout):
+        """最多等待 timeout 秒，傳回這段期間變更的檔案"""
+        if self._fd is not None:
+            import select
+            ready, _, _ = select.select([self._fd], [], [], max(0.0, timeout))
+            return self._read_inotify() if ready else set()
+        delay = self._next_poll - time.monotonic()
+        if delay > timeout:
+            time.sleep(max(0.0, timeout))
+            return set()
+        time.sleep(max(0.0, delay))
+        return self._poll()
+
+    def wait(self, timeout):
+        """等待變更並去抖動：第一筆變更後，直到靜止 WATCH_DEBOUNCE 秒（最多 WATCH_DEBOUNCE_MAX）才回傳"""
+        changed = self._collect(timeout)
+        if not changed:
+            return changed
+        first = time.monotonic()
+        while time.monotonic() - first < WATCH_DEBOUNCE_MAX:
+            more = self._collect(WATCH_DEBOUNCE if self._fd is not None else min(WATCH_DEBOUNCE, self._interval))
+            if not more:
+                break
+            changed |= more
+        return changed
+
+    def close(self):
+        if self._fd is not None:
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+            self._fd = None
+        self._wds = {}
+
+
+class TaskHandler:
+    """負責執行具體任務"""
+    def __init__(self, log_callback, config=None):
+        self._sink = log_callback
+        self._local = threading.local()
+        # 不在排程器內直接呼叫 action 時使用的預設工作（維持舊的單一 process 行為）
+        self._default_job = Job(0, "main", None)
+        self.scheduler = JobScheduler(runner=self._run_job)
+        self.artifacts = ArtifactStore()
+        self.config = config or ConfigStore(self.log)
+        self.last_stop_latency = None
+        self.tag_logs = True
+        self.telemetry = Telemetry()
+        self.sampler = ResourceSampler()
+
+    def _job(self):
+        return getattr(self._local, "job", None) or self._default_job
+
+    def log(self, msg):
+        """寫入日誌；在工作內執行時加上工作標籤並存入該工作的日誌通道"""
+        job = getattr(self._local, "job", None)
+        if job is None:
+            self._sink(msg)
+            return
+        job.log_lines.append(msg)
+        if job.parent is not None:
+            job.parent.log_lines.append(msg)
+        if self.tag_logs:
+            self._sink(f"[{job.tag}] {msg}")
+        elif job.parent is not None:
+            # 不顯示工作編號時，仍以子工作名稱區分平行輸出
+            self._sink(f"[{job.name.rsplit('/', 1)[-1]}] {msg}")
+        else:
+            self._sink(msg)
+
+    def _run_job(self, job):
+        self._local.job = job
+        started = time.time()
+        result = None
+        try:
+            self.log(f"工作開始 ({job.project})")
+            result = job.func(*job.args)
+            res = job.resources()
+            self.log(f"工作結束 ({job.duration():.1f} 秒，CPU {res['cpu_seconds']:.1f} 秒，"
+                     f"峰值記憶體 {res['peak_rss'] / 1024 ** 2:.0f} MB)")
+            return result
+        except Exception as e:
+            result = 1
+            self.log(f"工作執行失敗: {e}\n{traceback.format_exc()}")
+            raise
+        finally:
+            self._local.job = None
+            self.telemetry.record("action", job.name, job.project, started, time.time(), job=job.id,
+                                  rc=result if isinstance(result, int) else 0,
+                                  cancelled=job.cancel_event.is_set(), **job.resources())
+
+    def submit(self, name, project, func, *args):
+        return self.scheduler.submit(name, project, func, *args)
+
+    def cancel_job(self, job_id):
+        """取消單一工作：送出終止訊號後立即返回，未結束的 process 由 run_cmd 升級為 kill"""
+        job = self.scheduler.cancel(job_id)
+        if job is None:
+            return False
+        self._signal_job(job)
+        self._sink(f"[{job.tag}] 已要求取消")
+        return True
+
+    def _signal_job(self, job):
+        job.request_cancel()
+        with job.process_lock:
+            p = job.process
+        if p is not None:
+            self._terminate_process_group(p)
+
+    def _terminate_process_group(self, process):
+        try:
+            if process.poll() is not None:
+                return
+        except Exception:
+            pass
+
+        try:
+            if os.name == 'nt':
+                try:
+                    # 需要 process 是 new process group 才能生效
+                    process.send_signal(signal.CTRL_BREAK_EVENT)
+                    self.log("已向 Windows process group 發送 CTRL_BREAK_EVENT。")
+                except Exception as e:
+                    self.log(f"發送 CTRL_BREAK_EVENT 失敗: {e}")
+                    try:
+                        process.terminate()
+                    except Exception:
+                        pass
+            else:
+                try:
+                    pgid = os.getpgid(process.pid)
+                    os.killpg(pgid, signal.SIGTERM)
+                    self.log("已對 process group 發送 SIGTERM。")
+                except Exception as e:
+                    self.log(f"對 process group 發送 SIGTERM 失敗: {e}")
+        except Exception:
+            pass
+
+    def _kill_process_group(self, process):
+        try:
+            if os.name == 'nt':
+                # shell=True 時 process 只是 cmd.exe，需以 taskkill /T 連同子孫 process 一併結束
+                try:
+                    subprocess.run(["taskkill", "/T", "/F", "/PID", str(process.pid)],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                   timeout=CMD_KILL_GRACE, creationflags=subprocess.CREATE_NO_WINDOW)
+                except Exception:
+                    pass
+                if process.poll() is None:
+                    process.kill()
+            else:
+                os.killpg(os.getpgid(process.pid), signal.SIGKILL)
+        except Exception:
+            pass
+
+    @staticmethod
+    def _read_chunks(stream):
+        """產生器：有資料時 yield bytes，CMD_POLL_INTERVAL 內無資料時 yield None，EOF 時結束"""
+        fd = stream.fileno()
+        if os.name != 'nt':
+            os.set_blocking(fd, False)
+            with selectors.DefaultSelector() as sel:
+                sel.register(fd, selectors.EVENT_READ)
+                while True:
+                    if not sel.select(CMD_POLL_INTERVAL):
+                        yield None
+                        continue
+                    try:
+                        data = os.read(fd, CMD_READ_CHUNK)
+                    except BlockingIOError:
+                        continue
+                    if not data:
+                        return
+                    yield data
+        else:
+            # Windows 的 pipe 不支援 select，改由讀取執行緒轉送到佇列
+            q = queue.Queue()
+
+            def reader():
+                try:
+                    while True:
+                        data = os.read(fd, CMD_READ_CHUNK)
+                        q.put(data)
+                        if not data:
+                            return
+                except OSError:
+                    q.put(b"")
+
+            threading.Thread(target=reader, daemon=True).start()
+            while True:
+                try:
+                    data = q.get(timeout=CMD_POLL_INTERVAL)
+                except queue.Empty:
+                    yield None
+                    continue
+                if not data:
+                    return
+                yield data
+
+    @staticmethod
+    def _step_name(command):
+        """由指令推出統計用的步驟名稱，例如 'venv'、'pip install'、'pyinstaller'、'git push'"""
+        if not isinstance(command, str):
+            command = " ".join(command)
+        try:
+            tokens = [t.strip('"\'') for t in shlex.split(command, posix=False)]
+        except ValueError:
+            tokens = command.split()
+        if not tokens:
+            return "cmd"
+        exe = os.path.splitext(os.path.basename(tokens[0].replace("\\", "/")))[0].lower()
+        rest = tokens[1:]
+        if exe.rstrip("0123456789.") in ("python", "pythonw", "py"):
+            if len(rest) >= 2 and rest[0] == "-m":
+                exe, rest = rest[1].lower(), rest[2:]
+            elif rest:
+                return f"python {os.path.basename(rest[0])}"
+        if exe in ("pip", "git"):
+            sub = next((t for t in rest if not t.startswith("-")), "")
+            return f"{exe} {sub}".strip()
+        return exe
+
+    def run_cmd(self, command, cwd=None, env=None, shell=True, timeout=None, step=None):
+        """執行指令並即時轉送輸出；timeout 為此步驟的秒數上限（None 表示不限），step 為遙測用的步驟名稱"""
+        job = self._job()
+        if timeout is None:
+            timeout = job.step_timeout
+        if job is self._default_job:
+            job.cancel_event.clear()
+            job.stop_requested_at = None
+        elif job.cancel_event.is_set():
+            self.log(f"工作已取消，略過: {command}")
+            return -1
+        process = None
+        try:
+            self.log(f"[{cwd}] > {command}")
+            env_copy = os.environ.copy()
+            env_copy["PYTHONIOENCODING"] = "utf-8"
+            if env:
+                env_copy.update(env)
+
+            popen_kwargs = {
+                "stdout": subprocess.PIPE,
+                "stderr": subprocess.STDOUT,
+                "shell": shell,
+                "cwd": cwd,
+                "env": env_copy,
+                "bufsize": 0
+            }
+
+            if os.name == 'nt':
+                popen_kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+            else:
+                popen_kwargs["preexec_fn"] = os.setsid
+
+            process = subprocess.Popen(command, **popen_kwargs)
+
+            with job.process_lock:
+                job.process = process
+            self.sampler.track(job, process.pid)
+
+            started = time.monotonic()
+            started_wall = time.time()
+            out_bytes = out_lines = 0
+            stop_at = None
+            killed_at = None
+            try:
+                # 防護：process.stdout 可能為 None
+                if process.stdout is not None:
+                    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+                    pending = ""
+                    chunks = self._read_chunks(process.stdout)
+                    for chunk in chunks:
+                        if chunk:
+                            out_bytes += len(chunk)
+                            pending += decoder.decode(chunk)
+                            if "\n" in pending:
+                                lines = pending.split("\n")
+                                pending = lines.pop()
+                                out_lines += len(lines)
+                                for line in lines:
+                                    # 進度列以 \r 覆寫同一行，只保留最後一段
+                                    self.log(line.rstrip("\r").rsplit("\r", 1)[-1].rstrip())
+                            if len(pending) > CMD_MAX_LINE:
+                                out_lines += 1
+                                self.log(pending)
+                                pending = ""
+
+                        # 不論有無輸出，每個 poll 週期都檢查取消與逾時
+                        now = time.monotonic()
+                        if stop_at is None:
+                            if job.cancel_event.is_set():
+                                stop_at = job.stop_requested_at or now
+                                self._terminate_process_group(process)
+                            elif timeout and now - started > timeout:
+                                stop_at = now
+                                self.log(f"步驟逾時 ({timeout} 秒)，終止指令。")
+                                self._terminate_process_group(process)
+                        elif killed_at is None:
+                            if now - stop_at > CMD_KILL_GRACE:
+                                self._kill_process_group(process)
+                                killed_at = now
+                        elif now - killed_at > CMD_KILL_GRACE:
+                            # 脫離掌控的子孫 process 仍握著 pipe：不再等 EOF，直接關閉輸出
+                            self.log("強制終止後輸出仍未結束，不再等待剩餘輸出。")
+                            break
+                    chunks.close()
+                    pending += decoder.decode(b"", final=True)
+                    if pending.strip():
+                        out_lines += 1
+                        self.log(pending.rstrip("\r").rsplit("\r", 1)[-1].rstrip())
+                    # close stdout if still open
+                    if os.name == 'nt' and killed_at is not None:
+                        # Windows 上讀取執行緒可能仍卡在 ReadFile，關閉 handle 會跟著卡住，交給背景執行緒
+                        def close_stdout(stream=process.stdout):
+                            try:
+                                stream.close()
+                            except Exception:
+                                pass
+                        threading.Thread(target=close_stdout, daemon=True).start()
+                    else:
+                        try:
+                            process.stdout.close()
+                        except Exception:
+                            pass
+                else:
+                    self.log("process.stdout is None")
+            except Exception as e:
+                self.log(f"讀取 subprocess 輸出錯誤: {e}\n{traceback.format_exc()}")
+                try:
+                    if process.poll() is None:
+                        process.terminate()
+                except Exception:
+                    pass
+
+            # 輸出結束時 process 通常已結束但尚未被回收，/proc 仍保有它的 CPU 時間
+            self.sampler.untrack(process.pid)
+
+            try:
+                rc = process.wait(timeout=10)
+            except Exception:
+                self._kill_process_group(process)
+                try:
+                    rc = process.wait()
+                except Exception:
+                    rc = -1
+
+            if stop_at is None and job.cancel_event.is_set():
+                stop_at = job.stop_requested_at
+            if stop_at is not None:
+                self.last_stop_latency = job.last_stop_latency = time.monotonic() - stop_at
+                self.log(f"指令已停止 (停止延遲 {self.last_stop_latency * 1000:.0f} ms)")
+            self.telemetry.record("cmd", step or self._step_name(command), job.project or cwd,
+                                  started_wall, time.time(), job=job.id, rc=rc,
+                                  bytes=out_bytes, lines=out_lines, stopped=stop_at is not None)
+            return rc
+        except Exception as e:
             self.log(f"指令錯誤: {e}\n{traceback.format_exc()}")
             return 1
         finally:
-            with self.process_lock:
-                self.current_process = None
-                self.stop_event.clear()
+            with job.process_lock:
+                job.process = None
+            if process is not None:
+                self.sampler.untrack(process.pid)
+
+    def stop_all(self):
+        """取消所有工作（含排隊中的），並等待執行中的 process 結束"""
+        jobs = [self._default_job]
+        for job in self.scheduler.active():
+            if self.scheduler.cancel(job.id) is not None:
+                jobs.append(job)
+        self._default_job.request_cancel()
+        for job in jobs:
+            with job.process_lock:
+                p = job.process
+            if p is not None:
+                self._stop_process(p)
+
+    def _stop_process(self, p):
+        try:
+            try:
+                self._terminate_process_group(p)
+            except Exception:
+                pass
+            try:
+                p.wait(timeout=3)
+                return
+            except Exception:
+                pass
+            try:
+                if p.poll() is None:
+                    p.terminate()
+            except Exception:
+                pass
+            try:
+                p.wait(timeout=2)
+            except Exception:
+                self._kill_process_group(p)
+        except Exception:
+            pass
+
+    # --- 清理引擎 ---
+    @staticmethod
+    def _match_clean_pattern(rel, name, is_dir, patterns):
+        """patterns 為 glob；結尾 '/' 表示只比對目錄，不含 '/' 的 pattern 也比對檔名"""
+        for pat in patterns:
+            dir_only = pat.endswith("/")
+            pat = pat.rstrip("/")
+            if dir_only and not is_dir:
+                continue
+            if fnmatch.fnmatch(rel, pat) or ("/" not in pat and fnmatch.fnmatch(name, pat)):
+                return True
+        return False
+
+    def _scan_clean_targets(self, project_path, venv_name, patterns=()):
+        """以 os.scandir 走訪專案一次，收集 (相對路徑, 是否為目錄)；符合的目錄不再往下走"""
+        top_dirs = {"build", "dist", venv_name, CLEAN_TRASH_DIR}
+        targets = []
+        stack = [("", project_path)]
+        while stack:
+            rel_dir, abs_dir = stack.pop()
+            try:
+                it = os.scandir(abs_dir)
+            except OSError:
+                continue
+            with it:
+                for entry in it:
+                    rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        if (not rel_dir and entry.name in top_dirs) or entry.name == "__pycache__" \
+                                or (not rel_dir and entry.name.startswith(venv_name + "-")
+                                    and os.path.exists(os.path.join(entry.path, "pyvenv.cfg"))) \
+                                or self._match_clean_pattern(rel, entry.name, True, patterns):
+                            targets.append((rel, True))
+                        elif entry.name != ".git" and not os.path.exists(os.path.join(entry.path, "pyvenv.cfg")):
+                            # 其他 venv 與 .git 不屬於清理範圍，也不往下走
+                            stack.append((rel, entry.path))
+                    elif entry.name.endswith((".pyc", ".pyo")) or (not rel_dir and entry.name.endswith(".spec")) \
+                            or self._match_clean_pattern(rel, entry.name, False, patterns):
+                        targets.append((rel, False))
+        return sorted(targets)
+
+    @staticmethod
+    def _measure_tree(path):
+        """回傳 (位元組數, 檔案數)"""
+        total = files = 0
+        stack = [path]
+        while stack:
+            p = stack.pop()
+            try:
+                it = os.scandir(p)
+            except NotADirectoryError:
+                try:
+                    return os.lstat(p).st_size, 1
+                except OSError:
+                    return 0, 0
+            except OSError:
+                continue
+            with it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            total += entry.stat(follow_symlinks=False).st_size
+                            files += 1
+                    except OSError:
+                        pass
+        return total, files
+
+    # Python 3.12 起 onerror 已棄用 (DeprecationWarning)，改用參數相同、只差第三個參數為例外物件的 onexc
+    RMTREE_ERROR_ARG = "onexc" if sys.version_info >= (3, 12) else "onerror"
+
+    @staticmethod
+    def _rm_onerror(func, path, exc_info):
+        # Windows 唯讀檔 (例如 .git 物件) 需先取消唯讀
+        try:
+            os.chmod(path, 0o700)
+            func(path)
+        except OSError:
+            pass
+
+    def _parallel_rmtree(self, paths):
+        """把目錄拆成 CLEAN_SPLIT_DEPTH 層內的子樹與檔案，交給多個執行緒同時刪除"""
+        units = []
+        skeleton = []
+        frontier = [(p, 0) for p in paths]
+        while frontier:
+            p, depth = frontier.pop()
+            if depth >= CLEAN_SPLIT_DEPTH or os.path.islink(p) or not os.path.isdir(p):
+                units.append(p)
+                continue
+            skeleton.append(p)
+            try:
+                with os.scandir(p) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            frontier.append((entry.path, depth + 1))
+                        else:
+                            units.append(entry.path)
+            except OSError:
+                pass
+
+        def remove(p):
+            try:
+                if os.path.isdir(p) and not os.path.islink(p):
+                    shutil.rmtree(p, **{self.RMTREE_ERROR_ARG: self._rm_onerror})
+                else:
+                    os.remove(p)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                self._rm_onerror(os.remove, p, None)
+
+        with ThreadPoolExecutor(max_workers=CLEAN_WORKERS) as pool:
+            list(pool.map(remove, units))
+        for d in sorted(skeleton, key=len, reverse=True):
+            try:
+                os.rmdir(d)
+            except OSError:
+                shutil.rmtree(d, ignore_errors=True)
+        return [p for p in paths if os.path.lexists(p)]
+
+    def action_clean(self, project_path, venv_name, dry_run=False, background=True):
+        """清理建置產物：dry_run 只回報大小；background 時目錄先改名搬走，再於背景平行刪除"""
+        self.log("--- 預覽清理 (dry-run) ---" if dry_run else "--- 清理暫存檔案 ---")
+        cfg = self._project_config(project_path)
+        patterns = cfg.get("clean_patterns", [])
+        t0 = time.monotonic()
+        targets = self._scan_clean_targets(project_path, venv_name, patterns)
+        self.log(f"掃描完成：{len(targets)} 個目標 ({(time.monotonic() - t0) * 1000:.0f} ms)")
+        if not targets:
+            self.log("沒有需要清理的項目。")
+            return 0
+
+        if dry_run:
+            rows = []
+            for rel, is_dir in targets:
+                size, files = self._measure_tree(os.path.join(project_path, rel))
+                rows.append((size, files, rel + ("/" if is_dir else "")))
+            rows.sort(reverse=True)
+            for size, files, rel in rows[:30]:
+                self.log(f"  {size / 1024 / 1024:10.2f} MB {files:8d} 檔  {rel}")
+            if len(rows) > 30:
+                rest = rows[30:]
+                self.log(f"  {sum(r[0] for r in rest) / 1024 / 1024:10.2f} MB {sum(r[1] for r in rest):8d} 檔  (其餘 {len(rest)} 個目標)")
+            self.log(f"合計 {sum(r[0] for r in rows) / 1024 / 1024:.2f} MB，{sum(r[1] for r in rows)} 個檔案。未刪除任何檔案。")
+            return 0
+
+        failed = []
+        for rel, is_dir in targets:
+            if not is_dir:
+                try:
+                    os.remove(os.path.join(project_path, rel))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    failed.append(rel)
+                    self.log(f"刪除失敗 {rel}: {e}")
+        dirs = [os.path.join(project_path, rel) for rel, is_dir in targets if is_dir]
+        trash_root = os.path.join(project_path, CLEAN_TRASH_DIR)
+
+        if background:
+            # 同一檔案系統內改名是瞬間完成的，真正的刪除交給背景執行緒
+            batch = os.path.join(trash_root, time.strftime("%Y%m%d_%H%M%S") + f"_{os.getpid()}_{threading.get_ident()}")
+            direct = []
+            try:
+                os.makedirs(batch, exist_ok=True)
+            except OSError:
+                direct = dirs
+            else:
+                for i, d in enumerate(dirs):
+                    if os.path.normpath(d) == os.path.normpath(trash_root):
+                        continue
+                    try:
+                        os.rename(d, os.path.join(batch, f"{i}_{os.path.basename(d)}"))
+                    except OSError:
+                        direct.append(d)
+            failed += [os.path.relpath(p, project_path) for p in self._parallel_rmtree(direct)]
+
+            def purge():
+                t1 = time.monotonic()
+                left = self._parallel_rmtree([trash_root])
+                if left:
+                    self.log(f"背景刪除未完成，殘留: {CLEAN_TRASH_DIR} (下次清理會再嘗試)")
+                else:
+                    self.log(f"背景刪除完成 ({time.monotonic() - t1:.1f} 秒)")
+
+            threading.Thread(target=purge, name="clean-purge", daemon=True).start()
+            self.log(f"已移除 {len(dirs)} 個目錄、{len(targets) - len(dirs)} 個檔案，目錄於背景刪除中...")
+        else:
+            failed += [os.path.relpath(p, project_path) for p in self._parallel_rmtree(dirs)]
+            self.log(f"已刪除 {len(dirs)} 個目錄、{len(targets) - len(dirs)} 個檔案 ({time.monotonic() - t0:.1f} 秒)")
+
+        if failed:
+            self.log(f"有 {len(failed)} 個項目無法刪除: {', '.join(failed[:10])}")
+            return 1
+        self.log("清理完成。")
+        return 0
+
+    def action_run(self, project_path, entry_point, watch=False):
+        self.log(f"--- 執行測試: {entry_point} ---")
+        ep = os.path.join(project_path, entry_point) if not os.path.isabs(entry_point) else entry_point
+        if not os.path.exists(ep):
+            self.log(f"入口檔案不存在: {ep}")
+            return 1
+        if watch:
+            return self._run_watch(project_path, ep)
+        return self.run_cmd(f'python "{ep}"', cwd=project_path)
+
+    def _run_watch(self, project_path, ep):
+        """監看模式：程式在子工作中執行，原始碼變更 (去抖動後) 就終止整個 process group 並重新啟動"""
+        parent = self._job()
+        cfg = self._project_config(project_path)
+        watcher = SourceWatcher(project_path, cfg.get("watch_patterns") or WATCH_PATTERNS, self.SKIP_DIRS)
+        self.log(f"監看模式 ({watcher.mode})：{', '.join(watcher.patterns)} 變更時自動重新啟動，停止工作即結束。")
+        # 監看會一直執行到使用者停止，不佔用專案名額，否則同專案的建置 / 清理會無聲地排隊等待
+        if self.scheduler.release_project_slot(parent):
+            self.log("監看工作不佔用專案名額，同專案的其他工作可同時執行。")
+        state = {}
+
+        def start():
+            child = Job(parent.id, f"{parent.name}/run", parent.project, parent=parent)
+
+            def target():
+                self._local.job = child
+                try:
+                    state["rc"] = self.run_cmd(f'python "{ep}"', cwd=project_path)
+                finally:
+                    self._local.job = None
+            state["rc"] = None
+            th = threading.Thread(target=target, name="watch-run", daemon=True)
+            th.start()
+            return child, th
+
+        def stop(child, th):
+            self._signal_job(child)
+            th.join()
+
+        child, th = start()
+        try:
+            while not parent.cancel_event.is_set():
+                changed = watcher.wait(CMD_POLL_INTERVAL)
+                if parent.cancel_event.is_set():
+                    break
+                if not changed:
+                    if not th.is_alive() and "exited" not in state:
+                        state["exited"] = True
+                        self.log(f"程式已結束 (rc={state['rc']})，等待檔案變更後重新啟動...")
+                    continue
+                names = sorted(os.path.relpath(p, project_path) for p in changed)
+                self.log(f"偵測到變更: {', '.join(names[:5])}{' ...' if len(names) > 5 else ''}，重新啟動")
+                t0 = time.monotonic()
+                stop(child, th)
+                state.pop("exited", None)
+                child, th = start()
+                self.log(f"已重新啟動 (停止舊程式 {(time.monotonic() - t0) * 1000:.0f} ms)")
+        finally:
+            watcher.close()
+            if th.is_alive():
+                stop(child, th)
+        self.log("監看模式已結束。")
+        return 0
+
+    # --- venv 快取 (以 requirements / 直譯器 / pyinstaller 版本為指紋) ---
+    ENV_CACHE_FILE = ".devops_env.json"
+
+    @staticmethod
+    def _venv_python_version(venv_path):
+        """從 pyvenv.cfg 讀出 venv 的直譯器版本，不需啟動 subprocess"""
+        cfg = os.path.join(venv_path, "pyvenv.cfg")
+        try:
+            with open(cfg, 'r', encoding='utf-8') as f:
+                for line in f:
+                    key, _, val = line.partition("=")
+                    if key.strip() in ("version", "version_info"):
+                        return val.strip()
+        except OSError:
+            pass
+        return None
+
+    @staticmethod
+    def _venv_base_prefix(venv_path):
+        """從 pyvenv.cfg 的 home 推算建立 venv 的 Python 安裝位置"""
+        try:
+            with open(os.path.join(venv_path, "pyvenv.cfg"), 'r', encoding='utf-8') as f:
+                for line in f:
+                    key, _, val = line.partition("=")
+                    if key.strip() == "home":
+                        home = val.strip()
+                        return home if os.name == 'nt' else os.path.dirname(home)
+        except OSError:
+            pass
+        return None
+
+    @staticmethod
+    def _venv_dist_version(venv_path, dist_name):
+        """掃描 venv site-packages 的 dist-info 取得已安裝版本"""
+        patterns = [
+            os.path.join(venv_path, "Lib", "site-packages", "*.dist-info"),
+            os.path.join(venv_path, "lib", "python*", "site-packages", "*.dist-info"),
+        ]
+        wanted = dist_name.lower().replace("-", "_")
+        for pattern in patterns:
+            for d in glob.glob(pattern):
+                name, _, ver = os.path.basename(d)[:-len(".dist-info")].partition("-")
+                if name.lower().replace("-", "_") == wanted:
+                    return ver
+        return None
+
+    @staticmethod
+    def _env_fingerprint(pkgs, python_ver, pyinstaller_ver):
+        h = hashlib.sha256()
+        h.update(f"python={python_ver}\n".encode('utf-8'))
+        h.update(f"pyinstaller={pyinstaller_ver}\n".encode('utf-8'))
+        for p in sorted(set(pkgs)):
+            h.update(p.encode('utf-8') + b"\n")
+        return h.hexdigest()
+
+    def _load_env_cache(self, venv_path):
+        try:
+            with open(os.path.join(venv_path, self.ENV_CACHE_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_env_cache(self, venv_path, data):
+        try:
+            with open(os.path.join(venv_path, self.ENV_CACHE_FILE), 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=4, ensure_ascii=False)
+        except OSError as e:
+            self.log(f"寫入 venv 快取資訊失敗: {e}")
+
+    def _ensure_venv_packages(self, project_path, venv_path, pip_cmd, py_cmd, pkgs, lock=None):
+        """指紋相同則完全跳過安裝；不同時只安裝有變動的套件（有鎖定檔時 pkgs 為固定版本清單）"""
+        python_ver = self._venv_python_version(venv_path)
+        pyi_ver = self._venv_dist_version(venv_path, "pyinstaller")
+        cache = self._load_env_cache(venv_path)
+
+        if cache and cache.get("fingerprint") == self._env_fingerprint(pkgs, python_ver, pyi_ver):
+            saved = cache.get("full_install_seconds", 0.0)
+            self.log(f"⚡ venv 快取命中，跳過套件安裝 (約省下 {saved:.1f} 秒)")
+            return 0
+
+        if cache and cache.get("python") == python_ver:
+            installed = set(cache.get("packages", []))
+            to_install = [p for p in pkgs if p not in installed]
+            pyi_pkg = next((p for p in pkgs if p.lower().startswith("pyinstaller")), "pyinstaller")
+            if not pyi_ver and pyi_pkg not in to_install:
+                to_install.insert(0, pyi_pkg)
+            removed = installed - set(pkgs)
+            if removed:
+                self.log(f"requirements 已移除（不自動解除安裝）: {', '.join(sorted(removed))}")
+            self.log(f"venv 快取未命中：僅安裝變動的 {len(to_install)} 個套件")
+        else:
+            to_install = list(pkgs)
+            self.log("venv 快取未命中：完整安裝套件")
+
+        rc = 0
+        elapsed = 0.0
+        if to_install:
+            # 如果 pip 不存在，改用 python -m pip 安裝
+            if not os.path.exists(pip_cmd):
+                self.log("venv pip 未找到，使用 python -m pip 安裝套件。")
+                pip_base = f'"{py_cmd}" -m pip'
+            else:
+                pip_base = f'"{pip_cmd}"'
+            t0 = time.monotonic()
+            if lock is not None:
+                rc = self._pip_install_locked(project_path, venv_path, pip_base, lock, to_install)
+            else:
+                rc = self._pip_install(project_path, pip_base, to_install)
+            elapsed = time.monotonic() - t0
+            self.log(f"套件安裝耗時 {elapsed:.1f} 秒")
+
+        if rc != 0:
+            self.log(f"套件安裝失敗 (rc={rc})，不更新 venv 快取。")
+            return rc
+
+        # 記錄完整安裝的耗時，供之後命中時估算省下的時間
+        if to_install == list(pkgs) or not cache:
+            full_seconds = elapsed
+        else:
+            full_seconds = max(elapsed, cache.get("full_install_seconds", 0.0))
+        pyi_ver = self._venv_dist_version(venv_path, "pyinstaller")
+        self._save_env_cache(venv_path, {
+            "fingerprint": self._env_fingerprint(pkgs, python_ver, pyi_ver),
+            "python": python_ver,
+            "pyinstaller": pyi_ver,
+            "packages": list(pkgs),
+            "full_install_seconds": full_seconds,
+            "updated": time.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+        return rc
+
+    # --- 共用 wheelhouse ---
+    @staticmethod
+    def _quote_specs(specs):
+        # 需求字串可能含 > < 等字元，逐一加引號避免被 shell 當成重導向
+        return " ".join(f'"{s}"' for s in specs)
+
+    @staticmethod
+    def _read_requirements(project_path):
+        """pyinstaller 加上 requirements.txt 中的需求（略過空行與註解）"""
+        pkgs = ["pyinstaller"]
+        req_file = os.path.join(project_path, "requirements.txt")
+        if os.path.exists(req_file):
+            with open(req_file, 'r', encoding='utf-8') as f:
+                pkgs += [l.strip() for l in f if l.strip() and not l.startswith('#')]
+        return pkgs
+
+    def _refill_wheelhouse(self, pip_base, specs, cwd, lock_hashes=None):
+        """以 pip wheel 補齊缺少的 wheel：先寫到暫存資料夾再逐一搬入，平行補齊時不會互相覆寫。
+        lock_hashes ({固定版本: [sha256]}) 表示 specs 為雜湊模式的鎖定條目：pip 已驗證下載的 sdist，
+        由它建置出的 wheel 雜湊不在鎖定檔中，另外記錄在 wheel 旁，離線安裝時才能一併允許"""
+        os.makedirs(WHEELHOUSE_DIR, exist_ok=True)
+        incoming = tempfile.mkdtemp(prefix=".incoming_", dir=WHEELHOUSE_DIR)
+        try:
+            rc = self.run_cmd(f'{pip_base} wheel --prefer-binary --wheel-dir "{incoming}" '
+                              f'--find-links "{WHEELHOUSE_DIR}" {self._quote_specs(specs)}', cwd=cwd, step="pip wheel")
+            built = {}
+            if rc == 0 and lock_hashes:
+                for name in os.listdir(incoming):
+                    allowed = lock_hashes.get(self._wheel_pin(name)) if name.endswith(".whl") else None
+                    if allowed:
+                        sha = self._file_sha256(os.path.join(incoming, name))
+                        if sha not in allowed:
+                            built[name] = {"sha256": sha, "source_sha256": sorted(allowed)}
+            added = 0
+            for name in os.listdir(incoming):
+                dest = os.path.join(WHEELHOUSE_DIR, name)
+                # 已有同名但未記錄來源的本地建置 wheel 時改用這份驗證過來源的
+                if not os.path.exists(dest) or (name in built and not os.path.exists(dest + WHEEL_SOURCE_SUFFIX)):
+                    if name in built:
+                        with open(os.path.join(incoming, name + WHEEL_SOURCE_SUFFIX), 'w', encoding='utf-8') as f:
+                            json.dump(built[name], f)
+                    os.replace(os.path.join(incoming, name), dest)
+                    if name in built:
+                        os.replace(os.path.join(incoming, name + WHEEL_SOURCE_SUFFIX), dest + WHEEL_SOURCE_SUFFIX)
+                    added += 1
+            self.log(f"wheelhouse 新增 {added} 個 wheel" + (f" (其中 {len(built)} 個由 sdist 建置)" if built else ""))
+            return rc
+        finally:
+            shutil.rmtree(incoming, ignore_errors=True)
+
+    @staticmethod
+    def _normalize_pin(name, version):
+        return f"{re.sub(r'[-_.]+', '-', name).lower()}=={version}"
+
+    @classmethod
+    def _wheel_pin(cls, filename):
+        # wheel 檔名：{名稱}-{版本}-...whl
+        parts = filename.split("-")
+        return cls._normalize_pin(parts[0], parts[1]) if len(parts) >= 5 else None
+
+    @classmethod
+    def _lock_hashes(cls, entries):
+        """{正規化的固定版本: [sha256]}，entries 為鎖定檔條目 (含續行的 --hash)"""
+        result = {}
+        for entry in entries:
+            name, sep, version = entry.split(" ", 1)[0].partition("==")
+            hashes = re.findall(r"--hash=sha256:([0-9a-f]{64})", entry)
+            if sep and hashes:
+                result[cls._normalize_pin(name, version)] = hashes
+        return result
+
+    @staticmethod
+    def _with_built_hashes(entries):
+        """在鎖定條目後補上 wheelhouse 中由該 sdist 建置出的 wheel 雜湊"""
+        built = collections.defaultdict(set)
+        for path in glob.glob(os.path.join(WHEELHOUSE_DIR, "*.whl" + WHEEL_SOURCE_SUFFIX)):
+            if not os.path.exists(path[:-len(WHEEL_SOURCE_SUFFIX)]):
+                continue
+            info = _load_json(path) or {}
+            for src in info.get("source_sha256", []):
+                built[src].add(info.get("sha256"))
+        result = []
+        for entry in entries:
+            hashes = re.findall(r"--hash=sha256:([0-9a-f]{64})", entry)
+            extra = sorted({w for h in hashes for w in built.get(h, ()) if w} - set(hashes))
+            result.append(entry + "".join(f" \\\n    --hash=sha256:{w}" for w in extra))
+        return result
+
+    def _pip_install(self, project_path, pip_base, specs, refresh=None, lock_hashes=None):
+        """優先由共用 wheelhouse 離線安裝；缺少的 wheel 補齊後再裝，補不齊才改回一般線上安裝。
+        refresh 在補齊後、再次離線安裝前呼叫（鎖定安裝用來補上新建置 wheel 的雜湊）"""
+        quoted = self._quote_specs(specs)
+        offline = f'{pip_base} install --no-index --find-links "{WHEELHOUSE_DIR}" {quoted}'
+        if os.path.isdir(WHEELHOUSE_DIR):
+            rc = self.run_cmd(offline, cwd=project_path, step="pip install (wheelhouse)")
+            if rc == 0:
+                self.log("⚡ 套件全部由本地 wheelhouse 安裝")
+                return 0
+            if self._job().cancel_event.is_set():
+                return rc
+            self.log("wheelhouse 缺少部分套件，下載補齊中...")
+        rc = self._refill_wheelhouse(pip_base, specs, project_path, lock_hashes)
+        if rc == 0:
+            if refresh:
+                refresh()
+            rc = self.run_cmd(offline, cwd=project_path, step="pip install (wheelhouse)")
+            if rc == 0:
+                return 0
+        if self._job().cancel_event.is_set():
+            return rc
+        self.log("無法由 wheelhouse 安裝，改用一般 pip install。")
+        return self.run_cmd(f'{pip_base} install {quoted}', cwd=project_path)
+
+    def _pip_install_locked(self, project_path, venv_path, pip_base, lock, pins):
+        """只安裝鎖定檔中指定的條目（含雜湊），--no-deps 確保不會再解析出其他版本"""
+        options, entries = lock
+        selected = [entries[p] for p in pins if p in entries]
+        req_path = os.path.join(venv_path, ".devops_install.txt")
+
+        def write():
+            with open(req_path, 'w', encoding='utf-8') as f:
+                f.write("\n".join(options + self._with_built_hashes(selected)) + "\n")
+        try:
+            write()
+            return self._pip_install(project_path, pip_base, ["--no-deps", "-r", req_path],
+                                     refresh=write, lock_hashes=self._lock_hashes(selected))
+        finally:
+            try:
+                os.remove(req_path)
+            except OSError:
+                pass
+
+    # --- 鎖定檔 (解析一次，固定版本與雜湊) ---
+    # pip 只依目前平台評估環境標記 (例如 pefile 的 sys_platform == "win32") 並挑選 wheel，雜湊也只對應該平台的檔案，
+    # 因此每個平台與直譯器版本各有一份鎖定檔
+    LOCK_FILE_PATTERN = "requirements-{platform}-{variant}.lock"
+    LOCK_INDEX_OPTIONS = ("-i", "--index-url", "--extra-index-url", "-f", "--find-links", "--trusted-host")
+
+    @staticmethod
+    def _platform_tag():
+        import platform
+        return f"{sys.platform}-{(platform.machine() or 'unknown').lower()}"
+
+    @classmethod
+    def _lock_file_name(cls, python_ver, variant=None):
+        """例如 requirements-win32-amd64-py3.11.lock；矩陣建置以 variant 取代 py<版本>"""
+        if not variant:
+            variant = "py" + ".".join(str(python_ver or "").split(".")[:2])
+        return cls.LOCK_FILE_PATTERN.format(platform=cls._platform_tag(), variant=variant)
+
+    @classmethod
+    def _lock_input_hash(cls, project_path, python_ver):
+        """鎖定檔的輸入：平台、直譯器版本、requirements.txt 及其以 -r / -c 引用的檔案"""
+        h = hashlib.sha256()
+        h.update(f"platform={cls._platform_tag()}\npython={python_ver}\nimplicit=pyinstaller\n".encode('utf-8'))
+        req = os.path.join(project_path, "requirements.txt")
+        files = [req]
+        try:
+            with open(req, 'r', encoding='utf-8') as f:
+                for line in f:
+                    tokens = line.split()
+                    if len(tokens) > 1 and tokens[0] in ("-r", "--requirement", "-c", "--constraint"):
+                        files.append(os.path.join(project_path, tokens[1]))
+        except OSError:
+            pass
+        for path in files:
+            h.update(os.path.relpath(path, project_path).encode('utf-8') + b"\0")
+            try:
+                with open(path, 'rb') as f:
+                    h.update(hashlib.sha256(f.read()).digest())
+            except OSError:
+                h.update(b"<missing>")
+        return h.hexdigest()
+
+    @classmethod
+    def _read_lock(cls, project_path, lock_file):
+        """傳回 (header, options, {固定版本: 完整條目})；條目含續行的 --hash"""
+        header, options, entries = {}, [], {}
+        current = None
+        try:
+            with open(os.path.join(project_path, lock_file), 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.rstrip("\n")
+                    if line.startswith("#"):
+                        key, sep, val = line[1:].partition(":")
+                        if sep:
+                            header[key.strip()] = val.strip()
+                    elif not line.strip():
+                        current = None
+                    elif line[0].isspace() and current:
+                        entries[current] += "\n" + line
+                    elif line.startswith("-"):
+                        options.append(line)
+                    else:
+                        current = line.rstrip(" \\")
+                        entries[current] = line
+        except OSError:
+            pass
+        return header, options, entries
+
+    def _resolve_lock(self, project_path, py_cmd, python_ver, input_hash, lock_file):
+        """以 pip 的 --dry-run --report 解析完整依賴樹，寫出固定版本與雜湊的鎖定檔"""
+        from urllib.parse import urlparse
+        from urllib.request import url2pathname
+        fd, report_path = tempfile.mkstemp(suffix=".json", prefix="devops_lock_")
+        os.close(fd)
+        try:
+            args = ["--dry-run", "--ignore-installed", "--quiet", "--prefer-binary", "--report", report_path]
+            if os.path.isdir(WHEELHOUSE_DIR):
+                args += ["--find-links", WHEELHOUSE_DIR]
+            if os.path.exists(os.path.join(project_path, "requirements.txt")):
+                args += ["-r", "requirements.txt"]
+            args.append("pyinstaller")
+            rc = self.run_cmd(f'"{py_cmd}" -m pip install {self._quote_specs(args)}', cwd=project_path, step="pip lock")
+            if rc != 0:
+                return rc
+            report = _load_json(report_path) or {}
+        finally:
+            try:
+                os.remove(report_path)
+            except OSError:
+                pass
+
+        rows, unhashed = [], []
+        for item in report.get("install", []):
+            name = item.get("metadata", {}).get("name", "")
+            version = item.get("metadata", {}).get("version", "")
+            info = item.get("download_info", {})
+            if "archive_info" not in info:
+                # 本地目錄或 VCS 來源無法以雜湊鎖定，只能記錄來源網址
+                unhashed.append(name)
+                rows.append((name, f"{name} @ {info.get('url', '')}", None))
+                continue
+            sha = info["archive_info"].get("hashes", {}).get("sha256")
+            if not sha and info.get("url", "").startswith("file:"):
+                try:
+                    with open(url2pathname(urlparse(info["url"]).path), 'rb') as f:
+                        sha = hashlib.sha256(f.read()).hexdigest()
+                except OSError:
+                    pass
+            if not sha:
+                unhashed.append(name)
+            rows.append((name, f"{name}=={version}", sha))
+        if not rows:
+            self.log("pip 沒有回報任何解析結果，無法建立鎖定檔。")
+            return 1
+        if unhashed:
+            # pip 只要有一個條目帶雜湊就會要求全部都有，因此整份改為只固定版本
+            self.log(f"⚠ 無法取得雜湊: {', '.join(unhashed)}；鎖定檔只固定版本，不驗證雜湊。")
+
+        options = []
+        try:
+            with open(os.path.join(project_path, "requirements.txt"), 'r', encoding='utf-8') as f:
+                options = [l.strip() for l in f if l.strip().split(" ")[0].split("=")[0] in self.LOCK_INDEX_OPTIONS]
+        except OSError:
+            pass
+        lines = [
+            "# 由 DevOpsTool 產生，請勿手動修改；requirements.txt 變更時會自動重新解析",
+            f"# input-sha256: {input_hash}",
+            f"# python: {python_ver}",
+            f"# platform: {self._platform_tag()}",
+        ] + options
+        for name, pin, sha in sorted(rows, key=lambda r: r[0].lower()):
+            lines.append(f"{pin} \\\n    --hash=sha256:{sha}" if sha and not unhashed else pin)
+        tmp = os.path.join(project_path, lock_file + ".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, os.path.join(project_path, lock_file))
+        self.log(f"已寫入 {lock_file}：{len(rows)} 個套件")
+        return 0
+
+    def _ensure_lock(self, project_path, py_cmd, python_ver, force=False, variant=None):
+        """鎖定檔與輸入一致就直接使用；否則重新解析。傳回 (options, entries)，無法取得時為 None"""
+        lock_file = self._lock_file_name(python_ver, variant)
+        input_hash = self._lock_input_hash(project_path, python_ver)
+        header, options, entries = self._read_lock(project_path, lock_file)
+        if not force and entries and header.get("input-sha256") == input_hash:
+            self.log(f"使用鎖定檔 {lock_file} ({len(entries)} 個套件)")
+            return options, entries
+        self.log(("requirements 已變更，重新解析" if entries else "建立") + f"鎖定檔 {lock_file}...")
+        if self._resolve_lock(project_path, py_cmd, python_ver, input_hash, lock_file) == 0:
+            header, options, entries = self._read_lock(project_path, lock_file)
+            return options, entries
+        if entries:
+            self.log("解析失敗，沿用既有的鎖定檔。")
+            return options, entries
+        self.log("解析失敗，改用 requirements.txt 直接安裝（版本不固定）。")
+        return None
+
+    def _locked_entries(self, project_path):
+        # wheelhouse 只服務目前平台：取此平台最近更新的鎖定檔，傳回 {固定版本: 完整條目}
+        locks = glob.glob(os.path.join(project_path, self.LOCK_FILE_PATTERN.format(platform=self._platform_tag(), variant="*")))
+        if not locks:
+            return {}
+        lock_file = os.path.basename(max(locks, key=os.path.getmtime))
+        return self._read_lock(project_path, lock_file)[2]
+
+    def _create_venv(self, project_path, venv_name, python_exe=None):
+        """在 project_path 下建立 venv；失敗時移除不完整的資料夾，下次才會重新建立"""
+        self.log("建立虛擬環境...")
+        rc = self.run_cmd(f'"{python_exe}" -m venv "{venv_name}"' if python_exe else f'python -m venv "{venv_name}"',
+                          cwd=project_path)
+        if rc != 0:
+            self.log(f"建立虛擬環境失敗 (rc={rc})。")
+            shutil.rmtree(os.path.join(project_path, venv_name), ignore_errors=True)
+        return rc
+
+    def action_lock(self, project_path, venv_name="venv_build"):
+        """強制重新解析並寫出鎖定檔"""
+        self.log("--- 更新鎖定檔 ---")
+        venv_path = os.path.join(project_path, venv_name)
+        if not os.path.exists(venv_path):
+            rc = self._create_venv(project_path, venv_name)
+            if rc != 0:
+                return rc
+        py_cmd = os.path.join(venv_path, "Scripts", "python.exe") if os.name == 'nt' else os.path.join(venv_path, "bin", "python")
+        return 0 if self._ensure_lock(project_path, py_cmd, self._venv_python_version(venv_path), force=True) else 1
+
+    def _prefetch_group(self, pip_base, specs, lock_hashes=None, label=None):
+        # 已可由 wheelhouse 離線滿足的群組不連網 (--dry-run 需 pip 22.2 以上；不支援時直接補齊)
+        rc = self.run_cmd(f'{pip_base} install --dry-run --ignore-installed --quiet --no-index '
+                          f'--find-links "{WHEELHOUSE_DIR}" {self._quote_specs(specs)}',
+                          cwd=APP_DATA_DIR, step="pip check (wheelhouse)")
+        if rc == 0:
+            self.log(f"已在 wheelhouse: {label or ', '.join(specs)}")
+            return 0
+        return self._refill_wheelhouse(pip_base, specs, APP_DATA_DIR, lock_hashes)
+
+    def _prefetch_locked_group(self, pip_base, entries):
+        """鎖定條目以雜湊模式下載：sdist 經驗證後才建置，建置出的 wheel 雜湊記錄下來供離線安裝"""
+        fd, req_path = tempfile.mkstemp(suffix=".txt", prefix=".prefetch_", dir=WHEELHOUSE_DIR)
+        os.close(fd)
+
+        def write():
+            with open(req_path, 'w', encoding='utf-8') as f:
+                f.write("\n".join(self._with_built_hashes(entries)) + "\n")
+        try:
+            write()
+            label = ", ".join(e.split(" ", 1)[0] for e in entries)
+            rc = self._prefetch_group(pip_base, ["--no-deps", "-r", req_path], self._lock_hashes(entries), label)
+            if rc == 0:
+                # 確認補上建置 wheel 的雜湊後確實能完全離線安裝
+                write()
+                rc = self.run_cmd(f'{pip_base} install --dry-run --ignore-installed --quiet --no-index '
+                                  f'--find-links "{WHEELHOUSE_DIR}" --no-deps -r "{req_path}"',
+                                  cwd=APP_DATA_DIR, step="pip check (wheelhouse)")
+            return rc
+        finally:
+            try:
+                os.remove(req_path)
+            except OSError:
+                pass
 
-    def stop_all(self):
-        self.stop_event.set()
-        with self.process_lock:
-            p = self.current_process
-            if not p:
-                return
+    def action_prefetch(self, projects, max_parallel=None):
+        """為多個專案預先把 wheel 下載到共用 wheelhouse，之後建置可完全離線"""
+        ensure_app_data_dir()
+        os.makedirs(WHEELHOUSE_DIR, exist_ok=True)
+        specs, skipped, hashed = [], [], {}
+        for p in projects:
             try:
-                try:
-                    self._terminate_process_group(p)
-                except Exception:
-                    pass
-                try:
-                    p.wait(timeout=3)
-                    return
-                except Exception:
-                    pass
-                try:
-                    if p.poll() is None:
-                        p.terminate()
-                except Exception:
-                    pass
-                try:
-                    p.wait(timeout=2)
-                except Exception:
-                    try:
-                        if os.name == 'nt':
-                            p.kill()
+                # 有鎖定檔的專案只需下載鎖定的版本；帶雜湊的條目另外以雜湊模式下載
+                locked = self._locked_entries(p)
+                if locked and all("--hash=" in e for e in locked.values()):
+                    for pin, entry in locked.items():
+                        hashed.setdefault(pin, entry)
+                    continue
+                reqs = [s.split(" @ ")[0] for s in locked] or self._read_requirements(p)
+            except OSError as e:
+                self.log(f"讀取 {p} 的 requirements.txt 失敗: {e}")
+                continue
+            for s in reqs:
+                # 選項與相對路徑只在各自的專案目錄下才有意義
+                if s.startswith(("-", ".", "/")) or s in specs:
+                    if s not in specs and s not in skipped:
+                        skipped.append(s)
+                    continue
+                specs.append(s)
+        self.log(f"--- 預先下載 {len(specs) + len(hashed)} 個需求 ({len(projects)} 個專案) 到 {WHEELHOUSE_DIR} ---")
+        if skipped:
+            self.log(f"略過無法在專案外解析的項目: {', '.join(skipped)}")
+        if not specs and not hashed:
+            return 0
+
+        # 與建立 venv 相同的直譯器，下載的 wheel 才符合各專案 venv 的版本與 ABI
+        pip_base = "python -m pip"
+        workers = max(1, min(max_parallel or WHEEL_PREFETCH_WORKERS, len(specs) + len(hashed)))
+        tasks = {}
+        # 同一次 pip 呼叫只要有一個條目帶雜湊就全部都要有，兩種需求分開成組
+        for kind, items in (("wheels", specs), ("locked", list(hashed.values()))):
+            n = min(workers, len(items))
+            for i in range(n):
+                group = items[i::n]
+                func = (lambda g=group: self._prefetch_locked_group(pip_base, g)) if kind == "locked" \
+                    else (lambda g=group: self._prefetch_group(pip_base, g))
+                tasks[f"{kind}-{i + 1}"] = {"func": func}
+        order = list(tasks)
+        results, durations, failed, cancelled, wall, usage = self._run_child_jobs(
+            tasks, order, workers, fail_fast=False, label="group")
+
+        wheels = [f for f in os.listdir(WHEELHOUSE_DIR) if f.endswith(".whl")]
+        size = sum(os.path.getsize(os.path.join(WHEELHOUSE_DIR, f)) for f in wheels)
+        ok = sum(1 for n in order if results.get(n) == 0)
+        self.log(f"完成 {ok}/{len(order)} 組，wheelhouse 共 {len(wheels)} 個 wheel ({size / 1024 ** 2:.1f} MB)，耗時 {wall:.1f} 秒")
+        if self._job().cancel_event.is_set():
+            return -1
+        return 0 if ok == len(order) else 1
+
+    # --- 增量建置 (以入口、專案原始碼、依賴、參數為指紋) ---
+    BUILD_RECORD_FILE = ".devops_build.json"
+    SKIP_DIRS = {"build", "dist", "__pycache__", ".git", "venv_build", "venv_build-*", "venv", ".venv", CLEAN_TRASH_DIR}
+
+    BUNDLE_MODES = ("onefile", "onedir")
+    ONEDIR_STAGE_DIR = ".devops_onedir"  # build/ 下；one-dir 先輸出到這裡，再把有變動的檔案同步到 dist/
+
+    @staticmethod
+    def _artifact_path(project_path, output_name, mode="onefile", dist_dir=None):
+        suffix = ".exe" if os.name == 'nt' else ""
+        dist_dir = dist_dir or os.path.join(project_path, "dist")
+        if mode == "onedir":
+            return os.path.join(dist_dir, output_name, output_name + suffix)
+        return os.path.join(dist_dir, output_name + suffix)
+
+    @classmethod
+    def _bundle_mode(cls, cfg):
+        """devops_config.json 的 bundle_mode：onefile (預設，-F) 或 onedir (-D)"""
+        mode = str(cfg.get("bundle_mode") or "onefile").lower()
+        return mode if mode in cls.BUNDLE_MODES else "onefile"
+
+    @staticmethod
+    def _file_sha256(path):
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def _sync_onedir(self, stage, dest, manifest_file):
+        """把 one-dir 輸出同步到 dist/：只替換內容有變的檔案、移除多出來的檔案，未變更的檔案保持原樣"""
+        t0 = time.monotonic()
+        manifest = _load_json(manifest_file) or {}
+        new_manifest = {}
+        copied = unchanged = removed = 0
+        copied_bytes = 0
+        if os.path.lexists(dest) and not os.path.isdir(dest):
+            os.remove(dest)  # 先前 one-file 建置留下的同名檔案
+        try:
+            for root, dirs, files in os.walk(stage):
+                rel_root = os.path.relpath(root, stage)
+                dst_dir = os.path.normpath(os.path.join(dest, rel_root))
+                if os.path.lexists(dst_dir) and not os.path.isdir(dst_dir):
+                    os.remove(dst_dir)
+                os.makedirs(dst_dir, exist_ok=True)
+                for name in files + [d for d in dirs if os.path.islink(os.path.join(root, d))]:
+                    src = os.path.join(root, name)
+                    dst = os.path.normpath(os.path.join(dest, rel_root, name))
+                    rel = os.path.normpath(os.path.join(rel_root, name)).replace(os.sep, "/")
+                    if os.path.isdir(dst) and not os.path.islink(dst):
+                        shutil.rmtree(dst)
+                    if os.path.islink(src):
+                        target = os.readlink(src)
+                        if not (os.path.islink(dst) and os.readlink(dst) == target):
+                            if os.path.lexists(dst):
+                                os.remove(dst)
+                            os.symlink(target, dst)
+                            copied += 1
                         else:
-                            os.killpg(os.getpgid(p.pid), signal.SIGKILL)
-                    except Exception:
-                        pass
-            except Exception:
+                            unchanged += 1
+                        new_manifest[rel] = ["link", target]
+                        continue
+                    sha = self._file_sha256(src)
+                    old = manifest.get(rel)
+                    try:
+                        st = os.lstat(dst)
+                        current = [st.st_size, st.st_mtime_ns, sha]
+                        # 沒有紀錄時才讀取 dist 內的檔案比對內容
+                        if not old and st.st_size == os.path.getsize(src) and self._file_sha256(dst) == sha:
+                            old = current
+                    except OSError:
+                        current = None
+                    if current is not None and old == current:
+                        unchanged += 1
+                        new_manifest[rel] = current
+                        continue
+                    tmp = dst + ".devops_tmp"
+                    shutil.copy2(src, tmp)
+                    os.replace(tmp, dst)
+                    st = os.stat(dst)
+                    new_manifest[rel] = [st.st_size, st.st_mtime_ns, sha]
+                    copied += 1
+                    copied_bytes += st.st_size
+            for root, dirs, files in os.walk(dest, topdown=False):
+                for name in files + dirs:
+                    p = os.path.join(root, name)
+                    rel = os.path.relpath(p, dest).replace(os.sep, "/")
+                    if rel in new_manifest or os.path.lexists(os.path.join(stage, rel)):
+                        continue
+                    if os.path.isdir(p) and not os.path.islink(p):
+                        shutil.rmtree(p, ignore_errors=True)
+                    else:
+                        os.remove(p)
+                        removed += 1
+        except OSError as e:
+            self.log(f"同步 one-dir 輸出失敗: {e}（程式可能仍在執行中）")
+            return 1
+        finally:
+            try:
+                os.makedirs(os.path.dirname(manifest_file), exist_ok=True)
+                with open(manifest_file, 'w', encoding='utf-8') as f:
+                    json.dump(new_manifest, f, ensure_ascii=False)
+            except OSError:
                 pass
+        shutil.rmtree(stage, ignore_errors=True)
+        self.log(f"同步 one-dir 輸出: 更新 {copied} 個檔案 ({copied_bytes / 1024 ** 2:.1f} MB)，"
+                 f"未變更 {unchanged} 個，移除 {removed} 個，耗時 {time.monotonic() - t0:.2f} 秒")
+        return 0
 
-    def action_clean(self, project_path, venv_name):
-        self.log("--- 清理暫存檔案 ---")
-        targets = ["build", "dist", "__pycache__", venv_name]
-        for t in targets:
-            full_path = os.path.join(project_path, t)
-            if os.path.exists(full_path):
-                try:
-                    shutil.rmtree(full_path)
-                    self.log(f"已刪除: {t}")
-                except Exception as e:
-                    self.log(f"刪除失敗 {t}: {e}")
-        for f in os.listdir(project_path):
-            if f.endswith(".spec"):
+    def _project_config(self, project_path):
+        """專案的 devops_config.json；經由 ConfigStore 讀取，GUI 尚未寫入的修改也看得到"""
+        return self.config.get(os.path.join(project_path, "devops_config.json"), {})
+
+    @classmethod
+    def _resolve_local_module(cls, project_path, base_dir, module):
+        """把模組名稱對應到專案內的檔案；不在專案內（第三方/標準庫）回傳 None"""
+        parts = module.split(".") if module else []
+        for root in (base_dir, project_path):
+            target = os.path.join(root, *parts) if parts else root
+            for cand in (target + ".py", os.path.join(target, "__init__.py")):
+                if os.path.isfile(cand):
+                    rel = os.path.relpath(cand, project_path)
+                    top = rel.split(os.sep)[0]
+                    if rel.startswith("..") or any(fnmatch.fnmatch(top, p) for p in cls.SKIP_DIRS):
+                        continue
+                    return os.path.normpath(cand)
+        return None
+
+    @classmethod
+    def _collect_project_sources(cls, project_path, entry_file):
+        """從入口檔沿 import 追蹤專案內的原始碼檔案（以 ast 解析，不執行程式）"""
+        entry_file = os.path.normpath(entry_file)
+        seen = {entry_file}
+        stack = [entry_file]
+        while stack:
+            path = stack.pop()
+            try:
+                with open(path, 'rb') as f:
+                    tree = ast.parse(f.read(), filename=path)
+            except (OSError, SyntaxError, ValueError):
+                continue
+            base_dir = os.path.dirname(path)
+            modules = []
+            for node in ast.walk(tree):
+                if isinstance(node, ast.Import):
+                    modules += [(0, a.name) for a in node.names]
+                elif isinstance(node, ast.ImportFrom):
+                    mod = node.module or ""
+                    modules.append((node.level, mod))
+                    # from pkg import submodule
+                    modules += [(node.level, f"{mod}.{a.name}" if mod else a.name) for a in node.names]
+            for level, mod in modules:
+                if level:
+                    rel_base = base_dir
+                    for _ in range(level - 1):
+                        rel_base = os.path.dirname(rel_base)
+                    found = cls._resolve_local_module(project_path, rel_base, mod)
+                else:
+                    found = cls._resolve_local_module(project_path, base_dir, mod)
+                if found and found not in seen:
+                    seen.add(found)
+                    stack.append(found)
+        return sorted(seen)
+
+    # --- 建置前預檢 (平行編譯 + 第三方 import 檢查，逐檔以內容雜湊快取) ---
+    GATE_CACHE_FILE = ".devops_gate.json"
+    GATE_WORKERS = min(8, os.cpu_count() or 1)
+    GATE_POOL_MIN_FILES = 16  # 檔案太少時開 process pool 反而較慢
+    IMPORT_GUARDS = {"ImportError", "ModuleNotFoundError", "Exception", "BaseException"}
+    # 在目標直譯器內執行：語法以建置用的 Python 版本為準，find_spec 只找模組不執行
+    GATE_SCRIPT = r"""
+import sys, json, importlib.util
+from concurrent.futures import ProcessPoolExecutor
+
+def check(path):
+    try:
+        with open(path, "rb") as f:
+            compile(f.read(), path, "exec", dont_inherit=True)
+    except SyntaxError as e:
+        return [e.lineno or 0, e.msg]
+    except (OSError, ValueError) as e:
+        return [0, str(e)]
+    return None
+
+def find(name):
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+if __name__ == "__main__":
+    with open(sys.argv[1], encoding="utf-8") as f:
+        req = json.load(f)
+    files, workers = req["files"], req["workers"]
+    if workers > 1 and len(files) >= req["pool_min"]:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            errors = list(pool.map(check, files, chunksize=max(1, len(files) // (workers * 4))))
+    else:
+        errors = [check(p) for p in files]
+    out = {"errors": dict(zip(files, errors)), "modules": {m: find(m) for m in req["modules"]}}
+    with open(sys.argv[2], "w", encoding="utf-8") as f:
+        json.dump(out, f)
+"""
+
+    @classmethod
+    def _scan_imports(cls, tree):
+        """列出 import 參照 [level, 模組, 是否必要]；函式內、if 分支、try/except ImportError 內的視為選用"""
+        found = []
+
+        def guarded(handler):
+            if handler.type is None:
+                return True
+            names = {n.id for n in ast.walk(handler.type) if isinstance(n, ast.Name)}
+            names |= {n.attr for n in ast.walk(handler.type) if isinstance(n, ast.Attribute)}
+            return bool(names & cls.IMPORT_GUARDS)
+
+        def add(node, required):
+            if isinstance(node, ast.Import):
+                found.extend([0, a.name, required] for a in node.names)
+            elif isinstance(node, ast.ImportFrom):
+                mod = node.module or ""
+                if mod:
+                    found.append([node.level, mod, required])
+                # from pkg import submodule
+                found.extend([node.level, f"{mod}.{a.name}" if mod else a.name, required] for a in node.names)
+
+        def visit(body, required):
+            for node in body:
+                if isinstance(node, (ast.Import, ast.ImportFrom)):
+                    add(node, required)
+                elif isinstance(node, (ast.Try, getattr(ast, "TryStar", ast.Try))):
+                    visit(node.body, required and not any(guarded(h) for h in node.handlers))
+                    for h in node.handlers:
+                        visit(h.body, False)
+                    visit(node.orelse, required)
+                    visit(node.finalbody, required)
+                elif isinstance(node, (ast.ClassDef, ast.With)):
+                    visit(node.body, required)
+                else:
+                    for sub in ast.walk(node):
+                        add(sub, False)
+
+        visit(tree.body, True)
+        return found
+
+    @staticmethod
+    def _site_packages_key(venv_path):
+        """以 site-packages 的內容清單當作 venv 狀態，安裝或移除套件都會改變"""
+        h = hashlib.sha256()
+        dirs = glob.glob(os.path.join(venv_path, "lib*", "python*", "site-packages"))
+        dirs += glob.glob(os.path.join(venv_path, "Lib", "site-packages"))
+        for sp in sorted(set(dirs)):
+            try:
+                h.update("\n".join(sorted(os.listdir(sp))).encode("utf-8"))
+            except OSError:
+                pass
+        return h.hexdigest()
+
+    def _prebuild_gate(self, project_path, entry_file, venv_path, check_imports=False, build_dir=None, python_exe=None):
+        """建置前預檢：平行編譯入口的 import 圖，check_imports 時再以 venv 確認第三方模組都找得到"""
+        t0 = time.monotonic()
+        py_cmd = os.path.join(venv_path, "Scripts", "python.exe") if os.name == 'nt' else os.path.join(venv_path, "bin", "python")
+        if os.path.exists(py_cmd):
+            py_key = self._venv_python_version(venv_path) or py_cmd
+        else:
+            py_cmd = py_key = python_exe or "python"
+        cache_file = os.path.join(build_dir or os.path.join(project_path, "build"), self.GATE_CACHE_FILE)
+        cache = _load_json(cache_file) or {}
+        if cache.get("python") != py_key:
+            cache = {"python": py_key}
+        cached_files = cache.get("files", {})
+
+        # 沿 import 圖走訪；未變更的檔案直接用快取的 import 參照，不必重新解析
+        files, todo, external = {}, {}, {}
+        entry_file = os.path.normpath(entry_file)
+        seen = {entry_file}
+        stack = [entry_file]
+        while stack:
+            path = stack.pop()
+            rel = os.path.relpath(path, project_path)
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except OSError:
+                continue
+            sha = hashlib.sha256(data).hexdigest()
+            entry = cached_files.get(rel)
+            if not entry or entry.get("sha") != sha:
                 try:
-                    os.remove(os.path.join(project_path, f))
-                except Exception:
-                    pass
-        self.log("清理完成。")
+                    refs = self._scan_imports(ast.parse(data, filename=path))
+                except (SyntaxError, ValueError):
+                    refs = []
+                entry = {"sha": sha, "error": None, "refs": refs}
+                todo[path] = rel
+            files[rel] = entry
+            # 是否為專案內模組每次重新判斷，新增的本地檔案才不會被誤判為缺少的第三方套件
+            base_dir = os.path.dirname(path)
+            for level, mod, req in entry["refs"]:
+                rel_base = base_dir
+                for _ in range(level - 1):
+                    rel_base = os.path.dirname(rel_base)
+                found = self._resolve_local_module(project_path, rel_base, mod)
+                if found:
+                    if found not in seen:
+                        seen.add(found)
+                        stack.append(found)
+                    continue
+                top = mod.split(".")[0]
+                if level or not top or self._resolve_local_module(project_path, base_dir, top) \
+                        or os.path.isdir(os.path.join(base_dir, top)) or os.path.isdir(os.path.join(project_path, top)):
+                    continue
+                external.setdefault(top, {True: [], False: []})
+                if rel not in external[top][req]:
+                    external[top][req].append(rel)
 
-    def action_run(self, project_path, entry_point):
-        self.log(f"--- 執行測試: {entry_point} ---")
+        modules = {}
+        to_find = []
+        if check_imports:
+            env_key = self._site_packages_key(venv_path)
+            known = cache.get("modules", {}) if cache.get("env") == env_key else {}
+            wanted = set(external)
+            modules = {m: known[m] for m in wanted if m in known}
+            to_find = sorted(wanted - set(modules))
+            cache["env"] = env_key
+
+        if todo or to_find:
+            tmp_dir = tempfile.mkdtemp(prefix="devops_gate_")
+            try:
+                script = os.path.join(tmp_dir, "gate.py")
+                req_file = os.path.join(tmp_dir, "request.json")
+                out_file = os.path.join(tmp_dir, "result.json")
+                with open(script, 'w', encoding='utf-8') as f:
+                    f.write(self.GATE_SCRIPT)
+                with open(req_file, 'w', encoding='utf-8') as f:
+                    json.dump({"files": list(todo), "modules": to_find, "workers": self.GATE_WORKERS,
+                               "pool_min": self.GATE_POOL_MIN_FILES}, f)
+                rc = self.run_cmd(f'"{py_cmd}" "{script}" "{req_file}" "{out_file}"', cwd=project_path,
+                                  step="prebuild gate")
+                result = _load_json(out_file) if rc == 0 else None
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+            if result is None:
+                if self._job().cancel_event.is_set():
+                    return -1
+                self.log(f"⚠️ 建置前預檢無法執行 (rc={rc})，略過預檢。")
+                return 0
+            for path, err in result.get("errors", {}).items():
+                if path in todo:
+                    files[todo[path]]["error"] = err
+            modules.update(result.get("modules", {}))
+
+        cache["files"] = files
+        if check_imports:
+            cache["modules"] = modules
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            with open(cache_file, 'w', encoding='utf-8') as f:
+                json.dump(cache, f, ensure_ascii=False)
+        except OSError as e:
+            self.log(f"寫入預檢快取失敗: {e}")
+
+        failed = False
+        for rel, entry in sorted(files.items()):
+            if entry.get("error"):
+                line, msg = entry["error"]
+                self.log(f"❌ 語法錯誤 {rel}:{line}: {msg}")
+                failed = True
+        if check_imports:
+            for top in sorted(m for m in external if not modules.get(m, True)):
+                users = external[top]
+                if users[True]:
+                    self.log(f"❌ venv 找不到模組 {top}（匯入於 {', '.join(sorted(users[True]))}）")
+                    failed = True
+                else:
+                    self.log(f"⚠️ venv 找不到選用模組 {top}（匯入於 {', '.join(sorted(users[False]))}，位於 try/if/函式內）")
+
+        what = "編譯與 import 檢查" if check_imports else "編譯檢查"
+        self.log(f"建置前{what}: {len(files)} 個檔案 (重新檢查 {len(todo)} 個)"
+                 f"{f'、{len(modules)} 個第三方模組' if check_imports else ''}，"
+                 f"耗時 {time.monotonic() - t0:.2f} 秒{'，建置中止。' if failed else ''}")
+        return 1 if failed else 0
+
+    def _build_fingerprint(self, project_path, venv_path, entry_file, flags):
+        h = hashlib.sha256()
+        h.update(f"flags={flags}\n".encode('utf-8'))
+        self._hash_build_inputs(h, project_path, venv_path, entry_file)
+        return h.hexdigest()
+
+    def _hash_build_inputs(self, h, project_path, venv_path, entry_file):
+        for path in self._collect_project_sources(project_path, entry_file):
+            h.update(os.path.relpath(path, project_path).encode('utf-8') + b"\0")
+            try:
+                with open(path, 'rb') as f:
+                    h.update(hashlib.sha256(f.read()).digest())
+            except OSError:
+                pass
+        # 依賴集合：venv 中實際安裝的 dist-info (名稱-版本)
+        dists = glob.glob(os.path.join(venv_path, "Lib", "site-packages", "*.dist-info"))
+        dists += glob.glob(os.path.join(venv_path, "lib", "python*", "site-packages", "*.dist-info"))
+        for d in sorted(os.path.basename(d) for d in dists):
+            h.update(d.encode('utf-8') + b"\n")
+
+    def _quick_build_key(self, project_path, venv_path, entry_file, mode, output_name, variant=None):
+        """不啟動任何 subprocess 就能算出的建置輸入摘要：打包設定、requirements 與鎖定檔、venv 已安裝的套件、原始碼。
+        與上次建置紀錄相同時，預檢、venv 與 PyInstaller 都不必執行；venv 不存在時回傳 None"""
+        python_ver = self._venv_python_version(venv_path)
+        if python_ver is None:
+            return None
+        h = hashlib.sha256()
+        h.update(f"mode={mode}\noutput={output_name}\nvariant={variant}\n".encode('utf-8'))
+        h.update(f"requirements={self._lock_input_hash(project_path, python_ver)}\n".encode('utf-8'))
+        try:
+            # 強制重新解析 (lock 指令) 只改變鎖定檔內容，requirements 不變
+            with open(os.path.join(project_path, self._lock_file_name(python_ver, variant)), 'rb') as f:
+                h.update(hashlib.sha256(f.read()).digest())
+        except OSError:
+            h.update(b"<no lock>")
+        self._hash_build_inputs(h, project_path, venv_path, entry_file)
+        return h.hexdigest()
+
+    def action_build(self, project_path, venv_name, entry_point, output_name, full_rebuild=False,
+                     python_exe=None, variant=None):
+        """建置單一產物；矩陣建置時以 python_exe 建立 venv，variant 另外分出工作目錄、輸出目錄與鎖定檔"""
+        self.log("--- 開始建置流程 ---" if not variant else f"--- 開始建置流程 ({variant}: {python_exe}) ---")
+        venv_path = os.path.join(project_path, venv_name)
         ep = os.path.join(project_path, entry_point) if not os.path.isabs(entry_point) else entry_point
         if not os.path.exists(ep):
-            self.log(f"入口檔案不存在: {ep}")
-            self.app_log_local(f"入口檔案不存在: {ep}")
-            return
-        self.run_cmd(f'python "{ep}"', cwd=project_path)
+            self.log(f"入口檔案不存在: {ep}，建置取消。")
+            return 1
+        cfg = self._project_config(project_path)
+        mode = self._bundle_mode(cfg)
+        if cfg.get("bundle_mode") and cfg["bundle_mode"] != mode:
+            self.log(f"未知的 bundle_mode: {cfg['bundle_mode']}，改用 onefile。")
+        rel_build = f"./build/{variant}" if variant else "./build"
+        rel_dist = f"./dist/{variant}" if variant else "./dist"
+        build_root = os.path.normpath(os.path.join(project_path, rel_build))
+        artifact = self._artifact_path(project_path, output_name, mode, os.path.normpath(os.path.join(project_path, rel_dist)))
+        record_file = os.path.join(build_root, self.BUILD_RECORD_FILE)
+
+        # 輸入完全沒變時直接沿用既有輸出：不跑預檢、不解析鎖定檔、不檢查 venv
+        if not full_rebuild and os.path.exists(artifact):
+            record = _load_json(record_file) or {}
+            if record.get("quick_key") and record["quick_key"] == self._quick_build_key(
+                    project_path, venv_path, ep, mode, output_name, variant):
+                self.log(f"⚡ 原始碼、依賴與參數皆未變更，直接沿用既有輸出: {os.path.relpath(artifact, project_path)}")
+                return 0
+
+        # 先做語法預檢，避免建立 venv、安裝套件之後才發現原始碼有錯
+        rc = self._prebuild_gate(project_path, ep, venv_path, build_dir=build_root, python_exe=python_exe)
+        if rc != 0:
+            return rc
 
-    def action_build(self, project_path, venv_name, entry_point, output_name):
-        self.log("--- 開始建置流程 ---")
-        venv_path = os.path.join(project_path, venv_name)
         if not os.path.exists(venv_path):
-            self.log("建立虛擬環境...")
-            # 建立於 project_path
-            self.run_cmd(f'python -m venv "{venv_name}"', cwd=project_path)
+            rc = self._create_venv(project_path, venv_name, python_exe)
+            if rc != 0:
+                return rc
 
         pip_cmd = os.path.join(venv_path, "Scripts", "pip.exe") if os.name == 'nt' else os.path.join(venv_path, "bin", "pip")
         py_cmd = os.path.join(venv_path, "Scripts", "python.exe") if os.name == 'nt' else os.path.join(venv_path, "bin", "python")
 
-        req_file = os.path.join(project_path, "requirements.txt")
-        pkgs = ["pyinstaller"]
-        if os.path.exists(req_file):
-            self.log("讀取 requirements.txt...")
-            try:
-                with open(req_file, 'r', encoding='utf-8') as f:
-                    pkgs += [l.strip() for l in f if l.strip() and not l.startswith('#')]
-            except Exception as e:
-                self.log(f"讀取 requirements.txt 發生錯誤: {e}")
-
-        # 如果 pip 不存在，改用 python -m pip 安裝
-        if not os.path.exists(pip_cmd):
-            self.log("venv pip 未找到，使用 python -m pip 安裝套件。")
-            install_cmd = f'"{py_cmd}" -m pip install {" ".join(pkgs)}'
+        # 依鎖定檔安裝固定版本；requirements.txt 沒變就不重新解析，venv 指紋因此穩定
+        lock = self._ensure_lock(project_path, py_cmd, self._venv_python_version(venv_path),
+                                 variant=variant)
+        if lock is not None:
+            pkgs = list(lock[1])
         else:
-            install_cmd = f'"{pip_cmd}" install {" ".join(pkgs)}'
+            pkgs = ["pyinstaller"]
+            if os.path.exists(os.path.join(project_path, "requirements.txt")):
+                self.log("讀取 requirements.txt...")
+                try:
+                    pkgs = self._read_requirements(project_path)
+                except Exception as e:
+                    self.log(f"讀取 requirements.txt 發生錯誤: {e}")
 
-        self.run_cmd(install_cmd, cwd=project_path)
+        rc = self._ensure_venv_packages(project_path, venv_path, pip_cmd, py_cmd, pkgs, lock)
+        if rc != 0:
+            return rc
 
-        ep = os.path.join(project_path, entry_point) if not os.path.isabs(entry_point) else entry_point
-        if not os.path.exists(ep):
-            self.log(f"入口檔案不存在: {ep}，建置取消。")
-            return
+        rc = self._prebuild_gate(project_path, ep, venv_path, check_imports=True, build_dir=build_root)
+        if rc != 0:
+            return rc
 
         # ================= 新增防呆機制 =================
         extra_flags = ""
@@ -438,11 +3567,235 @@ class TaskHandler:
         # 若有需要隱藏執行時的黑窗，未來可以在 extra_flags 加入 " -w"
         # ================================================
 
-        cmd = f'"{py_cmd}" -m PyInstaller -F --clean --name "{output_name}"{extra_flags} "{ep}" --distpath ./dist'
-        self.run_cmd(cmd, cwd=project_path)
-        self.log(f"打包完成: dist/{output_name}.exe")
+        if variant:
+            # 矩陣建置會同時跑多個 PyInstaller，spec 與工作目錄各自分開才不會互相覆寫
+            extra_flags += f' --workpath "{rel_build}" --specpath "{rel_build}"'
+
+        if mode == "onedir":
+            # 啟動時不必每次解壓整包；輸出先放 build/ 下的暫存區，建置後只同步有變動的檔案到 dist/
+            pyi_flags = f'-D --noconfirm --name "{output_name}"{extra_flags} --distpath {rel_build}/{self.ONEDIR_STAGE_DIR}'
+        else:
+            pyi_flags = f'-F --name "{output_name}"{extra_flags} --distpath {rel_dist}'
+        stage_root = os.path.join(build_root, self.ONEDIR_STAGE_DIR)
+        build_fp = self._build_fingerprint(project_path, venv_path, ep, pyi_flags)
+        quick_key = self._quick_build_key(project_path, venv_path, ep, mode, output_name, variant)
+
+        if full_rebuild:
+            self.log("強制完整重建：使用 --clean 清除 PyInstaller 快取。")
+            clean_flag = " --clean"
+        else:
+            clean_flag = ""
+            record = _load_json(record_file)
+            if record and record.get("fingerprint") == build_fp and os.path.exists(artifact):
+                self.log(f"⚡ 原始碼、依賴與參數皆未變更，直接沿用既有輸出: {os.path.relpath(artifact, project_path)}")
+                # 補上摘要，下次不必再走完整流程
+                self._write_build_record(record_file, build_fp, artifact, record.get("seconds", 0.0), quick_key)
+                return 0
+            self.log("增量建置：沿用 PyInstaller 工作目錄 (build/)。")
+
+        # 產物快取只保存單一檔案，one-dir 輸出不使用
+        cache_key = ArtifactStore.make_key(build_fp, self._venv_python_version(venv_path), sys.platform)
+        if not full_rebuild and mode == "onefile":
+            try:
+                entry = self.artifacts.restore(cache_key, artifact)
+            except OSError as e:
+                entry = None
+                self.log(f"讀取產物快取失敗: {e}")
+            if entry:
+                self.log(f"⚡ 產物快取命中 ({entry['restored_by']})，已還原 {os.path.relpath(artifact, project_path)}，"
+                         f"省下約 {entry.get('build_seconds', 0.0):.1f} 秒")
+                self._write_build_record(record_file, build_fp, artifact, 0.0, quick_key)
+                return 0
+
+        # dist 內的檔案可能是快取的 hardlink，先解除以免 PyInstaller 覆寫到快取內容
+        try:
+            if os.path.isdir(artifact):
+                shutil.rmtree(artifact)  # 先前 one-dir 建置留下的同名資料夾
+            elif os.path.exists(artifact) and os.stat(artifact).st_nlink > 1:
+                os.remove(artifact)
+        except OSError:
+            pass
+
+        # PyInstaller 以整數秒比較 mtime，與上次建置同一秒內的修改會被忽略；指紋已確認有變更，把上次各階段 TOC 的時間往前調
+        for toc in glob.glob(os.path.join(build_root, output_name, "*.toc")):
+            try:
+                st = os.stat(toc)
+                os.utime(toc, ns=(st.st_atime_ns, st.st_mtime_ns - 2 * 10 ** 9))
+            except OSError:
+                pass
+
+        cmd = f'"{py_cmd}" -m PyInstaller{clean_flag} {pyi_flags} "{ep}"'
+        t0 = time.monotonic()
+        rc = self.run_cmd(cmd, cwd=project_path)
+        if rc == 0 and mode == "onedir":
+            rc = self._sync_onedir(os.path.join(stage_root, output_name), os.path.dirname(artifact),
+                                   os.path.join(stage_root, output_name + ".json"))
+        if rc != 0 or not os.path.exists(artifact):
+            self.log(f"打包失敗 (rc={rc})")
+            return rc or 1
+        seconds = time.monotonic() - t0
+        self._write_build_record(record_file, build_fp, artifact, seconds, quick_key)
+        if mode == "onefile":
+            try:
+                self.artifacts.put(cache_key, artifact, build_seconds=seconds,
+                                   label=f"{os.path.basename(project_path)}/{variant + '/' if variant else ''}{output_name}")
+            except OSError as e:
+                self.log(f"寫入產物快取失敗: {e}")
+        self.log(f"打包完成: {os.path.relpath(artifact, project_path)}")
+        self._analyze_bundle(project_path, venv_path, ep, output_name, artifact, mode, build_root)
+        return 0
+
+    @staticmethod
+    def _evict_file_cache(path):
+        """把產物移出 OS 檔案快取以模擬冷啟動；平台不支援時回傳 False"""
+        if not hasattr(os, "posix_fadvise"):
+            return False
+        paths = [os.path.join(r, f) for r, _, fs in os.walk(path) for f in fs] if os.path.isdir(path) else [path]
+        for p in paths:
+            try:
+                fd = os.open(p, os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                os.fsync(fd)  # 剛寫入尚未落盤的頁面不會被丟棄，先寫回
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            except OSError:
+                pass
+            finally:
+                os.close(fd)
+        return True
+
+    def _launch_once(self, cmd, env, cwd, timeout):
+        """啟動一次並等到行程結束，回傳 (秒數, rc)；逾時或取消時砍掉整個 process group"""
+        job = self._job()
+        popen_kwargs = {"stdin": subprocess.DEVNULL, "stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL,
+                        "cwd": cwd, "env": env}
+        if os.name == 'nt':
+            popen_kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            popen_kwargs["preexec_fn"] = os.setsid
+        t0 = time.perf_counter()
+        process = subprocess.Popen(cmd, **popen_kwargs)
+        done = threading.Event()
+
+        def watchdog():
+            while not done.wait(CMD_POLL_INTERVAL):
+                if job.cancel_event.is_set() or time.perf_counter() - t0 > timeout:
+                    self._kill_process_group(process)
+                    return
+
+        threading.Thread(target=watchdog, daemon=True).start()
+        # 不帶 timeout 的 wait 會直接阻塞到結束，量測不受輪詢間隔影響
+        rc = process.wait()
+        elapsed = time.perf_counter() - t0
+        done.set()
+        return elapsed, rc
+
+    def action_startup_bench(self, project_path, output_name, runs=STARTUP_BENCH_RUNS):
+        """重複啟動建置產物（帶 smoke test 參數）量測冷啟動與熱啟動延遲，並與另一種打包模式的上次結果比較"""
+        cfg = self._project_config(project_path)
+        mode = self._bundle_mode(cfg)
+        artifact = self._artifact_path(project_path, output_name, mode)
+        rel = os.path.relpath(artifact, project_path)
+        if not os.path.exists(artifact):
+            self.log(f"找不到建置產物 {rel}，請先以 {mode} 模式建置。")
+            return 1
+        smoke = cfg.get("smoke_test_args", STARTUP_SMOKE_ARGS)
+        args = shlex.split(smoke, posix=os.name != 'nt') if isinstance(smoke, str) else [str(a) for a in smoke]
+        env = os.environ.copy()
+        env[STARTUP_SMOKE_ENV] = "1"
+        runs = max(1, int(runs))
+        self.log(f"--- 啟動測速: {rel} ({mode}，參數: {' '.join(args) or '(無)'}) ---")
+
+        evict_target = os.path.dirname(artifact) if mode == "onedir" else artifact
+        can_evict = self._evict_file_cache(evict_target)
+        if not can_evict:
+            self.log("此平台無法清除檔案快取，冷啟動僅取第一次啟動。")
+        # 第一次熱啟動當作暖機，不計入
+        plan = [("cold", True)] * (runs if can_evict else 1) + [("warmup", False)] + [("warm", False)] * runs
+        samples = {"cold": [], "warm": []}
+        job = self._job()
+        for i, (phase, evict) in enumerate(plan, 1):
+            if job.cancel_event.is_set():
+                return -1
+            if evict:
+                self._evict_file_cache(evict_target)
+            started = time.time()
+            seconds, rc = self._launch_once([artifact] + args, env, os.path.dirname(artifact), STARTUP_BENCH_TIMEOUT)
+            if job.cancel_event.is_set():
+                return -1
+            if rc != 0:
+                reason = f"逾時 {STARTUP_BENCH_TIMEOUT} 秒" if seconds >= STARTUP_BENCH_TIMEOUT else f"rc={rc}"
+                self.log(f"❌ 第 {i} 次啟動失敗 ({reason})；程式收到 {' '.join(args) or '參數'} 或環境變數 "
+                         f"{STARTUP_SMOKE_ENV}=1 時應完成初始化後立即以 0 結束。")
+                return 1
+            if phase in samples:
+                samples[phase].append(seconds)
+                self.telemetry.record("startup", f"{mode} {phase}", project_path, started, started + seconds, rc=rc)
+
+        result = {"created": time.strftime("%Y-%m-%d %H:%M:%S"), "runs": runs,
+                  "size": self._measure_tree(evict_target)[0]}
+        self.log(f"  {'階段':<6} {'次數':>3} {'中位數':>7} {'最小':>8} {'最大':>8}")  # 中文字佔兩格
+        for phase, label in (("cold", "冷啟動"), ("warm", "熱啟動")):
+            values = sorted(samples[phase])
+            result[phase] = Telemetry.percentile(values, 50)
+            self.log(f"  {label:<5} {len(values):>5} {result[phase]:>8.3f}s {values[0]:>8.3f}s {values[-1]:>8.3f}s")
+
+        # 兩種模式各保留最近一次結果，方便切換 bundle_mode 後直接比較
+        record_file = os.path.join(project_path, "build", ".devops_startup.json")
+        records = _load_json(record_file) or {}
+        records.setdefault(output_name, {})[mode] = result
+        for other, prev in records[output_name].items():
+            if other != mode:
+                self.log(f"  對照 {other} ({prev.get('created', '?')}): 冷啟動 {prev.get('cold', 0):.3f}s，"
+                         f"熱啟動 {prev.get('warm', 0):.3f}s，大小 {prev.get('size', 0) / 1024 ** 2:.1f} MB "
+                         f"(本次 {result['size'] / 1024 ** 2:.1f} MB)")
+        try:
+            os.makedirs(os.path.dirname(record_file), exist_ok=True)
+            with open(record_file, 'w', encoding='utf-8') as f:
+                json.dump(records, f, indent=4, ensure_ascii=False)
+        except OSError as e:
+            self.log(f"寫入啟動測速紀錄失敗: {e}")
+        return 0
+
+    def _analyze_bundle(self, project_path, venv_path, entry_file, output_name, artifact, mode="onefile", build_dir=None):
+        """分析這次打包的內容並與上次建置比較；分析失敗不影響建置結果"""
+        try:
+            try:
+                with open(entry_file, 'rb') as f:
+                    refs = self._scan_imports(ast.parse(f.read(), filename=entry_file))
+            except (OSError, SyntaxError, ValueError):
+                refs = []
+            build_dir = build_dir or os.path.join(project_path, "build")
+            analyzer = BundleAnalyzer(os.path.join(build_dir, output_name), project_path,
+                                      self._venv_base_prefix(venv_path))
+            output = os.path.dirname(artifact) if mode == "onedir" else artifact
+            report = analyzer.analyze(self._measure_tree(output)[0], entry_file, {mod for level, mod, _ in refs if not level},
+                                      self._collect_project_sources(project_path, entry_file), mode)
+            if report is None:
+                self.log("找不到 PyInstaller 的 TOC 檔，略過打包內容分析。")
+                return None
+            report_file = os.path.join(build_dir, BUNDLE_REPORT_FILE)
+            reports = _load_json(report_file) or {}
+            self.log("📦 打包內容分析: " + BundleAnalyzer.format_report(report, reports.get(output_name)))
+            reports[output_name] = report
+            with open(report_file, 'w', encoding='utf-8') as f:
+                json.dump(reports, f, indent=1, ensure_ascii=False)
+            return report
+        except Exception as e:
+            self.log(f"打包內容分析失敗: {e}")
+            return None
+
+    def _write_build_record(self, record_file, build_fp, artifact, seconds, quick_key=None):
+        try:
+            os.makedirs(os.path.dirname(record_file), exist_ok=True)
+            with open(record_file, 'w', encoding='utf-8') as f:
+                json.dump({"fingerprint": build_fp, "quick_key": quick_key, "artifact": artifact, "seconds": seconds,
+                           "updated": time.strftime("%Y-%m-%d %H:%M:%S")}, f, indent=4, ensure_ascii=False)
+        except OSError as e:
+            self.log(f"寫入建置紀錄失敗: {e}")
 
-    def action_publish(self, project_path, user, repo):
+    def action_publish(self, project_path, user, repo, venv_name="venv_build"):
         # 建立安全且正確的 Repo 名稱 (將空白替換為連字號)
         safe_repo = repo.replace(" ", "-")
 
@@ -450,435 +3803,629 @@ class TaskHandler:
         if not os.path.exists(os.path.join(project_path, ".git")):
             self.run_cmd("git init", cwd=project_path)
 
-        try:
-            self.run_cmd(f"git remote remove origin", cwd=project_path)
-        except Exception:
-            pass
+        # 只有 URL 不同時才改寫 remote (將 remote URL 設為沒有空白的 safe_repo)
+        url = f"https://github.com/{user}/{safe_repo}.git"
+        rc, current_url = self._git_capture(["remote", "get-url", "origin"], project_path)
+        if rc != 0:
+            self.run_cmd(f'git remote add origin "{url}"', cwd=project_path)
+        elif current_url.strip() != url:
+            self.log(f"remote URL 變更: {current_url.strip()} → {url}")
+            self.run_cmd(f'git remote set-url origin "{url}"', cwd=project_path)
 
-        # 將 remote URL 替換為沒有空白的 safe_repo
-        self.run_cmd(f"git remote add origin https://github.com/{user}/{safe_repo}.git", cwd=project_path)
-        self.run_cmd("git add .", cwd=project_path)
-        rc = self.run_cmd('git commit -m "Update via DevOps Tool"', cwd=project_path)
+        self._ensure_publish_excludes(project_path, venv_name)
+
+        # 單次 porcelain 呼叫同時取得分支、upstream、ahead 數與工作目錄狀態
+        rc, out = self._git_capture(["status", "--porcelain=v2", "--branch", "--untracked-files=normal"], project_path)
         if rc != 0:
-            # commit 失敗可能是沒有變更，記錄並嘗試 push（如果 remote 已有 commit）
-            self.log("git commit 可能失敗（例如沒有變更或尚未設定 git user），跳過 commit。")
-        # 嘗試推送 main，若失敗再嘗試 master
-        if self.run_cmd("git push -u origin main", cwd=project_path) != 0:
-            self.run_cmd("git push -u origin master", cwd=project_path)
-
-
-class App(ctk.CTk):
-    # 語言字典
-    TRANSLATIONS = {
-        "zh": {
-            "global_settings": "⚙️ GitHub User",
-            "btn_save": "儲存",
-            "btn_update": "⟳ 檢查更新",
-            "recent_files": "最近開啟：",
-            "btn_browse": "📂 瀏覽新資料夾",
-            "entry_point": "入口檔案",
-            "output_name": "輸出檔名 (.exe)",
-            "repo_name": "Repo 名稱",
-            "btn_save_project": "💾 儲存專案設定",
-            "panel_title": "操作面板",
-            "btn_run": "▶ 執行測試",
-            "btn_clean": "🗑 清理環境",
-            "btn_build": "🔨 一鍵打包",
-            "btn_publish": "☁ 發布",
-            "lang_label": "語言 / Language"
-        },
-        "en": {
-            "global_settings": "⚙️ GitHub User",
-            "btn_save": "Save",
-            "btn_update": "⟳ Check Update",
-            "recent_files": "Recent:",
-            "btn_browse": "📂 Browse Folder",
-            "entry_point": "Entry Point",
-            "output_name": "Output Name (.exe)",
-            "repo_name": "Repo Name",
-            "btn_save_project": "💾 Save Project Config",
-            "panel_title": "Control Panel",
-            "btn_run": "▶ Run Test",
-            "btn_clean": "🗑 Clean Env",
-            "btn_build": "🔨 Build EXE",
-            "btn_publish": "☁ Publish",
-            "lang_label": "Language"
-        }
-    }
+            self.log(f"git status 失敗 (rc={rc})，取消發布。")
+            return rc
+        branch, upstream, ahead, dirty = None, None, None, []
+        for line in out.splitlines():
+            if line.startswith("# branch.head "):
+                branch = line.split(" ", 2)[2].strip()
+            elif line.startswith("# branch.upstream "):
+                upstream = line.split(" ", 2)[2].strip()
+            elif line.startswith("# branch.ab "):
+                ahead = int(line.split()[2].lstrip("+"))
+            elif line and not line.startswith("#"):
+                dirty.append(line)
+        if not branch or branch == "(detached)":
+            self.log("目前不在任何分支上 (detached HEAD)，取消發布。")
+            return 1
 
-    def __init__(self):
-        super().__init__()
-        self.title(f"{APP_NAME} v{CURRENT_VERSION}")
-        self.geometry("900x750") # 稍微加高以容納語言選單
-
-        self.lang = "zh" # 預設語言
-
-        # handler 需要能記錄 UI log（handler 內有些方法會呼叫 app 屬性）
-        self.handler = TaskHandler(log_callback=self.ui_log)
-        # 把 app 參考注入 handler（部分 handler 方法想要呼叫 app 的函式）
-        self.handler.app_log_local = self.ui_log
-        self.updater = UpdateManager(app_instance=self, log_callback=self.ui_log)
-
-        self.project_path = None
-        self.recent_projects = []
-
-        self._threads = []
-        self._threads_lock = threading.Lock()
-        self._closing = False
-
-        self.grid_columnconfigure(1, weight=1)
-        self.grid_rowconfigure(3, weight=1)
-
-        # === 1. 全域設定與更新 ===
-        self.global_frame = ctk.CTkFrame(self)
-        self.global_frame.grid(row=0, column=0, columnspan=2, sticky="ew", padx=20, pady=(15, 5))
-
-        self.lbl_global_title = ctk.CTkLabel(self.global_frame, text=self.t("global_settings"), font=("Arial", 12, "bold"))
-        self.lbl_global_title.pack(side="left", padx=10)
-        
-        self.entry_git_user = ctk.CTkEntry(self.global_frame, width=150)
-        self.entry_git_user.pack(side="left", padx=5)
-
-        self.btn_save_global = ctk.CTkButton(self.global_frame, text=self.t("btn_save"), width=60, fg_color="#444", command=self.save_global_settings)
-        self.btn_save_global.pack(side="left", padx=5)
-
-        self.btn_update = ctk.CTkButton(self.global_frame, text=self.t("btn_update"), width=100, fg_color="#E67E22", hover_color="#D35400", command=self.thread_check_update)
-        self.btn_update.pack(side="right", padx=10)
-
-        self.lbl_ver = ctk.CTkLabel(self.global_frame, text=f"v{CURRENT_VERSION}", text_color="gray")
-        self.lbl_ver.pack(side="right", padx=5)
-
-        # === 2. 專案選擇 ===
-        self.select_frame = ctk.CTkFrame(self, fg_color="transparent")
-        self.select_frame.grid(row=1, column=0, columnspan=2, sticky="ew", padx=20, pady=5)
-
-        self.lbl_recent = ctk.CTkLabel(self.select_frame, text=self.t("recent_files"))
-        self.lbl_recent.pack(side="left", padx=(0, 5))
-        
-        self.history_menu = ctk.CTkOptionMenu(self.select_frame, values=["無紀錄"], command=self.load_from_history, width=300)
-        self.history_menu.pack(side="left", padx=5)
-
-        self.btn_select = ctk.CTkButton(self.select_frame, text=self.t("btn_browse"), command=self.select_folder)
-        self.btn_select.pack(side="left", padx=10)
-
-        self.lbl_path = ctk.CTkLabel(self.select_frame, text="", text_color="gray")
-        self.lbl_path.pack(side="left", padx=10)
-
-        # === 3. 專案設定 ===
-        self.project_config_frame = ctk.CTkFrame(self)
-        self.project_config_frame.grid(row=2, column=0, columnspan=2, sticky="ew", padx=20, pady=5)
-
-        # 儲存 entry 與 label 引用以便切換語言
-        self.lbl_entry_point = None
-        self.lbl_output_name = None
-        self.lbl_repo_name = None
-
-        def create_entry(parent, key, default, col):
-            lbl = ctk.CTkLabel(parent, text=self.t(key), font=("Arial", 12, "bold"))
-            lbl.grid(row=0, column=col, padx=10, pady=5, sticky="w")
-            entry = ctk.CTkEntry(parent, width=180)
-            entry.grid(row=1, column=col, padx=10, pady=5)
-            entry.insert(0, default)
-            return entry, lbl
-
-        self.entry_entrypoint, self.lbl_entry_point = create_entry(self.project_config_frame, "entry_point", "src/main.py", 0)
-        self.entry_output, self.lbl_output_name = create_entry(self.project_config_frame, "output_name", "MyTool", 1)
-        self.entry_git_repo, self.lbl_repo_name = create_entry(self.project_config_frame, "repo_name", "MyRepo", 2)
-
-        self.btn_save_project = ctk.CTkButton(self.project_config_frame, text=self.t("btn_save_project"), width=120, fg_color="#555", command=self.save_project_settings)
-        self.btn_save_project.grid(row=1, column=3, padx=20)
-
-        # === 4. 操作面板 (Sidebar) ===
-        self.sidebar = ctk.CTkFrame(self, width=180, corner_radius=0)
-        self.sidebar.grid(row=3, column=0, sticky="nsew", pady=10)
-        
-        self.lbl_panel = ctk.CTkLabel(self.sidebar, text=self.t("panel_title"), font=("Arial", 16, "bold"))
-        self.lbl_panel.pack(pady=20)
-
-        # 按鈕變數化並調整順序: Run -> Publish -> Build -> Clean
-        # 1. Run (執行) - 綠色
-        self.btn_run = self.create_btn(self.sidebar, "btn_run", self.thread_run, "#2CC985", "#229A66")
-        
-        # 2. Publish (發布) - 紫色 (移到第二順位)
-        self.btn_publish = self.create_btn(self.sidebar, "btn_publish", self.thread_publish, "#9B59B6", "#8E44AD")
-
-        # 3. Build (打包) - 藍色 (移到第三順位)
-        self.btn_build = self.create_btn(self.sidebar, "btn_build", self.thread_build, "#3498DB", "#2980B9")
-
-        # 4. Clean (清理) - 紅色 (移到最後)
-        self.btn_clean = self.create_btn(self.sidebar, "btn_clean", self.thread_clean, "#E74C3C", "#C0392B")
-
-        # === 5. 語言切換區 (新增於左下角) ===
-        self.lbl_lang = ctk.CTkLabel(self.sidebar, text=self.t("lang_label"))
-        self.lbl_lang.pack(side="bottom", pady=(0, 10))
-        
-        self.lang_menu = ctk.CTkOptionMenu(
-            self.sidebar, 
-            values=["繁體中文", "English"], 
-            command=self.change_language,
-            width=140
-        )
-        self.lang_menu.set("繁體中文") # Default
-        self.lang_menu.pack(side="bottom", pady=(10, 5), padx=20)
-
-        # === 6. 日誌區 ===
-        self.textbox = ctk.CTkTextbox(self, font=("Consolas", 12))
-        self.textbox.grid(row=3, column=1, padx=20, pady=20, sticky="nsew")
-
-        self.load_global_settings()
-        self.ui_log(f"系統就緒。設定檔路徑: {GLOBAL_CONFIG_FILE}")
-
-        self.protocol("WM_DELETE_WINDOW", self.on_closing)
-
-    # --- 語言處理邏輯 ---
-    def t(self, key):
-        """取得當前語言的文字"""
-        return self.TRANSLATIONS[self.lang].get(key, key)
-
-    def change_language(self, choice):
-        """切換語言並更新介面"""
-        self.lang = "zh" if choice == "繁體中文" else "en"
-        
-        # 更新所有靜態文字
-        self.lbl_global_title.configure(text=self.t("global_settings"))
-        self.btn_save_global.configure(text=self.t("btn_save"))
-        self.btn_update.configure(text=self.t("btn_update"))
-        self.lbl_recent.configure(text=self.t("recent_files"))
-        self.btn_select.configure(text=self.t("btn_browse"))
-        
-        self.lbl_entry_point.configure(text=self.t("entry_point"))
-        self.lbl_output_name.configure(text=self.t("output_name"))
-        self.lbl_repo_name.configure(text=self.t("repo_name"))
-        self.btn_save_project.configure(text=self.t("btn_save_project"))
-        
-        self.lbl_panel.configure(text=self.t("panel_title"))
-        self.btn_run.configure(text=self.t("btn_run"))
-        self.btn_clean.configure(text=self.t("btn_clean"))
-        self.btn_build.configure(text=self.t("btn_build"))
-        self.btn_publish.configure(text=self.t("btn_publish"))
-        self.lbl_lang.configure(text=self.t("lang_label"))
-
-    def create_btn(self, parent, text_key, cmd, fg, hover):
-        """建立按鈕並回傳物件 (方便後續修改文字)"""
-        btn = ctk.CTkButton(parent, text=self.t(text_key), command=cmd, fg_color=fg, hover_color=hover, height=45)
-        btn.pack(pady=10, padx=20, fill="x")
-        return btn
-
-    def ui_log(self, msg):
-        try:
-            # 使用 after 保證在主執行緒操作 UI
-            self.after(0, lambda: (self.textbox.insert("end", str(msg) + "\n"), self.textbox.see("end")))
-        except Exception:
-            pass
+        if dirty:
+            self.log(f"偵測到 {len(dirty)} 個變更，提交中...")
+            # .git/info/exclude 管不到已追蹤的檔案：加入後再把它們取消暫存，避免提交重新建置的產物
+            tracked = self._tracked_excludes(project_path)
+            rc = self.run_cmd("git add -A", cwd=project_path)
+            if rc == 0 and tracked:
+                rc = self._unstage(project_path, tracked)
+            if rc != 0:
+                self.log(f"git add 失敗 (rc={rc})，取消發布。")
+                return rc
+            staged_rc, _ = self._git_capture(["diff", "--cached", "--quiet"], project_path)
+            if staged_rc == 0:
+                self.log("變更都屬於排除的建置產物，略過 commit。")
+                dirty = []
+            else:
+                rc = self.run_cmd('git commit -m "Update via DevOps Tool"', cwd=project_path)
+                if rc != 0:
+                    self.log("git commit 失敗（例如尚未設定 git user.name / user.email），取消推送。")
+                    return rc
+        if not dirty:
+            if upstream and ahead == 0:
+                self.log(f"沒有需要提交的變更且 {branch} 與 {upstream} 同步，略過 commit 與 push。")
+                return 0
+            self.log("沒有需要提交的變更，略過 commit，僅推送尚未上傳的 commit。")
 
-    def set_entry(self, entry, text):
-        entry.delete(0, "end")
-        entry.insert(0, text)
-
-    # --- 歷史與設定讀寫 ---
-    def load_global_settings(self):
-        if os.path.exists(GLOBAL_CONFIG_FILE):
-            try:
-                with open(GLOBAL_CONFIG_FILE, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.set_entry(self.entry_git_user, data.get("git_user", ""))
-                    self.recent_projects = data.get("recent_projects", [])
-                    self.update_history_menu()
-                    # 嘗試讀取上次的語言設定 (選用)
-                    saved_lang = data.get("language", "zh")
-                    if saved_lang in ["zh", "en"]:
-                        self.lang = saved_lang
-                        self.lang_menu.set("繁體中文" if saved_lang == "zh" else "English")
-                        self.change_language("繁體中文" if saved_lang == "zh" else "English")
-            except Exception:
-                pass
+        return self.run_cmd(f'git push -u origin "{branch}"', cwd=project_path)
 
-    def save_global_settings(self):
-        data = {
-            "git_user": self.entry_git_user.get(), 
-            "recent_projects": self.recent_projects,
-            "language": self.lang  # 儲存語言設定
-        }
+    def _git_capture(self, args, cwd):
+        """執行短暫的 git 查詢並取回輸出（不逐行轉送到日誌）"""
+        self.log(f"[{cwd}] > git {' '.join(args)}")
         try:
-            # 確保目錄存在
-            os.makedirs(os.path.dirname(GLOBAL_CONFIG_FILE), exist_ok=True)
-            with open(GLOBAL_CONFIG_FILE, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)
-            self.ui_log(f"全域設定已儲存 ({GLOBAL_CONFIG_FILE})")
-        except Exception as e:
-            self.ui_log(f"儲存失敗: {e}\n{traceback.format_exc()}")
+            res = subprocess.run(["git"] + args, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                 encoding='utf-8', errors='replace', timeout=60)
+            return res.returncode, res.stdout
+        except (OSError, subprocess.SubprocessError) as e:
+            self.log(f"git 執行失敗: {e}")
+            return 1, ""
+
+    PUBLISH_EXCLUDE_MARK = "# --- DevOpsTool: 建置產物不納入版本控制 ---"
 
-    def update_history_menu(self):
-        val = self.recent_projects[:10] if self.recent_projects else ["無紀錄"]
+    def _ensure_publish_excludes(self, project_path, venv_name):
+        """把本工具產生的目錄寫入 .git/info/exclude（不修改使用者的 .gitignore）"""
+        patterns = ["/build/", "/dist/", f"/{venv_name}/", f"/{venv_name}-*/", f"/{CLEAN_TRASH_DIR}/", "/*.spec",
+                    "__pycache__/", f"/devops_config.json{CONFIG_BACKUP_SUFFIX}", "/devops_config.json.*.tmp"]
+        exclude = os.path.join(project_path, ".git", "info", "exclude")
         try:
-            self.history_menu.configure(values=val)
-        except Exception:
-            pass
+            with open(exclude, 'r', encoding='utf-8') as f:
+                existing = f.read()
+        except OSError:
+            existing = ""
+        missing = [p for p in patterns if p not in existing.splitlines()]
+        if not missing:
+            return
+        try:
+            os.makedirs(os.path.dirname(exclude), exist_ok=True)
+            with open(exclude, 'a', encoding='utf-8') as f:
+                if existing and not existing.endswith("\n"):
+                    f.write("\n")
+                if self.PUBLISH_EXCLUDE_MARK not in existing:
+                    f.write(self.PUBLISH_EXCLUDE_MARK + "\n")
+                f.write("\n".join(missing) + "\n")
+        except OSError as e:
+            self.log(f"寫入 .git/info/exclude 失敗: {e}")
 
-    def add_to_history(self, path):
-        if path in self.recent_projects:
+    def _tracked_excludes(self, project_path):
+        """列出已被追蹤、卻符合排除規則的檔案；它們的變更不會再被自動提交"""
+        rc, out = self._git_capture(["ls-files", "-z", "-ci", "--exclude-standard"], project_path)
+        tracked = [p for p in out.split("\0") if p] if rc == 0 else []
+        if tracked:
+            tops = sorted({t.split("/")[0] for t in tracked})
+            self.log(f"⚠ 有 {len(tracked)} 個已追蹤的檔案符合排除規則 ({', '.join(tops[:10])})，本次不提交它們的變更；"
+                     f"如要停止追蹤請執行 git rm -r --cached <路徑> 後再發布。")
+        return tracked
+
+    def _unstage(self, project_path, paths):
+        # 檔案可能很多，經由 pathspec 檔案傳入以免超過命令列長度上限
+        fd, list_file = tempfile.mkstemp(prefix="devops_unstage_", suffix=".txt")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write("\0".join(paths) + "\0")
+            rc, out = self._git_capture(["reset", "-q", f"--pathspec-from-file={list_file}", "--pathspec-file-nul"],
+                                        project_path)
+            if rc != 0:
+                self.log(f"取消暫存建置產物失敗: {out.strip()}")
+            return rc
+        finally:
             try:
-                self.recent_projects.remove(path)
-            except Exception:
+                os.remove(list_file)
+            except OSError:
                 pass
-        self.recent_projects.insert(0, path)
-        self.update_history_menu()
-        try:
-            self.history_menu.set(path)
-        except Exception:
-            pass
-        self.save_global_settings()
 
-    def load_from_history(self, value):
-        if value == "無紀錄" or not os.path.exists(value):
-            return
-        self.project_path = value
-        self.lbl_path.configure(text=value)
-        self.load_project_settings(value)
-        self.add_to_history(value)
-        self.ui_log(f"已從歷史載入: {value}")
-
-    def select_folder(self):
-        folder = filedialog.askdirectory()
-        if folder:
-            self.project_path = folder
-            self.lbl_path.configure(text=folder)
-            self.load_project_settings(folder)
-            self.add_to_history(folder)
-
-    def load_project_settings(self, folder):
-        cfg = os.path.join(folder, "devops_config.json")
-        if os.path.exists(cfg):
-            try:
-                with open(cfg, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.set_entry(self.entry_entrypoint, data.get("entry_point", "src/main.py"))
-                    self.set_entry(self.entry_output, data.get("output_name", "MyTool"))
-                    self.set_entry(self.entry_git_repo, data.get("git_repo", ""))
-            except Exception:
-                pass
-        else:
-            self.set_entry(self.entry_git_repo, os.path.basename(folder))
+    # --- 宣告式管線 (devops_config.json 的 "pipeline") ---
+    def _run_stage(self, project_path, stage, settings):
+        kind = stage["type"]
+        venv_name = stage.get("venv", "venv_build")
+        if kind == "cmd":
+            venv_path = os.path.join(project_path, venv_name)
+            py = os.path.join(venv_path, "Scripts", "python.exe") if os.name == 'nt' else os.path.join(venv_path, "bin", "python")
+            cmd = stage["cmd"].replace("{venv_python}", f'"{py}"')
+            cwd = os.path.normpath(os.path.join(project_path, stage.get("cwd", ".")))
+            return self.run_cmd(cmd, cwd=cwd)
+        if kind == "run":
+            return self.action_run(project_path, stage.get("entry_point", settings.get("entry_point", "")))
+        if kind == "clean":
+            return self.action_clean(project_path, venv_name, bool(stage.get("dry_run", False)),
+                                     bool(stage.get("background", False)))
+        if kind == "build":
+            return self.action_build(project_path, venv_name,
+                                     stage.get("entry_point", settings.get("entry_point", "")),
+                                     stage.get("output_name", settings.get("output_name", "")),
+                                     bool(stage.get("full_rebuild", False)))
+        if kind == "matrix":
+            return self.action_build_matrix(project_path, venv_name,
+                                            stage.get("entry_point", settings.get("entry_point", "")),
+                                            stage.get("output_name", settings.get("output_name", "")),
+                                            bool(stage.get("full_rebuild", False)), stage.get("parallel"))
+        if kind == "publish":
+            return self.action_publish(project_path,
+                                       stage.get("git_user", settings.get("git_user", "")),
+                                       stage.get("git_repo", settings.get("git_repo", "")), venv_name)
+        raise ValueError(f"未知的 stage 類型: {kind}")
 
-    def save_project_settings(self):
-        if not self.project_path:
-            return
-        data = {
-            "entry_point": self.entry_entrypoint.get(),
-            "output_name": self.entry_output.get(),
-            "git_repo": self.entry_git_repo.get()
-        }
-        try:
-            with open(os.path.join(self.project_path, "devops_config.json"), 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)
-            self.ui_log("專案設定已儲存。")
-        except Exception as e:
-            self.ui_log(f"儲存專案設定失敗: {e}\n{traceback.format_exc()}")
+    def _run_child_jobs(self, tasks, order, max_parallel, fail_fast=True, label="stage"):
+        """在目前工作下平行執行子工作。
 
-    # --- 執行緒 ---
-    def _run(self, func, *args):
-        if self._closing:
-            self.ui_log("系統正在關閉，無法啟動新工作。")
-            return
+        tasks: name -> {"func": callable, "after": [相依名稱], "timeout": 秒數或 None}
+        每個子工作有自己的取消旗標；父工作被取消、或 fail_fast 時任一失敗，都會終止其餘子工作。
+        回傳 (results, durations, failed, cancelled, wall, usage)；usage 為各子工作的 CPU / 峰值記憶體。
+        """
+        parent = self._job()
+        cond = threading.Condition()
+        running = {}
+        results = {}
+        times = {}
+        usage = {}
+        cancelled = set()
+        failed = None
+        stopping = False
 
-        def wrapper():
+        def run_child(name, child):
+            self._local.job = child
+            t0 = time.monotonic()
+            t0_wall = time.time()
             try:
-                func(*args)
+                rc = tasks[name]["func"]()
             except Exception as e:
-                self.ui_log(f"工作執行失敗: {e}\n{traceback.format_exc()}")
+                self.log(f"{label} 執行錯誤: {e}\n{traceback.format_exc()}")
+                rc = 1
             finally:
-                with self._threads_lock:
-                    try:
-                        self._threads.remove(threading.current_thread())
-                    except Exception:
-                        pass
+                self._local.job = None
+            self.telemetry.record(label, name, child.project, t0_wall, time.time(),
+                                  job=child.id, rc=0 if rc is None else rc, cancelled=child.cancel_event.is_set(),
+                                  **child.resources())
+            with cond:
+                results[name] = 0 if rc is None else rc
+                times[name] = (t0, time.monotonic())
+                usage[name] = child.resources()
+                running.pop(name, None)
+                cond.notify_all()
 
-        th = threading.Thread(target=wrapper, daemon=True)
-        with self._threads_lock:
-            self._threads.append(th)
-        th.start()
+        def stop_running():
+            for n, (_, child) in running.items():
+                cancelled.add(n)
+                self._signal_job(child)
 
-    def check_ready(self):
-        if not self.project_path:
-            messagebox.showerror("錯誤", "請先選擇專案！")
-            return False
-        return True
+        t_start = time.monotonic()
+        with cond:
+            while True:
+                if not stopping and parent.cancel_event.is_set():
+                    stopping = True
+                    self.log(f"工作已取消，停止執行中的 {label}。")
+                    stop_running()
+                if failed is None:
+                    for name in order:
+                        if results.get(name, 0) != 0:
+                            failed = name
+                            if fail_fast and not stopping:
+                                stopping = True
+                                self.log(f"{label} '{name}' 失敗 (rc={results[name]})，停止其餘 {label}。")
+                                stop_running()
+                            break
+                if not stopping:
+                    for name in order:
+                        if len(running) >= max_parallel:
+                            break
+                        if name in results or name in running:
+                            continue
+                        if all(results.get(d) == 0 for d in tasks[name].get("after", [])):
+                            child = Job(parent.id, f"{parent.name}/{name}", parent.project, parent=parent)
+                            child.step_timeout = tasks[name].get("timeout")
+                            th = threading.Thread(target=run_child, args=(name, child), name=f"{label}-{name}", daemon=True)
+                            running[name] = (th, child)
+                            th.start()
+                if not running:
+                    break
+                cond.wait(CMD_POLL_INTERVAL)
 
-    def thread_run(self):
-        if self.check_ready():
-            self.save_project_settings()
-            self._run(self.handler.action_run, self.project_path, self.entry_entrypoint.get())
+        durations = {n: e - s for n, (s, e) in times.items()}
+        return results, durations, failed, cancelled, time.monotonic() - t_start, usage
 
-    def thread_clean(self):
-        if self.check_ready():
-            self._run(self.handler.action_clean, self.project_path, "venv_build")
+    @staticmethod
+    def _child_status(name, results, failed, cancelled):
+        if name not in results:
+            return "略過"
+        if results[name] == 0:
+            return "成功"
+        if name in cancelled and name != failed:
+            return "已取消"
+        return f"失敗 (rc={results[name]})"
 
-    def thread_build(self):
-        if self.check_ready():
-            self.save_project_settings()
-            self._run(self.handler.action_build, self.project_path, "venv_build", self.entry_entrypoint.get(), self.entry_output.get())
+    # --- 多專案批次建置 ---
+    @staticmethod
+    def _self_cli_command():
+        """啟動本工具 CLI 的指令（封裝後的 exe 或 python 腳本）"""
+        if getattr(sys, "frozen", False):
+            return f'"{sys.executable}"'
+        return f'"{sys.executable}" "{os.path.abspath(__file__)}"'
 
-    def thread_publish(self):
-        if self.check_ready():
-            self.save_project_settings()
-            self.save_global_settings()
-            self._run(self.handler.action_publish, self.project_path, self.entry_git_user.get(), self.entry_git_repo.get())
+    def action_batch_build(self, projects, max_parallel=None, full_rebuild=False):
+        """每個專案以獨立子行程 (CLI build) 建置，各自使用自己的 devops_config.json 與 venv"""
+        projects = [os.path.abspath(p) for p in dict.fromkeys(projects)]
+        missing = [p for p in projects if not os.path.isdir(p)]
+        for p in missing:
+            self.log(f"略過不存在的專案: {p}")
+        projects = [p for p in projects if p not in missing]
+        if not projects:
+            self.log("沒有可建置的專案。")
+            return 2
+        max_parallel = max_parallel or default_batch_parallelism()
+        self.log(f"--- 批次建置 {len(projects)} 個專案 (並行 {max_parallel}) ---")
 
-    def thread_check_update(self):
-        self._run(self.updater.check_for_updates)
+        cli = self._self_cli_command()
+        names = {}
+        for p in projects:
+            name = os.path.basename(p) or p
+            if name in names.values():
+                name = f"{name}#{len(names)}"
+            names[p] = name
+        busy = set()
 
-    def on_closing(self, force: bool = False):
-        if self._closing and not force:
-            return
-        self._closing = True
-        self.ui_log("應用程序正在關閉，停止背景工作...")
+        def build_one(p):
+            # 佔用該專案的名額：GUI 上同專案的工作會排隊，而已有工作在跑的專案不重複建置同一個 venv / build / dist
+            if not self.scheduler.try_reserve(p):
+                self.log(f"略過 {names[p]}：此專案已有執行中的工作")
+                busy.add(names[p])
+                return 1
+            try:
+                return self.run_cmd(f'{cli} build "{p}"' + (" --full" if full_rebuild else ""),
+                                    cwd=p, env={"PYTHONUNBUFFERED": "1"}, step="batch build")
+            finally:
+                self.scheduler.release(p)
 
-        try:
-            self.handler.stop_all()
-        except Exception:
-            pass
+        tasks = {names[p]: {"func": (lambda p=p: build_one(p))} for p in projects}
+        order = [names[p] for p in projects]
+        results, durations, failed, cancelled, wall, usage = self._run_child_jobs(
+            tasks, order, max_parallel, fail_fast=False, label="project")
 
-        try:
-            self.updater.close()
-        except Exception:
-            pass
+        self.log("--- 批次建置結果 ---")
+        self.log(f"  {'專案':<24} {'狀態':<12} {'耗時':>10} {'產物大小':>12} {'峰值記憶體':>12}")
+        ok = 0
+        for p in projects:
+            name = names[p]
+            status = "略過 (忙碌中)" if name in busy else self._child_status(name, results, failed, cancelled)
+            cfg = self._project_config(p)
+            mode = self._bundle_mode(cfg)
+            artifact = self._artifact_path(p, cfg.get("output_name") or "MyTool", mode)
+            if results.get(name) == 0 and os.path.exists(artifact):
+                size = f"{self._measure_tree(os.path.dirname(artifact) if mode == 'onedir' else artifact)[0] / 1024 / 1024:.1f} MB"
+            else:
+                size = "-"
+            seconds = f"{durations[name]:.1f} 秒" if name in durations else "-"
+            peak = f"{usage[name]['peak_rss'] / 1024 ** 2:.0f} MB" if usage.get(name, {}).get("peak_rss") else "-"
+            self.log(f"  {name:<24} {status:<12} {seconds:>10} {size:>12} {peak:>12}")
+            ok += results.get(name) == 0
+        self.log(f"完成 {ok}/{len(projects)}，總耗時 {wall:.1f} 秒 (各專案累計 {sum(durations.values()):.1f} 秒)")
+        if self._job().cancel_event.is_set():
+            return -1
+        return 0 if ok == len(projects) else 1
 
-        wait_start = time.time()
-        timeout = 5 if not force else 1
-        with self._threads_lock:
-            threads_copy = list(self._threads)
-        for t in threads_copy:
-            remaining = timeout - (time.time() - wait_start)
-            if remaining <= 0:
-                break
+    # --- 多直譯器矩陣建置 (devops_config.json 的 "build_matrix") ---
+    @staticmethod
+    def _resolve_interpreter(spec):
+        """把 "3.11"、"python3.12" 或直譯器路徑解析成 (實際執行檔, 完整版本)；找不到時回傳 None"""
+        spec = os.path.expanduser(str(spec).strip())
+        is_version = re.fullmatch(r"\d+(\.\d+){0,2}", spec) is not None
+        candidates = []
+        if is_version:
+            if os.name == 'nt':
+                candidates.append(["py", f"-{spec}"])
+            candidates.append([shutil.which(f"python{spec}")])
+        elif os.sep in spec or "/" in spec:
+            candidates.append([spec])
+        else:
+            candidates.append([shutil.which(spec)])
+        for cmd in candidates:
+            if not cmd[0]:
+                continue
             try:
-                t.join(timeout=remaining)
-            except Exception:
-                pass
+                res = subprocess.run(cmd + ["-c", "import sys; print(sys.executable); print('%d.%d.%d' % sys.version_info[:3])"],
+                                     stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                     encoding='utf-8', errors='replace', timeout=30)
+            except (OSError, subprocess.SubprocessError):
+                continue
+            lines = res.stdout.strip().splitlines()
+            if res.returncode != 0 or len(lines) < 2:
+                continue
+            exe, version = lines[-2].strip(), lines[-1].strip()
+            if is_version and not (version + ".").startswith(spec + "."):
+                continue
+            return exe, version
+        return None
 
-        with self._threads_lock:
-            alive = [t for t in self._threads if t.is_alive()]
-        if alive:
-            try:
-                self.handler.stop_all()
-            except Exception:
-                pass
-            for t in alive:
-                try:
-                    t.join(timeout=1)
-                except Exception:
-                    pass
+    def action_build_matrix(self, project_path, venv_name, entry_point, output_name, full_rebuild=False, max_parallel=None):
+        """以 build_matrix 列出的每個直譯器平行建置；各自使用 <venv>-<版本> 與 build/、dist/ 下的 py<版本> 子目錄"""
+        cfg = self._project_config(project_path)
+        specs = cfg.get("build_matrix") or []
+        if isinstance(specs, str):
+            specs = [specs]
+        if not specs:
+            self.log('devops_config.json 未設定 build_matrix (例如 ["3.11", "3.12", "/usr/bin/python3"])。')
+            return 2
 
+        variants = {}  # 名稱 -> (設定值, 執行檔, 版本)；找不到的直譯器執行檔為 None
+        for spec in dict.fromkeys(str(s) for s in specs):
+            found = self._resolve_interpreter(spec)
+            if found is None:
+                self.log(f"找不到直譯器: {spec}")
+                variants[spec] = (spec, None, None)
+                continue
+            exe, version = found
+            name = base = "py" + ".".join(version.split(".")[:2])
+            n = 1
+            while name in variants:
+                n += 1
+                name = f"{base}-{n}"
+            variants[name] = (spec, exe, version)
+
+        runnable = [name for name, (_, exe, _) in variants.items() if exe]
+        max_parallel = max_parallel or cfg.get("matrix_parallel") or default_batch_parallelism()
+        self.log(f"--- 矩陣建置 {len(runnable)} 個直譯器 (並行 {max_parallel}) ---")
+        tasks = {
+            name: {"func": (lambda name=name: self.action_build(
+                project_path, f"{venv_name}-{name[2:]}", entry_point, output_name, full_rebuild,
+                python_exe=variants[name][1], variant=name))}
+            for name in runnable
+        }
+        results, durations, failed, cancelled, wall, usage = self._run_child_jobs(
+            tasks, runnable, max_parallel, fail_fast=False, label="interpreter")
+
+        mode = self._bundle_mode(cfg)
+        self.log("--- 矩陣建置結果 ---")
+        self.log(f"  {'直譯器':<13} {'版本':<8} {'狀態':<12} {'耗時':>10} {'產物大小':>12} {'峰值記憶體':>12}  執行檔")
+        ok = 0
+        for name, (spec, exe, version) in variants.items():
+            if exe is None:
+                self.log(f"  {name:<16} {'-':<10} 找不到直譯器")
+                continue
+            status = self._child_status(name, results, failed, cancelled)
+            artifact = self._artifact_path(project_path, output_name, mode, os.path.join(project_path, "dist", name))
+            if results.get(name) == 0 and os.path.exists(artifact):
+                size = f"{self._measure_tree(os.path.dirname(artifact) if mode == 'onedir' else artifact)[0] / 1024 / 1024:.1f} MB"
+            else:
+                size = "-"
+            seconds = f"{durations[name]:.1f} 秒" if name in durations else "-"
+            peak = f"{usage[name]['peak_rss'] / 1024 ** 2:.0f} MB" if usage.get(name, {}).get("peak_rss") else "-"
+            self.log(f"  {name:<16} {version:<10} {status:<12} {seconds:>10} {size:>12} {peak:>12}  {exe}")
+            ok += results.get(name) == 0
+        self.log(f"完成 {ok}/{len(variants)}，總耗時 {wall:.1f} 秒 (各直譯器累計 {sum(durations.values()):.1f} 秒)")
+        if self._job().cancel_event.is_set():
+            return -1
+        return 0 if ok == len(variants) else 1
+
+    def action_pipeline(self, project_path, defaults=None):
+        """依 DAG 執行管線：相依已完成的 stage 平行啟動，任一失敗即停止其餘 stage"""
+        self.log("--- 執行管線 ---")
+        cfg = self._project_config(project_path)
         try:
-            self.destroy()
-        except Exception:
-            pass
-        try:
-            sys.exit(0)
-        except Exception:
+            pipe = Pipeline.from_config(cfg)
+        except ValueError as e:
+            self.log(f"管線設定錯誤: {e}")
+            return 2
+
+        settings = dict(defaults or {})
+        settings.update({k: cfg[k] for k in ("entry_point", "output_name", "git_repo") if cfg.get(k)})
+        tasks = {
+            name: {
+                "func": (lambda st=stage: self._run_stage(project_path, st, settings)),
+                "after": stage["after"],
+                "timeout": stage.get("timeout"),
+            }
+            for name, stage in pipe.stages.items()
+        }
+        results, durations, failed, cancelled, wall, usage = self._run_child_jobs(
+            tasks, pipe.order, pipe.max_parallel or self.scheduler.max_workers)
+
+        self.log("--- 管線結果 ---")
+        for name in pipe.order:
+            status = self._child_status(name, results, failed, cancelled)
+            if name in durations:
+                peak = usage.get(name, {}).get("peak_rss", 0) / 1024 ** 2
+                self.log(f"  {name:<20} {status:<14} {durations[name]:8.2f} 秒  峰值 {peak:.0f} MB")
+            else:
+                self.log(f"  {name:<20} {status}")
+        path, path_seconds = pipe.critical_path(durations)
+        if path:
+            self.log(f"關鍵路徑: {' → '.join(path)} ({path_seconds:.2f} 秒)")
+        self.log(f"總耗時 {wall:.2f} 秒 (各 stage 累計 {sum(durations.values()):.2f} 秒)")
+
+        if self._job().cancel_event.is_set():
+            return -1
+        if failed is not None:
+            return results[failed]
+        return 0
+
+
+# ================= 命令列 (headless) 模式 =================
+# 只使用上面的核心類別，不載入 customtkinter / tkinter / requests
+CLI_COMMANDS = ("run", "clean", "build", "matrix", "publish", "pipeline", "batch", "stats", "prefetch", "lock", "bundle",
+                "startup")
+
+
+def _cli_sink(msg):
+    text = f"{msg}\n"
+    try:
+        sys.stdout.write(text)
+    except UnicodeEncodeError:
+        enc = sys.stdout.encoding or 'utf-8'
+        sys.stdout.write(text.encode(enc, 'replace').decode(enc))
+
+
+def cli_main(argv):
+    """headless 入口：直接驅動 TaskHandler，回傳該步驟的 return code"""
+    import argparse
+    parser = argparse.ArgumentParser(prog=APP_NAME, description=f"{APP_NAME} 命令列模式（不啟動 GUI）")
+    parser.add_argument("--timing", action="store_true", help="結束時顯示啟動與執行耗時")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_run = sub.add_parser("run", help="執行入口檔案")
+    p_clean = sub.add_parser("clean", help="清理建置產物與 venv")
+    p_build = sub.add_parser("build", help="建立 venv 並以 PyInstaller 打包")
+    p_matrix = sub.add_parser("matrix", help="以 build_matrix 列出的多個直譯器平行建置")
+    p_publish = sub.add_parser("publish", help="commit 並推送到 GitHub")
+    p_pipe = sub.add_parser("pipeline", help="執行 devops_config.json 宣告的管線")
+    p_lock = sub.add_parser("lock", help="重新解析 requirements.txt 並寫出此平台的 requirements-<平台>-py<版本>.lock")
+    p_batch = sub.add_parser("batch", help="平行建置多個專案")
+    p_prefetch = sub.add_parser("prefetch", help="預先下載多個專案的 wheel 到共用 wheelhouse")
+    p_prefetch.add_argument("paths", nargs="*", help="專案資料夾（可多個）")
+    p_prefetch.add_argument("--recent", action="store_true", help="加入全域設定中的所有最近專案")
+    p_prefetch.add_argument("--jobs", "-j", type=int, help=f"同時執行的 pip 行程數（預設 {WHEEL_PREFETCH_WORKERS}）")
+    p_stats = sub.add_parser("stats", help="顯示各專案各步驟的歷史耗時 (p50 / p95)")
+    p_stats.add_argument("path", nargs="?", help="只顯示此專案")
+    p_stats.add_argument("--json", action="store_true", help="以 JSON 輸出")
+    p_bundle = sub.add_parser("bundle", help="顯示上次建置的打包內容分析 (各套件大小、資料檔、排除建議)")
+    p_bundle.add_argument("path", help="專案資料夾")
+    p_bundle.add_argument("--output", help="輸出檔名（預設讀取 devops_config.json）")
+    p_bundle.add_argument("--json", action="store_true", help="以 JSON 輸出")
+    p_startup = sub.add_parser("startup", help="重複啟動建置產物，量測冷/熱啟動延遲")
+    p_startup.add_argument("path", help="專案資料夾")
+    p_startup.add_argument("--output", help="輸出檔名（預設讀取 devops_config.json）")
+    p_startup.add_argument("--runs", "-n", type=int, default=STARTUP_BENCH_RUNS, help="冷/熱啟動各量測幾次")
+    for p in (p_run, p_clean, p_build, p_matrix, p_publish, p_pipe, p_lock):
+        p.add_argument("path", help="專案資料夾")
+    p_batch.add_argument("paths", nargs="*", help="專案資料夾（可多個）")
+    p_batch.add_argument("--recent", action="store_true", help="加入全域設定中的所有最近專案")
+    p_batch.add_argument("--jobs", "-j", type=int, help="同時建置的專案數（預設依核心數與可用記憶體決定）")
+    p_batch.add_argument("--full", action="store_true", help="強制完整重建")
+    for p in (p_run, p_build, p_matrix):
+        p.add_argument("--entry", help="入口檔案（預設讀取 devops_config.json）")
+    for p in (p_clean, p_build, p_matrix, p_lock):
+        p.add_argument("--venv", default="venv_build", help="venv 資料夾名稱")
+    p_clean.add_argument("--dry-run", action="store_true", help="只列出會刪除的項目與大小")
+    p_run.add_argument("--watch", action="store_true", help="原始碼變更時自動重新啟動 (Ctrl+C 結束)")
+    for p in (p_build, p_matrix):
+        p.add_argument("--output", help="輸出檔名")
+        p.add_argument("--full", action="store_true", help="強制完整重建")
+    p_matrix.add_argument("--jobs", "-j", type=int, help="同時建置的直譯器數（預設讀取 matrix_parallel，或依核心數與可用記憶體決定）")
+    p_publish.add_argument("--user", help="GitHub 帳號（預設讀取全域設定）")
+    p_publish.add_argument("--repo", help="Repo 名稱")
+    args = parser.parse_args(argv)
+    # 在這裡統一回報耗時：stats / bundle 不經排程器，也要涵蓋
+    started = time.perf_counter()
+    rc = _cli_dispatch(parser, args)
+    if args.timing:
+        sys.stderr.write(f"import {_IMPORT_SECONDS * 1000:.0f} ms | {args.command} {time.perf_counter() - started:.2f} s | rc={rc}\n")
+    return rc
+
+
+def _cli_dispatch(parser, args):
+    """依子命令執行，回傳 return code"""
+    if args.command == "stats":
+        rows = Telemetry().summary(os.path.abspath(args.path) if args.path else None)
+        _cli_sink(json.dumps(rows, ensure_ascii=False, indent=2) if args.json else Telemetry.format_summary(rows))
+        return 0
+
+    # 與 GUI 相同經由 ConfigStore 讀取：主檔損毀時改用備份，而不是默默套用預設值
+    config = ConfigStore(_cli_sink)
+    if args.command in ("batch", "prefetch"):
+        projects = list(args.paths)
+        if args.recent:
+            projects += config.get(GLOBAL_CONFIG_FILE, {}).get("recent_projects", [])
+        if not projects:
+            parser.error("請指定專案資料夾或使用 --recent")
+        if args.command == "prefetch":
+            return _cli_execute(args, None, "prefetch", lambda h: (h.action_prefetch, projects, args.jobs), config)
+        return _cli_execute(args, None, "batch", lambda h: (h.action_batch_build, projects, args.jobs, args.full), config)
+
+    project = os.path.abspath(args.path)
+    if not os.path.isdir(project):
+        _cli_sink(f"專案資料夾不存在: {project}")
+        return 2
+    cfg = config.get(os.path.join(project, "devops_config.json"), {})
+    settings = {
+        "entry_point": getattr(args, "entry", None) or cfg.get("entry_point") or "src/main.py",
+        "output_name": getattr(args, "output", None) or cfg.get("output_name") or "MyTool",
+        "git_repo": getattr(args, "repo", None) or cfg.get("git_repo") or os.path.basename(project),
+        "git_user": getattr(args, "user", None) or config.get(GLOBAL_CONFIG_FILE, {}).get("git_user", ""),
+    }
+
+    if args.command == "bundle":
+        report = (_load_json(os.path.join(project, "build", BUNDLE_REPORT_FILE)) or {}).get(settings["output_name"])
+        if report is None:
+            _cli_sink(f"尚無 {settings['output_name']} 的打包內容分析，請先建置。")
+            return 1
+        _cli_sink(json.dumps(report, ensure_ascii=False, indent=2) if args.json else BundleAnalyzer.format_report(report))
+        return 0
+
+    venv = getattr(args, "venv", "venv_build")
+    calls = {
+        "run": lambda h: (h.action_run, project, settings["entry_point"], bool(getattr(args, "watch", False))),
+        "clean": lambda h: (h.action_clean, project, venv, bool(getattr(args, "dry_run", False)), False),
+        "build": lambda h: (h.action_build, project, venv, settings["entry_point"], settings["output_name"],
+                            bool(getattr(args, "full", False))),
+        "matrix": lambda h: (h.action_build_matrix, project, venv, settings["entry_point"], settings["output_name"],
+                             bool(getattr(args, "full", False)), args.jobs),
+        "publish": lambda h: (h.action_publish, project, settings["git_user"], settings["git_repo"], venv),
+        "pipeline": lambda h: (h.action_pipeline, project, settings),
+        "lock": lambda h: (h.action_lock, project, venv),
+        "startup": lambda h: (h.action_startup_bench, project, settings["output_name"], args.runs),
+    }
+    return _cli_execute(args, project, args.command, calls[args.command], config)
+
+
+def _cli_execute(args, project, name, make_call, config=None):
+    """在排程器中執行單一工作並等待結束；Ctrl+C 會取消工作"""
+    handler = TaskHandler(log_callback=_cli_sink, config=config)
+    handler.tag_logs = False
+    func, *fargs = make_call(handler)
+    job = handler.submit(name, project, func, *fargs)
+    try:
+        while not handler.scheduler.wait_all(timeout=0.5):
             pass
+    except KeyboardInterrupt:
+        _cli_sink("收到中斷訊號，停止工作...")
+        handler.stop_all()
+        handler.scheduler.wait_all(timeout=CMD_KILL_GRACE + 2)
+
+    if job.state == Job.CANCELLED:
+        rc = 130
+    elif job.error is not None:
+        rc = 1
+    elif isinstance(job.result, int):
+        rc = job.result if 0 <= job.result < 256 else 1
+    else:
+        rc = 0
+    sys.stdout.flush()
+    return rc
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "bench":
+        # 基準測試放在獨立模組，平常的 CLI / GUI 啟動不需載入
+        sys.modules.setdefault("DevOpsTool", sys.modules[__name__])
+        import DevOpsBench
+        return DevOpsBench.main(argv[1:])
+    if argv and argv[0] == "selftest":
+        sys.modules.setdefault("DevOpsTool", sys.modules[__name__])
+        import DevOpsSelfTest
+        return DevOpsSelfTest.main(argv[1:])
+    smoke = argv[:1] == [STARTUP_SMOKE_ARGS]
+    if argv and not smoke and (argv[0] in CLI_COMMANDS or argv[0].startswith("-")):
+        return cli_main(argv)
+    # 讓 DevOpsGUI 的 from DevOpsTool import ... 取得同一份模組，而不是以 __main__ 之外的名稱再載入一次
+    sys.modules.setdefault("DevOpsTool", sys.modules[__name__])
+    import DevOpsGUI
+    if smoke or os.environ.get(STARTUP_SMOKE_ENV) == "1":
+        # 啟動測速用：載入 GUI 模組後立即結束，不建立視窗
+        return 0
+    DevOpsGUI.main()
+    return 0
+
+
+_IMPORT_SECONDS = time.perf_counter() - _IMPORT_T0
 
 
 if __name__ == "__main__":
-    app = App()
-    app.mainloop()
\ No newline at end of file
+    sys.exit(main())